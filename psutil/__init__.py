@@ -27,10 +27,9 @@ import errno
 import functools
 import os
 import signal
-import subprocess
 import sys
+import threading
 import time
-import traceback
 try:
     import pwd
 except ImportError:
@@ -41,6 +40,8 @@ from ._common import deprecated_method
 from ._common import memoize
 from ._common import memoize_when_activated
 from ._common import wrap_numbers as _wrap_numbers
+from ._common import WrapTracker
+from ._compat import basestring as _basestring
 from ._compat import callable
 from ._compat import long
 from ._compat import PY3 as _PY3
@@ -94,6 +95,10 @@ if LINUX:
     from ._pslinux import IOPRIO_CLASS_IDLE  # NOQA
     from ._pslinux import IOPRIO_CLASS_NONE  # NOQA
     from ._pslinux import IOPRIO_CLASS_RT  # NOQA
+    from ._pslinux import PROC_EVENT_EXEC  # NOQA
+    from ._pslinux import PROC_EVENT_EXIT  # NOQA
+    from ._pslinux import PROC_EVENT_FORK  # NOQA
+    from ._pslinux import PROC_EVENT_UID  # NOQA
     # Linux >= 2.6.36
     if _psplatform.HAS_PRLIMIT:
         from ._psutil_linux import RLIM_INFINITY  # NOQA
@@ -188,18 +193,21 @@ __all__ = [
     "WINDOWS",
 
     # classes
-    "Process", "Popen",
+    "Process", "Popen", "Sampler", "WrapTracker",
 
     # functions
-    "pid_exists", "pids", "process_iter", "wait_procs",             # proc
+    "pid_exists", "pids", "process_iter", "process_table",          # proc
+    "wait_procs",
     "virtual_memory", "swap_memory",                                # memory
     "cpu_times", "cpu_percent", "cpu_times_percent", "cpu_count",   # cpu
     "cpu_stats",  # "cpu_freq",
     "net_io_counters", "net_connections", "net_if_addrs",           # network
-    "net_if_stats",
+    "net_if_stats", "net_connections_iter", "connections_by_pid",
+    "net_io_rates",
     "disk_io_counters", "disk_partitions", "disk_usage",            # disk
+    "disk_io_rates",
     # "sensors_temperatures", "sensors_battery", "sensors_fans"     # sensors
-    "users", "boot_time",                                           # others
+    "users", "boot_time", "system_snapshot",                        # others
 ]
 __all__.extend(_psplatform.__extra__all__)
 __author__ = "Giampaolo Rodola'"
@@ -386,12 +394,23 @@ class Process(object):
      - if you're continuously iterating over a set of Process
        instances use process_iter() which pre-emptively checks
      process identity for every yielded instance
+     - on Linux, pass anchor=True (see below)
+
+    On Linux, if *anchor* is True, a file descriptor referring to
+    /proc/{pid} directory (and a pidfd, if supported) is kept open
+    for the lifetime of the instance and process files are read
+    relative to it: reads fail with NoSuchProcess once the original
+    process is gone, even if its PID has been reused, and identity
+    checks don't need to re-read the creation time. Signals are
+    sent via pidfd, if available. On other platforms *anchor* is
+    ignored.
     """
 
-    def __init__(self, pid=None):
-        self._init(pid)
+    def __init__(self, pid=None, anchor=False):
+        self._init(pid, _anchor=anchor)
 
-    def _init(self, pid, _ignore_nsp=False):
+    def _init(self, pid, _ignore_nsp=False, _anchor=False,
+              _create_time=None):
         if pid is None:
             pid = os.getpid()
         else:
@@ -403,7 +422,8 @@ class Process(object):
         self._pid = pid
         self._name = None
         self._exe = None
-        self._create_time = None
+        # may be passed if already known, so that it's not read again
+        self._create_time = _create_time
         self._gone = False
         self._hash = None
         self._oneshot_inctx = False
@@ -416,6 +436,10 @@ class Process(object):
         self._last_proc_cpu_times = None
         # cache creation time for later use in is_running() method
         try:
+            if _anchor and hasattr(self._proc, "anchor"):
+                # must happen first so that create_time() is read
+                # from the very process we're anchored to
+                self._proc.anchor()
             self.create_time()
         except AccessDenied:
             # We should never get here as AFAIK we're able to get
@@ -607,6 +631,12 @@ class Process(object):
         """
         if self._gone:
             return False
+        if getattr(self._proc, "anchored", False):
+            # /proc/{pid} fd refers to the original process
+            if self._proc.is_running():
+                return True
+            self._gone = True
+            return False
         try:
             # Checking if PID is alive is not enough as the PID might
             # have been reused by another process: we also want to
@@ -900,13 +930,22 @@ class Process(object):
         """Return the number of threads used by this process."""
         return self._proc.num_threads()
 
-    def threads(self):
+    def threads(self, tids=None):
         """Return threads opened by process as a list of
         (id, user_time, system_time) namedtuples representing
         thread id and thread CPU times (user/system).
+        On Linux also the thread name, status, the CPU it last ran on
+        and the number of minor / major page faults are returned.
+        If *tids* is specified only the threads with those IDs are
+        returned (on Linux the others are not even inspected).
         On OpenBSD this method requires root access.
         """
-        return self._proc.threads()
+        if tids is None:
+            return self._proc.threads()
+        if LINUX:
+            return self._proc.threads(tids=tids)
+        tids = set(tids)
+        return [x for x in self._proc.threads() if x.id in tids]
 
     @_assert_pid_not_reused
     def children(self, recursive=False):
@@ -935,9 +974,17 @@ class Process(object):
         process Y won't be listed as the reference to process A
         is lost.
         """
+        if hasattr(self._proc, 'children_pids'):
+            # Linux >= 3.5 only: the kernel tells us which are the
+            # direct children of a process (fastest).
+            try:
+                return self._children_from_kernel(recursive)
+            except NotImplementedError:
+                pass
+
         if hasattr(_psplatform, 'ppid_map'):
-            # Windows only: obtain a {pid:ppid, ...} dict for all running
-            # processes in one shot (faster).
+            # Windows and Linux: obtain a {pid:ppid, ...} dict for all
+            # running processes in one shot (faster).
             ppid_map = _psplatform.ppid_map()
         else:
             ppid_map = None
@@ -946,6 +993,7 @@ class Process(object):
         if not recursive:
             if ppid_map is None:
                 # 'slow' version, common to all platforms except Windows
+                # and Linux
                 for p in process_iter():
                     try:
                         if p.ppid() == self.pid:
@@ -955,8 +1003,8 @@ class Process(object):
                                 ret.append(p)
                     except (NoSuchProcess, ZombieProcess):
                         pass
-            else:  # pragma: no cover
-                # Windows only (faster)
+            else:
+                # Windows and Linux (faster)
                 for pid, ppid in ppid_map.items():
                     if ppid == self.pid:
                         try:
@@ -977,7 +1025,7 @@ class Process(object):
                         table[p.ppid()].append(p)
                     except (NoSuchProcess, ZombieProcess):
                         pass
-            else:  # pragma: no cover
+            else:
                 for pid, ppid in ppid_map.items():
                     try:
                         p = Process(pid)
@@ -1004,6 +1052,36 @@ class Process(object):
                                 checkpids.append(child.pid)
         return ret
 
+    def _children_from_kernel(self, recursive):
+        # children() implementation used when the platform is able to
+        # list the direct children of a process; this costs
+        # O(children) instead of O(all processes).
+        ret = []
+        parents = [self]
+        seen = set([self.pid])
+        for parent in parents:
+            try:
+                pids = parent._proc.children_pids()
+            except (NoSuchProcess, ZombieProcess):
+                continue
+            for pid in pids:
+                if pid in seen:
+                    continue
+                seen.add(pid)
+                try:
+                    child = Process(pid)
+                    # if child happens to be older than its parent
+                    # (self) it means child's PID has been reused
+                    intime = self.create_time() <= child.create_time()
+                except (NoSuchProcess, ZombieProcess):
+                    pass
+                else:
+                    if intime:
+                        ret.append(child)
+                        if recursive:
+                            parents.append(child)
+        return ret
+
     def cpu_percent(self, interval=None):
         """Return a float representing the current process CPU
         utilization as a percentage.
@@ -1199,6 +1277,27 @@ class Process(object):
                 nt = _psplatform.pmmap_ext
                 return [nt(*x) for x in it]
 
+        def memory_maps_iter(self, grouped=True, path=None):
+            """Same as memory_maps() but return a generator.
+            If *path* is specified only the mapped regions of that
+            path are returned.
+
+            On Linux mapped regions are read one at a time instead of
+            all at once; if *grouped* is True fields are summed while
+            they are read, so that no tuple is created for single
+            mapped regions.
+            """
+            if hasattr(self._proc, "memory_maps_iter"):
+                it = self._proc.memory_maps_iter(grouped=grouped, path=path)
+                if grouped:
+                    nt = _psplatform.pmmap_grouped
+                else:
+                    nt = _psplatform.pmmap_ext
+                return (nt(*x) for x in it)
+            # generic implementation
+            return (x for x in self.memory_maps(grouped=grouped)
+                    if path is None or x.path == path)
+
     def open_files(self):
         """Return files opened by process as a list of
         (path, fd) namedtuples including the absolute file name
@@ -1242,7 +1341,11 @@ class Process(object):
                     "would affect every process in the process group of the "
                     "calling process (os.getpid()) instead of PID 0")
             try:
-                os.kill(self.pid, sig)
+                if hasattr(self._proc, "send_signal"):
+                    # Linux: uses pidfd_send_signal() if anchored
+                    self._proc.send_signal(sig)
+                else:
+                    os.kill(self.pid, sig)
             except OSError as err:
                 if err.errno == errno.ESRCH:
                     if OPENBSD and pid_exists(self.pid):
@@ -1381,10 +1484,12 @@ class Popen(Process):
         # Explicitly avoid to raise NoSuchProcess in case the process
         # spawned by subprocess.Popen terminates too quickly, see:
         # https://github.com/giampaolo/psutil/issues/193
+        import subprocess  # imported lazily as it's slow to import
         self.__subproc = subprocess.Popen(*args, **kwargs)
         self._init(self.__subproc.pid, _ignore_nsp=True)
 
     def __dir__(self):
+        import subprocess
         return sorted(set(dir(Popen) + dir(subprocess.Popen)))
 
     def __enter__(self):
@@ -1431,7 +1536,7 @@ _as_dict_attrnames = set(
     [x for x in dir(Process) if not x.startswith('_') and x not in
      ['send_signal', 'suspend', 'resume', 'terminate', 'kill', 'wait',
       'is_running', 'as_dict', 'parent', 'children', 'rlimit',
-      'memory_info_ex', 'oneshot']])
+      'memory_info_ex', 'memory_maps_iter', 'oneshot']])
 
 
 # =====================================================================
@@ -1463,9 +1568,24 @@ def pid_exists(pid):
 
 
 _pmap = {}
+# proc connector subscriptions made by process_events(), if any
+_proc_events_listeners = []
+
+
+def _live_pids(use_events=False):
+    """Return the set of running PIDs. If *use_events* is True and
+    process_events() is in use they are known without listing all
+    processes.
+    """
+    if use_events:
+        listeners = _proc_events_listeners[:]
+        if listeners:
+            return listeners[0].live_pids()
+    return set(pids())
 
 
-def process_iter(attrs=None, ad_value=None):
+def process_iter(attrs=None, ad_value=None, workers=None, executor='thread',
+                 use_events=False):
     """Return a generator yielding a Process instance for all
     running processes.
 
@@ -1485,6 +1605,15 @@ def process_iter(attrs=None, ad_value=None):
     to returned Process instance.
     If *attrs* is an empty list it will retrieve all process info
     (slow).
+
+    If *workers* is specified processes are inspected in parallel
+    by a pool of *workers* threads (*executor* == 'thread') or
+    processes (*executor* == 'process'). Processes are still
+    yielded in PID order.
+
+    If *use_events* is True and a process_events() generator is
+    alive, running PIDs are taken from the fork / exit events it
+    received instead of listing all processes.
     """
     def add(pid):
         proc = Process(pid)
@@ -1496,15 +1625,35 @@ def process_iter(attrs=None, ad_value=None):
     def remove(pid):
         _pmap.pop(pid, None)
 
-    a = set(pids())
+    a = _live_pids(use_events)
     b = set(_pmap.keys())
     new_pids = a - b
     gone_pids = b - a
 
     for pid in gone_pids:
         remove(pid)
-    for pid, proc in sorted(list(_pmap.items()) +
-                            list(dict.fromkeys(new_pids).items())):
+    items = sorted(list(_pmap.items()) +
+                   list(dict.fromkeys(new_pids).items()))
+
+    if workers is not None:
+        for pid, cached, proc, err in _process_iter_pool(
+                items, attrs, ad_value, workers, executor):
+            if proc is not None:
+                _pmap[pid] = proc
+                yield proc
+            elif err is None:
+                remove(pid)
+            elif cached is None and pid in _pmap:
+                # same as below
+                try:
+                    yield _pmap[pid]
+                except KeyError:
+                    pass
+            else:
+                raise err
+        return
+
+    for pid, proc in items:
         try:
             if proc is None:  # new process
                 yield add(pid)
@@ -1535,6 +1684,166 @@ def process_iter(attrs=None, ad_value=None):
                 raise
 
 
+def _process_iter_pool(items, attrs, ad_value, workers, executor):
+    """Used by process_iter() in order to inspect a list of
+    (pid, cached_proc) items in a pool of threads or processes.
+    Yield a (pid, cached_proc, proc, exc) tuple for every item, in
+    the same order, where *proc* is the up to date Process instance
+    or None in which case *exc* is either None (process is gone) or
+    the AccessDenied exception which was raised.
+    """
+    import concurrent.futures
+
+    if not isinstance(workers, (int, long)) or workers < 1:
+        raise ValueError("workers must be a positive integer (got %r)"
+                         % workers)
+    if executor == 'thread':
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        func = _process_iter_collect
+    elif executor == 'process':
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        func = _process_iter_collect_info
+    else:
+        raise ValueError("invalid executor %r (choose between 'thread' "
+                         "and 'process')" % executor)
+
+    # Split work in chunks: one future per PID is too much overhead.
+    chunksize = max(1, len(items) // (workers * 4))
+    chunks = [items[i:i + chunksize]
+              for i in range(0, len(items), chunksize)]
+    with pool:
+        if executor == 'thread':
+            for results in pool.map(func, chunks, [attrs] * len(chunks),
+                                    [ad_value] * len(chunks)):
+                for result in results:
+                    yield result
+            return
+
+        # Process instances can't be passed back from the children so
+        # they only return process creation time and info. Stateful
+        # attrs (cpu_percent) are then collected here, by using the
+        # Process instances cached across calls.
+        pidchunks = [[pid for pid, _ in chunk] for chunk in chunks]
+        for chunk, results in zip(chunks, pool.map(
+                func, pidchunks, [attrs] * len(chunks),
+                [ad_value] * len(chunks))):
+            for (pid, cached), (gone, denied, ctime, info) in zip(
+                    chunk, results):
+                proc = None
+                err = None
+                if denied:
+                    err = AccessDenied(pid)
+                elif not gone:
+                    if cached is not None and cached._create_time == ctime:
+                        proc = cached
+                    else:
+                        proc = Process.__new__(Process)
+                        proc._init(pid, _ignore_nsp=True, _create_time=ctime)
+                    if attrs is not None:
+                        try:
+                            for name in _process_iter_stateful_attrs:
+                                if name in info:
+                                    try:
+                                        info[name] = getattr(proc, name)()
+                                    except (AccessDenied, ZombieProcess):
+                                        info[name] = ad_value
+                        except NoSuchProcess:
+                            proc = None
+                        else:
+                            proc.info = info
+                yield (pid, cached, proc, err)
+
+
+def _process_iter_collect(items, attrs, ad_value):
+    # process_iter() thread pool worker; same as the sequential
+    # process_iter() loop.
+    ret = []
+    for pid, cached in items:
+        try:
+            if cached is None or not cached.is_running():
+                proc = Process(pid)
+            else:
+                proc = cached
+            if attrs is not None:
+                proc.info = proc.as_dict(attrs=attrs, ad_value=ad_value)
+        except NoSuchProcess:
+            ret.append((pid, cached, None, None))
+        except AccessDenied as err:
+            ret.append((pid, cached, None, err))
+        else:
+            ret.append((pid, cached, proc, None))
+    return ret
+
+
+# Process methods whose result depends on the previous call; when
+# inspecting processes in a pool of processes they are collected by
+# the parent.
+_process_iter_stateful_attrs = frozenset(['cpu_percent'])
+
+
+def _process_iter_collect_info(pids, attrs, ad_value):
+    # process_iter() process pool worker; return a list of
+    # (gone, access_denied, create_time, info) tuples.
+    ret = []
+    for pid in pids:
+        try:
+            proc = Process(pid)
+            if attrs is not None:
+                info = proc.as_dict(attrs=attrs, ad_value=ad_value)
+            else:
+                info = None
+        except NoSuchProcess:
+            ret.append((True, False, None, None))
+        except AccessDenied:
+            ret.append((False, True, None, None))
+        else:
+            ret.append((False, False, proc._create_time, info))
+    return ret
+
+
+def process_table(attrs=None, ad_value=None):
+    """Return information about all running processes as a table
+    of columns, that is a {name: list} dict where every list has
+    one item per process and is sorted by PID.
+    'pid' and 'create_time' columns are always present.
+
+    *attrs* is a list of Process class' attribute names (the same
+    accepted by Process.as_dict()); by default a set of basic and
+    cheap attributes is collected. *ad_value* is the value which
+    gets assigned in case AccessDenied or ZombieProcess exception
+    is raised when retrieving a particular process information.
+    Processes which disappear in the meantime are skipped.
+
+    On Linux, if all requested attributes can be collected from
+    /proc/{pid}/stat, statm and status files, /proc is walked only
+    once and no Process instance is created.
+    """
+    if attrs is None:
+        attrs = _process_table_attrnames
+    elif not isinstance(attrs, (list, tuple, set, frozenset)):
+        raise TypeError("invalid attrs type %s" % type(attrs))
+    attrs = set(attrs) | set(['pid', 'create_time'])
+    invalid_names = attrs - _as_dict_attrnames - set(['pid'])
+    if invalid_names:
+        raise ValueError("invalid attr name%s %s" % (
+            "s" if len(invalid_names) > 1 else "",
+            ", ".join(map(repr, invalid_names))))
+
+    if hasattr(_psplatform, "process_table") and \
+            attrs <= _psplatform.PROCESS_TABLE_ATTRS:
+        return _psplatform.process_table(attrs, ad_value=ad_value)
+
+    table = dict((name, []) for name in attrs)
+    for proc in process_iter(attrs=attrs, ad_value=ad_value):
+        for name, value in proc.info.items():
+            table[name].append(value)
+    return table
+
+
+_process_table_attrnames = frozenset([
+    'name', 'ppid', 'status', 'cpu_times', 'memory_info', 'num_threads'])
+
+
 def wait_procs(procs, timeout=None, callback=None):
     """Convenience function which waits for a list of processes to
     terminate.
@@ -1593,6 +1902,28 @@ def wait_procs(procs, timeout=None, callback=None):
     if timeout is not None:
         deadline = _timer() + timeout
 
+    if hasattr(_psplatform, "wait_pidfds") and alive:
+        # Linux >= 5.3: sleep until any of the processes terminates
+        # by multiplexing all pidfds with a single epoll() call.
+        # Processes which could not be watched (e.g. fds exhausted)
+        # are polled in the meantime.
+        pidmap = collections.defaultdict(list)
+        for proc in alive:
+            pidmap[proc.pid].append(proc)
+
+        def poll(pid):
+            for proc in pidmap[pid]:
+                check_gone(proc, 0)
+            return all(proc in gone for proc in pidmap[pid])
+
+        for pid in _psplatform.wait_pidfds(list(pidmap), timeout, poll):
+            for proc in pidmap[pid]:
+                if proc not in gone:
+                    check_gone(proc, 0)
+        alive = alive - gone
+        if timeout is not None:
+            timeout = deadline - _timer()
+
     while alive:
         if timeout is not None and timeout <= 0:
             break
@@ -1623,6 +1954,96 @@ def wait_procs(procs, timeout=None, callback=None):
     return (list(gone), list(alive))
 
 
+if hasattr(_psplatform, "ProcEventsListener"):
+
+    def process_events(timeout=None):
+        """Return a generator yielding process lifecycle events as
+        namedtuples with the following fields, as soon as they're
+        notified by the kernel:
+
+         - type: one of the PROC_EVENT_* constants
+         - pid: the process PID
+         - ppid: the parent PID (PROC_EVENT_FORK only)
+         - exitcode: same as Process.wait() (PROC_EVENT_EXIT only)
+         - ruid, euid: the new real and effective UIDs
+           (PROC_EVENT_UID only)
+
+        If *timeout* is not None the generator returns after no event
+        has been received for *timeout* seconds.
+
+        While the generator is alive process_iter(use_events=True)
+        doesn't need to list all processes in order to determine which
+        ones are running.
+
+        Requires root privileges (CAP_NET_ADMIN) or AccessDenied is
+        raised.
+        """
+        listener = _psplatform.ProcEventsListener()
+        _proc_events_listeners.append(listener)
+        try:
+            while True:
+                events = listener.read(timeout)
+                if not events:
+                    return
+                for event in events:
+                    yield event
+        finally:
+            _proc_events_listeners.remove(listener)
+            listener.close()
+
+    __all__.append("process_events")
+
+
+if hasattr(_psplatform, "open_files_all"):
+
+    def open_files_all(pids=None):
+        """Return a generator yielding all the file descriptors opened
+        by all processes (or the processes in *pids*) as
+        (pid, fd, path, position, mode, flags, type) namedtuples,
+        similarly to the "lsof" command line utility.
+        *type* is the type of the file the fd refers to ("file",
+        "dir", "socket", "fifo", "chardev", "blockdev", "anon_inode"
+        or "unknown"); for non-regular files *path* is the symbolic
+        description provided by the kernel (e.g. "socket:[12345]").
+        Each process is inspected in a single pass, in C; processes
+        which are gone or can't be inspected due to lack of
+        permissions are skipped.
+        """
+        if pids is None:
+            pids = _psplatform.pids()
+        return _psplatform.open_files_all(pids)
+
+    __all__.append("open_files_all")
+
+
+if hasattr(_psplatform, "file_users"):
+
+    def file_users(paths, cache=False):
+        """Return the processes which have the given *paths* open as a
+        {path: [(pid, fd), ...]} dict, similarly to the "fuser"
+        command line utility. *paths* can refer to regular files,
+        directories, devices, UNIX sockets or files which were
+        deleted but are still open.
+        File identity is determined by device and inode number, so
+        hard links and different paths to the same file are matched.
+        An index of the files opened by all processes is built in one
+        pass; if *cache* is True it is kept across calls and only the
+        processes which are new (or whose PID has been reused) are
+        scanned again. "file_users.cache_info()" and
+        "file_users.cache_clear()" can be used to inspect and
+        invalidate it.
+        Processes which can't be inspected due to lack of permissions
+        are not included.
+        """
+        if isinstance(paths, _basestring):
+            raise TypeError("paths must be a list or tuple")
+        return _psplatform.file_users(paths, cache=cache)
+
+    file_users.cache_clear = _psplatform.file_users.cache_clear
+    file_users.cache_info = _psplatform.file_users.cache_info
+    __all__.append("file_users")
+
+
 # =====================================================================
 # --- CPU related functions
 # =====================================================================
@@ -1679,19 +2100,10 @@ def cpu_times(percpu=False):
         return _psplatform.per_cpu_times()
 
 
-try:
-    _last_cpu_times = cpu_times()
-except Exception:
-    # Don't want to crash at import time.
-    _last_cpu_times = None
-    traceback.print_exc()
-
-try:
-    _last_per_cpu_times = cpu_times(percpu=True)
-except Exception:
-    # Don't want to crash at import time.
-    _last_per_cpu_times = None
-    traceback.print_exc()
+# Baselines for cpu_percent(interval=None). They are set on first call
+# rather than at import time, so that importing psutil is cheap.
+_last_cpu_times = None
+_last_per_cpu_times = None
 
 
 def _cpu_tot_time(times):
@@ -1729,6 +2141,61 @@ def _cpu_busy_time(times):
     return busy
 
 
+def _cpu_percent_calc(t1, t2):
+    """Given two cpu_times() ntuples calculates the CPU utilization
+    percentage in between them.
+    """
+    t1_all = _cpu_tot_time(t1)
+    t1_busy = _cpu_busy_time(t1)
+
+    t2_all = _cpu_tot_time(t2)
+    t2_busy = _cpu_busy_time(t2)
+
+    # this usually indicates a float precision issue
+    if t2_busy <= t1_busy:
+        return 0.0
+
+    busy_delta = t2_busy - t1_busy
+    all_delta = t2_all - t1_all
+    try:
+        busy_perc = (busy_delta / all_delta) * 100
+    except ZeroDivisionError:
+        return 0.0
+    else:
+        return round(busy_perc, 1)
+
+
+def _cpu_times_percent_calc(t1, t2):
+    """Given two cpu_times() ntuples calculates the utilization
+    percentage of each CPU time in between them.
+    """
+    nums = []
+    all_delta = _cpu_tot_time(t2) - _cpu_tot_time(t1)
+    for field in t1._fields:
+        field_delta = getattr(t2, field) - getattr(t1, field)
+        try:
+            field_perc = (100 * field_delta) / all_delta
+        except ZeroDivisionError:
+            field_perc = 0.0
+        field_perc = round(field_perc, 1)
+        # CPU times are always supposed to increase over time
+        # or at least remain the same and that's because time
+        # cannot go backwards.
+        # Surprisingly sometimes this might not be the case (at
+        # least on Windows and Linux), see:
+        # https://github.com/giampaolo/psutil/issues/392
+        # https://github.com/giampaolo/psutil/issues/645
+        # I really don't know what to do about that except
+        # forcing the value to 0 or 100.
+        if field_perc > 100.0:
+            field_perc = 100.0
+        # `<=` because `-0.0 == 0.0` evaluates to True
+        elif field_perc <= 0.0:
+            field_perc = 0.0
+        nums.append(field_perc)
+    return _psplatform.scputimes(*nums)
+
+
 def cpu_percent(interval=None, percpu=False):
     """Return a float representing the current system-wide CPU
     utilization as a percentage.
@@ -1737,9 +2204,9 @@ def cpu_percent(interval=None, percpu=False):
     and after the interval (blocking).
 
     When *interval* is 0.0 or None compares system CPU times elapsed
-    since last call or module import, returning immediately (non
-    blocking). That means the first time this is called it will
-    return a meaningless 0.0 value which you should ignore.
+    since last call, returning immediately (non blocking). That means
+    the first time this is called it will return a meaningless 0.0
+    value which you should ignore.
     In this case is recommended for accuracy that this function be
     called with at least 0.1 seconds between calls.
 
@@ -1769,26 +2236,7 @@ def cpu_percent(interval=None, percpu=False):
     blocking = interval is not None and interval > 0.0
     if interval is not None and interval < 0:
         raise ValueError("interval is not positive (got %r)" % interval)
-
-    def calculate(t1, t2):
-        t1_all = _cpu_tot_time(t1)
-        t1_busy = _cpu_busy_time(t1)
-
-        t2_all = _cpu_tot_time(t2)
-        t2_busy = _cpu_busy_time(t2)
-
-        # this usually indicates a float precision issue
-        if t2_busy <= t1_busy:
-            return 0.0
-
-        busy_delta = t2_busy - t1_busy
-        all_delta = t2_all - t1_all
-        try:
-            busy_perc = (busy_delta / all_delta) * 100
-        except ZeroDivisionError:
-            return 0.0
-        else:
-            return round(busy_perc, 1)
+    calculate = _cpu_percent_calc
 
     # system-wide usage
     if not percpu:
@@ -1798,9 +2246,8 @@ def cpu_percent(interval=None, percpu=False):
         else:
             t1 = _last_cpu_times
             if t1 is None:
-                # Something bad happened at import time. We'll
-                # get a meaningful result on the next call. See:
-                # https://github.com/giampaolo/psutil/pull/715
+                # First call. We'll get a meaningful result on the
+                # next one.
                 t1 = cpu_times()
         _last_cpu_times = cpu_times()
         return calculate(t1, _last_cpu_times)
@@ -1813,9 +2260,8 @@ def cpu_percent(interval=None, percpu=False):
         else:
             tot1 = _last_per_cpu_times
             if tot1 is None:
-                # Something bad happened at import time. We'll
-                # get a meaningful result on the next call. See:
-                # https://github.com/giampaolo/psutil/pull/715
+                # First call. We'll get a meaningful result on the
+                # next one.
                 tot1 = cpu_times(percpu=True)
         _last_per_cpu_times = cpu_times(percpu=True)
         for t1, t2 in zip(tot1, _last_per_cpu_times):
@@ -1826,8 +2272,8 @@ def cpu_percent(interval=None, percpu=False):
 # Use separate global vars for cpu_times_percent() so that it's
 # independent from cpu_percent() and they can both be used within
 # the same program.
-_last_cpu_times_2 = _last_cpu_times
-_last_per_cpu_times_2 = _last_per_cpu_times
+_last_cpu_times_2 = None
+_last_per_cpu_times_2 = None
 
 
 def cpu_times_percent(interval=None, percpu=False):
@@ -1848,33 +2294,7 @@ def cpu_times_percent(interval=None, percpu=False):
     blocking = interval is not None and interval > 0.0
     if interval is not None and interval < 0:
         raise ValueError("interval is not positive (got %r)" % interval)
-
-    def calculate(t1, t2):
-        nums = []
-        all_delta = _cpu_tot_time(t2) - _cpu_tot_time(t1)
-        for field in t1._fields:
-            field_delta = getattr(t2, field) - getattr(t1, field)
-            try:
-                field_perc = (100 * field_delta) / all_delta
-            except ZeroDivisionError:
-                field_perc = 0.0
-            field_perc = round(field_perc, 1)
-            # CPU times are always supposed to increase over time
-            # or at least remain the same and that's because time
-            # cannot go backwards.
-            # Surprisingly sometimes this might not be the case (at
-            # least on Windows and Linux), see:
-            # https://github.com/giampaolo/psutil/issues/392
-            # https://github.com/giampaolo/psutil/issues/645
-            # I really don't know what to do about that except
-            # forcing the value to 0 or 100.
-            if field_perc > 100.0:
-                field_perc = 100.0
-            # `<=` because `-0.0 == 0.0` evaluates to True
-            elif field_perc <= 0.0:
-                field_perc = 0.0
-            nums.append(field_perc)
-        return _psplatform.scputimes(*nums)
+    calculate = _cpu_times_percent_calc
 
     # system-wide usage
     if not percpu:
@@ -1884,9 +2304,8 @@ def cpu_times_percent(interval=None, percpu=False):
         else:
             t1 = _last_cpu_times_2
             if t1 is None:
-                # Something bad happened at import time. We'll
-                # get a meaningful result on the next call. See:
-                # https://github.com/giampaolo/psutil/pull/715
+                # First call. We'll get a meaningful result on the
+                # next one.
                 t1 = cpu_times()
         _last_cpu_times_2 = cpu_times()
         return calculate(t1, _last_cpu_times_2)
@@ -1899,9 +2318,8 @@ def cpu_times_percent(interval=None, percpu=False):
         else:
             tot1 = _last_per_cpu_times_2
             if tot1 is None:
-                # Something bad happened at import time. We'll
-                # get a meaningful result on the next call. See:
-                # https://github.com/giampaolo/psutil/pull/715
+                # First call. We'll get a meaningful result on the
+                # next one.
                 tot1 = cpu_times(percpu=True)
         _last_per_cpu_times_2 = cpu_times(percpu=True)
         for t1, t2 in zip(tot1, _last_per_cpu_times_2):
@@ -2080,6 +2498,8 @@ def disk_io_counters(perdisk=False, nowrap=True):
     but never decrease.
     "disk_io_counters.cache_clear()" can be used to invalidate the
     cache.
+    *nowrap* may also be a WrapTracker instance, in which case it is
+    used in place of the cache shared by all callers.
 
     On recent Windows versions 'diskperf -y' command may need to be
     executed first otherwise this function won't find any disk.
@@ -2088,7 +2508,9 @@ def disk_io_counters(perdisk=False, nowrap=True):
     if not rawdict:
         return {} if perdisk else None
     if nowrap:
-        rawdict = _wrap_numbers(rawdict, 'psutil.disk_io_counters')
+        if not isinstance(nowrap, WrapTracker):
+            nowrap = 'psutil.disk_io_counters'
+        rawdict = _wrap_numbers(rawdict, nowrap)
     nt = getattr(_psplatform, "sdiskio", _common.sdiskio)
     if perdisk:
         for disk, fields in rawdict.items():
@@ -2103,6 +2525,121 @@ disk_io_counters.cache_clear = functools.partial(
 disk_io_counters.cache_clear.__doc__ = "Clears nowrap argument cache"
 
 
+def _io_sample(fun, name):
+    """Return a (timestamp, {name: raw tuple}) sample of the counters
+    returned by *fun*, adjusted for wrapping under *name*.
+    """
+    rawdict = fun()
+    if rawdict:
+        rawdict = _wrap_numbers(rawdict, name)
+    return (_timer(), rawdict or {})
+
+
+def _io_deltas(s1, s2):
+    """Given two samples returned by _io_sample() return the elapsed
+    time and a {name: deltas list} dict of devices present in both.
+    """
+    (ts1, d1), (ts2, d2) = s1, s2
+    deltas = {}
+    for key, fields in d2.items():
+        if key in d1:
+            deltas[key] = [b - a for a, b in zip(d1[key], fields)]
+    return (ts2 - ts1, deltas)
+
+
+def _disk_rates_calc(delta, elapsed, ndisks=1, in_flight=None):
+    """Given a sdiskio namedtuple of counters deltas calculate the
+    iostat-like rates in between them.
+    """
+    def per_sec(value):
+        return value / elapsed if elapsed > 0 else 0.0
+
+    def await_(time_, count):
+        return float(time_) / count if count > 0 else 0.0
+
+    busy_time = getattr(delta, "busy_time", None)
+    if busy_time is None:
+        util = None
+    else:
+        # busy_time is in milliseconds
+        util = min(per_sec(busy_time) / 10 / ndisks, 100.0)
+    return _common.sdiskrate(
+        per_sec(delta.read_count),
+        per_sec(delta.write_count),
+        per_sec(delta.read_bytes),
+        per_sec(delta.write_bytes),
+        await_(delta.read_time, delta.read_count),
+        await_(delta.write_time, delta.write_count),
+        # Little's law: total time spent by requests / elapsed time
+        per_sec(delta.read_time + delta.write_time) / 1000,
+        util,
+        in_flight)
+
+
+_last_disk_io = None
+
+
+def disk_io_rates(interval=None, perdisk=False):
+    """Return system disk I/O rates as a namedtuple including the
+    following fields, similarly to "iostat -x":
+
+     - read_count:  reads per second (IOPS)
+     - write_count: writes per second (IOPS)
+     - read_bytes:  bytes read per second
+     - write_bytes: bytes written per second
+     - read_await:  average time spent by a read (in ms)
+     - write_await: average time spent by a write (in ms)
+     - queue_size:  average number of requests waiting or being
+                    served
+     - util:        percentage of time the disk was busy (None if
+                    not available); 100% does not necessarily mean
+                    saturation for devices serving requests in parallel
+     - in_flight:   number of requests in flight right now (Linux
+                    only, else None)
+
+    When *interval* is > 0.0 compares disk_io_counters() before and
+    after the interval (blocking).
+    When *interval* is 0.0 or None compares them against last call,
+    returning immediately. The first call returns zeroes.
+    These baselines are independent from disk_io_counters() and
+    numbers which overflow and wrap are taken into account.
+
+    If *perdisk* is True return the same information for every disk
+    as a dictionary. Disks which appear in between the two samples
+    are not returned until next call.
+    """
+    global _last_disk_io
+    if interval is not None and interval < 0:
+        raise ValueError("interval is not positive (got %r)" % interval)
+
+    def sample():
+        return _io_sample(_psplatform.disk_io_counters,
+                          'psutil.disk_io_rates')
+
+    if interval:
+        s1 = sample()
+        time.sleep(interval)
+    else:
+        s1 = _last_disk_io
+    s2 = _last_disk_io = sample()
+    elapsed, deltas = _io_deltas(s1 or s2, s2)
+    if hasattr(_psplatform, "disk_io_inflight"):
+        in_flight = _psplatform.disk_io_inflight(list(deltas))
+    else:
+        in_flight = {}
+    nt = getattr(_psplatform, "sdiskio", _common.sdiskio)
+    if perdisk:
+        return dict((disk, _disk_rates_calc(nt(*fields), elapsed,
+                                            in_flight=in_flight.get(disk)))
+                    for disk, fields in deltas.items())
+    if not deltas:
+        return None
+    total = nt(*[sum(x) for x in zip(*deltas.values())])
+    return _disk_rates_calc(
+        total, elapsed, ndisks=len(deltas),
+        in_flight=sum(in_flight.values()) if in_flight else None)
+
+
 # =====================================================================
 # --- network related functions
 # =====================================================================
@@ -2133,12 +2670,16 @@ def net_io_counters(pernic=False, nowrap=True):
     but never decrease.
     "disk_io_counters.cache_clear()" can be used to invalidate the
     cache.
+    *nowrap* may also be a WrapTracker instance, in which case it is
+    used in place of the cache shared by all callers.
     """
     rawdict = _psplatform.net_io_counters()
     if not rawdict:
         return {} if pernic else None
     if nowrap:
-        rawdict = _wrap_numbers(rawdict, 'psutil.net_io_counters')
+        if not isinstance(nowrap, WrapTracker):
+            nowrap = 'psutil.net_io_counters'
+        rawdict = _wrap_numbers(rawdict, nowrap)
     if pernic:
         for nic, fields in rawdict.items():
             rawdict[nic] = _common.snetio(*fields)
@@ -2152,7 +2693,53 @@ net_io_counters.cache_clear = functools.partial(
 net_io_counters.cache_clear.__doc__ = "Clears nowrap argument cache"
 
 
-def net_connections(kind='inet'):
+_last_net_io = None
+
+
+def net_io_rates(interval=None, pernic=False):
+    """Return network I/O rates as a namedtuple with the same fields
+    as net_io_counters() but expressed per second (bytes, packets,
+    errors and drops per second), similarly to "sar -n DEV".
+
+    *interval* has the same meaning as in disk_io_rates(): if > 0.0
+    counters are compared before and after the interval (blocking),
+    else against last call (the first call returns zeroes). Numbers
+    which overflow and wrap are taken into account.
+
+    If *pernic* is True return the same information for every
+    network interface as a dictionary. Interfaces which appear in
+    between the two samples are not returned until next call.
+    """
+    global _last_net_io
+    if interval is not None and interval < 0:
+        raise ValueError("interval is not positive (got %r)" % interval)
+
+    def sample():
+        return _io_sample(_psplatform.net_io_counters,
+                          'psutil.net_io_rates')
+
+    if interval:
+        s1 = sample()
+        time.sleep(interval)
+    else:
+        s1 = _last_net_io
+    s2 = _last_net_io = sample()
+    elapsed, deltas = _io_deltas(s1 or s2, s2)
+
+    def calculate(fields):
+        if elapsed <= 0:
+            return _common.snetio(*[0.0] * len(fields))
+        return _common.snetio(*[x / elapsed for x in fields])
+
+    if pernic:
+        return dict((nic, calculate(fields))
+                    for nic, fields in deltas.items())
+    if not deltas:
+        return None
+    return calculate([sum(x) for x in zip(*deltas.values())])
+
+
+def net_connections(kind='inet', cache=False):
     """Return system-wide socket connections as a list of
     (fd, family, type, laddr, raddr, status, pid) namedtuples.
     In case of limited privileges 'fd' and 'pid' may be set to -1
@@ -2177,10 +2764,84 @@ def net_connections(kind='inet'):
     +------------+----------------------------------------------------+
 
     On OSX this function requires root privileges.
+
+    On Linux, if *cache* is True, the socket inode -> PID map which
+    is needed to determine the owner of each connection is kept
+    across calls and only updated for new processes (or if a socket
+    can't be resolved), which is a lot faster on systems with many
+    processes and file descriptors.
+    "net_connections.cache_info()" and "net_connections.cache_clear()"
+    can be used to inspect and invalidate it.
+    On other platforms *cache* is ignored.
     """
+    if cache and hasattr(_psplatform.net_connections, "cache_info"):
+        return _psplatform.net_connections(kind, cache=True)
     return _psplatform.net_connections(kind)
 
 
+if hasattr(_psplatform.net_connections, "cache_info"):
+    net_connections.cache_clear = _psplatform.net_connections.cache_clear
+    net_connections.cache_info = _psplatform.net_connections.cache_info
+
+
+def net_connections_iter(kind='inet', status=None, lport=None, rport=None,
+                         pid=None):
+    """Same as net_connections() but return a generator yielding
+    connections as they are read, so that they don't have to be
+    held in memory all at once.
+    The following optional arguments can be used to only get the
+    connections matching them:
+
+     - status: a CONN_* constant or a sequence of them.
+     - lport: the local port.
+     - rport: the remote port.
+     - pid: the PID of the process which opened the socket.
+
+    On Linux sockets not matching these are discarded as soon as
+    they are read, before being decoded.
+    """
+    if hasattr(_psplatform, "net_connections_iter"):
+        return _psplatform.net_connections_iter(
+            kind, status=status, lport=lport, rport=rport, pid=pid)
+
+    # generic implementation
+    if isinstance(status, _basestring):
+        status = (status, )
+    if pid is not None:
+        conns = Process(pid).connections(kind)
+        conns = [_common.sconn(*(tuple(x) + (pid, ))) for x in conns]
+    else:
+        conns = net_connections(kind)
+    return (x for x in conns
+            if (status is None or x.status in status) and
+            (lport is None or getattr(x.laddr, 'port', None) == lport) and
+            (rport is None or getattr(x.raddr, 'port', None) == rport))
+
+
+def connections_by_pid(pids, kind='inet'):
+    """Return socket connections opened by multiple processes as a
+    {pid: [pconn, ...]} dict, where pconn namedtuples are the same as
+    returned by Process.connections(). *kind* has the same meaning
+    as in net_connections().
+    PIDs which no longer exist are not included in the returned
+    dict; AccessDenied is raised if a process can't be inspected.
+    On Linux system-wide socket tables are read only once instead
+    of once per process, which is a lot faster than calling
+    Process.connections() for each PID.
+    """
+    if hasattr(_psplatform, "connections_by_pid"):
+        return _psplatform.connections_by_pid(pids, kind)
+
+    # generic implementation
+    ret = {}
+    for pid in pids:
+        try:
+            ret[pid] = Process(pid).connections(kind)
+        except NoSuchProcess:
+            pass
+    return ret
+
+
 def net_if_addrs():
     """Return the addresses associated to each NIC (network interface
     card) installed on the system as a dictionary whose keys are the
@@ -2318,6 +2979,237 @@ if hasattr(_psplatform, "sensors_battery"):
     __all__.append("sensors_battery")
 
 
+# =====================================================================
+# --- background sampler
+# =====================================================================
+
+
+class Sampler(object):
+    """Periodically collect system-wide CPU, disk and network counters
+    in a background thread and keep them in a bounded history, so that
+    utilization over an arbitrary time window can be calculated without
+    blocking and without sharing state with other callers (as opposed
+    to cpu_percent(interval=None)).
+
+     - interval: seconds between two consecutive samples
+     - history: how many seconds of samples to retain; the oldest
+       samples are discarded as new ones are collected
+
+    >>> import psutil
+    >>> with psutil.Sampler(interval=1, history=60) as s:
+    ...     time.sleep(10)
+    ...     s.cpu_percent(window=10)
+    ...
+    3.4
+    >>>
+
+    All the query methods accept a *window* argument expressed in
+    seconds. The figures are calculated between the most recent sample
+    and the most recent sample which is at least *window* seconds
+    older. If not enough history has been collected yet the oldest
+    sample is used instead. If *window* is None the whole history is
+    used.
+
+    CPU, disk and network counters are collected independently: if
+    one of them fails the others are still sampled, and querying the
+    failing one raises the exception of the most recent attempt.
+    """
+
+    def __init__(self, interval=1.0, history=60.0):
+        if interval <= 0:
+            raise ValueError("interval is not positive (got %r)" % interval)
+        if history < interval:
+            raise ValueError("history (%r) can't be less than interval "
+                             "(%r)" % (history, interval))
+        self._interval = interval
+        self._history = history
+        self._samples = collections.deque(
+            maxlen=int(history / interval) + 1)
+        self._lock = threading.Lock()
+        # serializes samples, so that wrap trackers see them in order
+        self._sample_lock = threading.Lock()
+        # own wrap state, not shared with the module-level functions
+        self._disk_tracker = WrapTracker()
+        self._net_tracker = WrapTracker()
+        # {sample index: exception} of the groups which failed on
+        # the most recent sample
+        self._errors = {}
+        self._stopped = threading.Event()
+        self._thread = None
+        self._exc = None
+
+    def __repr__(self):
+        return "%s.%s(interval=%r, history=%r, running=%s)" % (
+            self.__class__.__module__, self.__class__.__name__,
+            self._interval, self._history, self.is_running())
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # --- internals
+
+    # indexes of the sample tuple
+    _CPU, _PERCPU, _DISK, _NET = 1, 2, 3, 4
+
+    def _take_sample(self):
+        """Return a (timestamp, cputimes, percpu, disks, nics) tuple
+        plus a {sample index: exception} dict of the groups which
+        could not be collected (and are None in the tuple).
+        """
+        errors = {}
+        with self._sample_lock:
+            sample = [_timer(), None, None, None, None]
+            try:
+                percpu = cpu_times(percpu=True)
+                sample[self._CPU] = _psplatform.scputimes(
+                    *[sum(x) for x in zip(*percpu)])
+                sample[self._PERCPU] = percpu
+            except Exception as err:
+                errors[self._CPU] = err
+            for idx, fun, tracker in (
+                    (self._DISK, disk_io_counters, self._disk_tracker),
+                    (self._NET, net_io_counters, self._net_tracker)):
+                try:
+                    sample[idx] = fun(True, nowrap=tracker)
+                except Exception as err:
+                    errors[idx] = err
+        return tuple(sample), errors
+
+    def _collect(self):
+        sample, errors = self._take_sample()
+        with self._lock:
+            self._samples.append(sample)
+            self._errors = errors
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._collect()
+            except Exception as err:
+                self._exc = err
+                break
+
+    def _get_pair(self, window, idx):
+        """Return the (older, newer) samples delimiting *window*,
+        considering only samples where group *idx* was collected.
+        """
+        if window is not None and window < 0:
+            raise ValueError("window is not positive (got %r)" % window)
+        if self._exc is not None:
+            exc, self._exc = self._exc, None
+            raise exc
+        with self._lock:
+            if not self._samples:
+                raise ValueError("sampler has not been started")
+            err = self._errors.get(idx)
+            samples = [x for x in self._samples if x[idx] is not None]
+        if err is not None:
+            raise err
+        if len(samples) == 1:
+            # not enough history yet; compare against a fresh sample
+            sample, errors = self._take_sample()
+            if idx in errors:
+                raise errors[idx]
+            samples.append(sample)
+        newer = samples[-1]
+        older = samples[0]
+        if window is not None:
+            for sample in reversed(samples[:-1]):
+                if newer[0] - sample[0] >= window:
+                    older = sample
+                    break
+        return older, newer
+
+    @staticmethod
+    def _diff_counters(nt, t1, t2):
+        return nt(*[b - a for a, b in zip(t1, t2)])
+
+    def _diff_dicts(self, nt, d1, d2, perkey):
+        ret = dict(
+            (k, self._diff_counters(nt, d1[k], d2[k])) for k in d2 if k in d1)
+        if perkey:
+            return ret
+        if not ret:
+            return None
+        return nt(*[sum(x) for x in zip(*ret.values())])
+
+    # --- public API
+
+    def start(self):
+        """Take a first sample and start collecting in background.
+        Calling this more than once has no effect.
+        """
+        if self.is_running():
+            return
+        self._stopped.clear()
+        self._exc = None
+        self._collect()
+        self._thread = threading.Thread(
+            target=self._run, name="psutil-sampler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop collecting samples. The history collected so far is
+        retained and can still be queried.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        """Return True if the sampling thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def cpu_percent(self, window=None, percpu=False):
+        """Same as psutil.cpu_percent() but calculated over the last
+        *window* seconds of history.
+        """
+        t1, t2 = self._get_pair(window, self._CPU)
+        if percpu:
+            return [_cpu_percent_calc(a, b) for a, b in zip(t1[2], t2[2])]
+        return _cpu_percent_calc(t1[1], t2[1])
+
+    def cpu_times_percent(self, window=None, percpu=False):
+        """Same as psutil.cpu_times_percent() but calculated over the
+        last *window* seconds of history.
+        """
+        t1, t2 = self._get_pair(window, self._CPU)
+        if percpu:
+            return [_cpu_times_percent_calc(a, b)
+                    for a, b in zip(t1[2], t2[2])]
+        return _cpu_times_percent_calc(t1[1], t2[1])
+
+    def disk_io_counters(self, window=None, perdisk=False):
+        """Return how much psutil.disk_io_counters() increased over the
+        last *window* seconds of history. Disks which appeared or
+        disappeared in the meantime are not taken into account.
+        """
+        t1, t2 = self._get_pair(window, self._DISK)
+        nt = getattr(_psplatform, "sdiskio", _common.sdiskio)
+        return self._diff_dicts(nt, t1[3], t2[3], perdisk)
+
+    def net_io_counters(self, window=None, pernic=False):
+        """Return how much psutil.net_io_counters() increased over the
+        last *window* seconds of history. NICs which appeared or
+        disappeared in the meantime are not taken into account.
+        """
+        t1, t2 = self._get_pair(window, self._NET)
+        return self._diff_dicts(_common.snetio, t1[4], t2[4], pernic)
+
+    def elapsed(self, window=None):
+        """Return the number of seconds actually spanned by *window*,
+        useful to turn the counters above into rates.
+        """
+        t1, t2 = self._get_pair(window, 0)
+        return t2[0] - t1[0]
+
+
 # =====================================================================
 # --- other system related functions
 # =====================================================================
@@ -2343,6 +3235,92 @@ def users():
     return _psplatform.users()
 
 
+_SNAPSHOT_FIELDS = (
+    'cpu_times', 'cpu_stats', 'virtual_memory', 'swap_memory',
+    'disk_io_counters', 'net_io_counters', 'boot_time')
+
+
+def system_snapshot(fields=None, percpu=False, perdisk=False,
+                    pernic=False):
+    """Return a dict including the system-wide metrics listed in
+    *fields* (default all), keyed by the name of the function which
+    returns them:
+
+     - cpu_times
+     - cpu_stats
+     - virtual_memory
+     - swap_memory
+     - disk_io_counters
+     - net_io_counters
+     - boot_time
+
+    plus a 'timestamp' key indicating when the snapshot was taken,
+    expressed in seconds from an arbitrary point in time (the same
+    clock used by Sampler and time.monotonic()).
+
+    *percpu*, *perdisk* and *pernic* are passed to cpu_times(),
+    disk_io_counters() and net_io_counters() respectively.
+
+    On Linux every /proc file involved (e.g. /proc/stat and
+    /proc/meminfo) is read only once, which is faster than calling
+    the functions above separately and also returns values which are
+    consistent with each other.
+    """
+    if fields is None:
+        fields = _SNAPSHOT_FIELDS
+    else:
+        if isinstance(fields, _basestring):
+            raise TypeError("fields must be a list or tuple")
+        invalid = set(fields) - set(_SNAPSHOT_FIELDS)
+        if invalid:
+            raise ValueError("invalid field name(s) %s (choose from %s)" % (
+                ", ".join(map(repr, sorted(invalid))),
+                ", ".join(map(repr, _SNAPSHOT_FIELDS))))
+    getters = dict(
+        cpu_times=lambda: cpu_times(percpu=percpu),
+        cpu_stats=cpu_stats,
+        virtual_memory=virtual_memory,
+        swap_memory=swap_memory,
+        disk_io_counters=lambda: disk_io_counters(perdisk=perdisk),
+        net_io_counters=lambda: net_io_counters(pernic=pernic),
+        boot_time=boot_time)
+
+    def collect():
+        ret = dict(timestamp=_timer())
+        for name in fields:
+            ret[name] = getters[name]()
+        return ret
+
+    if hasattr(_psplatform, "system_oneshot"):
+        with _psplatform.system_oneshot():
+            return collect()
+    return collect()
+
+
+if hasattr(_psplatform, "file_cache"):
+
+    def keep_files_open(enabled=True):
+        """Keep the system-wide /proc and /sys files read by psutil
+        (e.g. /proc/stat, /proc/meminfo or CPU frequency files) open
+        across calls and re-read them from offset 0 instead of
+        opening and closing them every time. This is useful for
+        monitoring tools which query the same metrics at a high rate.
+        Per-process files are never kept open.
+        Calling it with *enabled=False* closes all the cached file
+        descriptors.
+        "keep_files_open.cache_info()" returns the cache statistics.
+        """
+        cache = _psplatform.file_cache
+        if enabled:
+            cache.enabled = True
+        else:
+            cache.enabled = False
+            cache.cache_clear()
+
+    keep_files_open.cache_info = _psplatform.file_cache.cache_info
+    __all__.append("keep_files_open")
+
+
 # =====================================================================
 # --- Windows services
 # =====================================================================
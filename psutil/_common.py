@@ -9,16 +9,18 @@
 
 from __future__ import division
 
+import array
 import contextlib
 import errno
 import functools
+import itertools
+import operator
 import os
 import socket
 import stat
 import sys
 import threading
 import warnings
-from collections import defaultdict
 from collections import namedtuple
 from socket import AF_INET
 from socket import SOCK_DGRAM
@@ -59,11 +61,14 @@ __all__ = [
     # named tuples
     'pconn', 'pcputimes', 'pctxsw', 'pgids', 'pio', 'pionice', 'popenfile',
     'pthread', 'puids', 'sconn', 'scpustats', 'sdiskio', 'sdiskpart',
-    'sdiskusage', 'snetio', 'snic', 'snicstats', 'sswap', 'suser',
+    'sdiskrate', 'sdiskusage', 'snetio', 'snic', 'snicstats', 'sswap',
+    'suser',
     # utility functions
     'conn_tmap', 'deprecated_method', 'isfile_strict', 'memoize',
     'parse_environ_block', 'path_exists_strict', 'usage_percent',
     'supports_ipv6', 'sockfam_to_enum', 'socktype_to_enum', "wrap_numbers",
+    # classes
+    'WrapTracker',
 ]
 
 
@@ -168,6 +173,11 @@ sdiskusage = namedtuple('sdiskusage', ['total', 'used', 'free', 'percent'])
 sdiskio = namedtuple('sdiskio', ['read_count', 'write_count',
                                  'read_bytes', 'write_bytes',
                                  'read_time', 'write_time'])
+# psutil.disk_io_rates()
+sdiskrate = namedtuple('sdiskrate', ['read_count', 'write_count',
+                                     'read_bytes', 'write_bytes',
+                                     'read_await', 'write_await',
+                                     'queue_size', 'util', 'in_flight'])
 # psutil.disk_partitions()
 sdiskpart = namedtuple('sdiskpart', ['device', 'mountpoint', 'fstype', 'opts'])
 # psutil.net_io_counters()
@@ -473,100 +483,193 @@ def deprecated_method(replacement):
     return outer
 
 
-class _WrapNumbers:
+try:
+    array.array('Q')
+except ValueError:
+    # Python < 3.3
+    _ARRAY_TYPECODE = 'L'
+else:
+    _ARRAY_TYPECODE = 'Q'
+
+
+def _counters_array(values):
+    """Store *values* into a compact array of unsigned ints, falling
+    back on a list in case they don't fit (floats, or sums of wrapped
+    counters exceeding 2 ** 64).
+    """
+    try:
+        return array.array(_ARRAY_TYPECODE, values)
+    except (OverflowError, TypeError):
+        return list(values)
+
+
+class WrapTracker:
     """Watches numbers so that they don't overflow and wrap
     (reset to zero).
+
+    Each instance keeps its own state so independent consumers
+    don't interfere with each other. Values are stored flattened
+    into a single array and the last and current samples are
+    compared in one batch (with map() and operator.lt, both
+    implemented in C) rather than field by field, so that the cost
+    stays low even with thousands of disks or NICs. Keys which
+    disappear are forgotten together with their reminders.
     """
 
     def __init__(self):
         self.lock = threading.Lock()
-        self.cache = {}
-        self.reminders = {}
-        self.reminder_keys = {}
-
-    def _add_dict(self, input_dict, name):
-        assert name not in self.cache
-        assert name not in self.reminders
-        assert name not in self.reminder_keys
-        self.cache[name] = input_dict
-        self.reminders[name] = defaultdict(int)
-        self.reminder_keys[name] = defaultdict(set)
-
-    def _remove_dead_reminders(self, input_dict, name):
-        """In case the number of keys changed between calls (e.g. a
-        disk disappears) this removes the entry from self.reminders.
+        self._keys = None
+        self._slices = {}
+        self._last = None
+        self._reminders = None
+        self._wrapped = {}
+        self._input = None
+
+    def _relayout(self, keys, input_dict):
+        """The set of keys (or their order) changed since last call:
+        re-align last values and reminders to the new layout. New
+        keys get their own values as "last" values so they are never
+        considered as wrapped; gone keys are dropped.
         """
-        old_dict = self.cache[name]
-        gone_keys = set(old_dict.keys()) - set(input_dict.keys())
-        for gone_key in gone_keys:
-            for remkey in self.reminder_keys[name][gone_key]:
-                del self.reminders[name][remkey]
-            del self.reminder_keys[name][gone_key]
-
-    def run(self, input_dict, name):
+        slices = {}
+        last = []
+        reminders = []
+        wrapped = {}
+        pos = 0
+        for key in keys:
+            values = input_dict[key]
+            size = len(values)
+            slices[key] = (pos, pos + size)
+            old = self._slices.get(key)
+            if old is not None and old[1] - old[0] == size:
+                last.extend(self._last[old[0]:old[1]])
+                if key in self._wrapped:
+                    reminders.extend(self._reminders[old[0]:old[1]])
+                    wrapped[key] = self._wrapped[key]
+                else:
+                    reminders.extend([0] * size)
+            else:
+                last.extend(values)
+                reminders.extend([0] * size)
+            pos += size
+        self._keys = keys
+        self._slices = slices
+        self._last = _counters_array(last)
+        self._reminders = _counters_array(reminders)
+        self._wrapped = wrapped
+
+    def _add_reminders(self, old, indexes):
+        for i in indexes:
+            try:
+                self._reminders[i] += old[i]
+            except (OverflowError, TypeError):
+                self._reminders = list(self._reminders)
+                self._reminders[i] += old[i]
+        # map wrapped fields back to their keys (rare)
+        indexes = set(indexes)
+        for key, (start, stop) in self._slices.items():
+            hits = indexes.intersection(range(start, stop))
+            if hits:
+                self._wrapped.setdefault(key, set()).update(
+                    i - start for i in hits)
+
+    def run(self, input_dict):
         """Cache dict and sum numbers which overflow and wrap.
-        Return an updated copy of `input_dict`
+        Return an updated copy of `input_dict`.
         """
-        if name not in self.cache:
-            # This was the first call.
-            self._add_dict(input_dict, name)
-            return input_dict
+        with self.lock:
+            keys = tuple(input_dict)
+            if self._last is None:
+                # This was the first call.
+                self._relayout(keys, input_dict)
+                self._input = input_dict
+                return input_dict
+            if keys != self._keys:
+                self._relayout(keys, input_dict)
+            new = _counters_array(
+                list(itertools.chain.from_iterable(input_dict.values())))
+            old = self._last
+            if len(new) != len(old):
+                # the number of fields changed; start over
+                self._slices = {}
+                self._wrapped = {}
+                self._relayout(keys, input_dict)
+                old = self._last
+            if any(map(operator.lt, new, old)):
+                # it wrapped!
+                self._add_reminders(old, list(itertools.compress(
+                    range(len(new)), map(operator.lt, new, old))))
+            self._last = new
+            self._input = input_dict
+
+            ret = dict(input_dict)
+            for key in self._wrapped:
+                start, stop = self._slices[key]
+                ret[key] = tuple(map(operator.add, new[start:stop],
+                                     self._reminders[start:stop]))
+            return ret
+
+    def cache_info(self):
+        """Return the last input dict, the non-zero reminders as a
+        {(key, index): value} dict and the wrapped fields as a
+        {key: set((key, index))} dict.
+        """
+        with self.lock:
+            reminders = {}
+            reminder_keys = {}
+            for key, indexes in self._wrapped.items():
+                start = self._slices[key][0]
+                reminder_keys[key] = set((key, i) for i in indexes)
+                for i in indexes:
+                    reminders[(key, i)] = self._reminders[start + i]
+            return (self._input, reminders, reminder_keys)
+
 
-        self._remove_dead_reminders(input_dict, name)
+class _WrapNumbers:
+    """Keeps a WrapTracker instance for every function name, used by
+    wrap_numbers().
+    """
 
-        old_dict = self.cache[name]
-        new_dict = {}
-        for key in input_dict.keys():
-            input_tuple = input_dict[key]
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.trackers = {}
+
+    def run(self, input_dict, name):
+        with self.lock:
             try:
-                old_tuple = old_dict[key]
+                tracker = self.trackers[name]
             except KeyError:
-                # The input dict has a new key (e.g. a new disk or NIC)
-                # which didn't exist in the previous call.
-                new_dict[key] = input_tuple
-                continue
-
-            bits = []
-            for i in range(len(input_tuple)):
-                input_value = input_tuple[i]
-                old_value = old_tuple[i]
-                remkey = (key, i)
-                if input_value < old_value:
-                    # it wrapped!
-                    self.reminders[name][remkey] += old_value
-                    self.reminder_keys[name][key].add(remkey)
-                bits.append(input_value + self.reminders[name][remkey])
-
-            new_dict[key] = tuple(bits)
-
-        self.cache[name] = input_dict
-        return new_dict
+                tracker = self.trackers[name] = WrapTracker()
+        return tracker.run(input_dict)
 
     def cache_clear(self, name=None):
         """Clear the internal cache, optionally only for function 'name'."""
         with self.lock:
             if name is None:
-                self.cache.clear()
-                self.reminders.clear()
-                self.reminder_keys.clear()
+                self.trackers.clear()
             else:
-                self.cache.pop(name, None)
-                self.reminders.pop(name, None)
-                self.reminder_keys.pop(name, None)
+                self.trackers.pop(name, None)
 
     def cache_info(self):
         """Return internal cache dicts as a tuple of 3 elements."""
         with self.lock:
-            return (self.cache, self.reminders, self.reminder_keys)
+            trackers = list(self.trackers.items())
+        cache, reminders, reminder_keys = {}, {}, {}
+        for name, tracker in trackers:
+            cache[name], reminders[name], reminder_keys[name] = \
+                tracker.cache_info()
+        return (cache, reminders, reminder_keys)
 
 
 def wrap_numbers(input_dict, name):
     """Given an `input_dict` and a function `name`, adjust the numbers
     which "wrap" (restart from zero) across different calls by adding
     "old value" to "new value" and return an updated dict.
+    `name` may also be a WrapTracker instance owned by the caller.
     """
-    with _wn.lock:
-        return _wn.run(input_dict, name)
+    if isinstance(name, WrapTracker):
+        return name.run(input_dict)
+    return _wn.run(input_dict, name)
 
 
 _wn = _WrapNumbers()
@@ -8,15 +8,22 @@ from __future__ import division
 
 import base64
 import collections
+import contextlib
 import errno
+import fcntl
 import functools
 import glob
+import io
 import os
 import re
+import select
+import signal
 import socket
+import stat
 import struct
 import sys
-import traceback
+import threading
+import time
 import warnings
 from collections import defaultdict
 from collections import namedtuple
@@ -57,7 +64,10 @@ __extra__all__ = [
     # connection status constants
     "CONN_ESTABLISHED", "CONN_SYN_SENT", "CONN_SYN_RECV", "CONN_FIN_WAIT1",
     "CONN_FIN_WAIT2", "CONN_TIME_WAIT", "CONN_CLOSE", "CONN_CLOSE_WAIT",
-    "CONN_LAST_ACK", "CONN_LISTEN", "CONN_CLOSING", ]
+    "CONN_LAST_ACK", "CONN_LISTEN", "CONN_CLOSING",
+    # process_events() event types
+    "PROC_EVENT_FORK", "PROC_EVENT_EXEC", "PROC_EVENT_UID",
+    "PROC_EVENT_EXIT", ]
 
 
 # =====================================================================
@@ -66,9 +76,18 @@ __extra__all__ = [
 
 
 POWER_SUPPLY_PATH = "/sys/class/power_supply"
-HAS_SMAPS = os.path.exists('/proc/%s/smaps' % os.getpid())
 HAS_PRLIMIT = hasattr(cext, "linux_prlimit")
+HAS_SOCK_DIAG = hasattr(cext, "net_connections_inet")
+# Linux >= 5.3; the C wrapper is needed for Python < 3.9
+_pidfd_open = getattr(cext, "pidfd_open", getattr(os, "pidfd_open", None))
+HAS_PIDFD = _pidfd_open is not None and hasattr(select, "epoll")
+# Linux >= 5.1; the C wrapper is needed for Python < 3.9
+_pidfd_send_signal = getattr(cext, "pidfd_send_signal",
+                             getattr(signal, "pidfd_send_signal", None))
+# openat() (Python >= 3.3), needed to anchor Process instances
+HAS_DIR_FD = os.open in getattr(os, "supports_dir_fd", ())
 _DEFAULT = object()
+_timer = getattr(time, 'monotonic', time.time)
 
 # RLIMIT_* constants, not guaranteed to be present on all kernels
 if HAS_PRLIMIT:
@@ -80,6 +99,9 @@ if HAS_PRLIMIT:
 CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
 PAGESIZE = os.sysconf("SC_PAGE_SIZE")
 BOOT_TIME = None  # set later
+# Set on first use by set_scputimes_ntuple(), as it requires reading
+# /proc/stat.
+scputimes = None
 # Used when reading "big" files, namely /proc/{pid}/smaps and /proc/net/*.
 # On Python 2, using a buffer with open() for such files may result in a
 # speedup, see: https://github.com/giampaolo/psutil/issues/708
@@ -137,6 +159,29 @@ TCP_STATUSES = {
     "0B": _common.CONN_CLOSING
 }
 
+# same as above, but keyed by the numeric value NETLINK_SOCK_DIAG uses
+TCP_DIAG_STATUSES = dict((int(k, 16), v) for k, v in TCP_STATUSES.items())
+# a NETLINK_SOCK_DIAG bitmask matching all the TCP states psutil knows
+# about (1 = TCP_ESTABLISHED ... 11 = TCP_CLOSING), same as the sockets
+# listed in /proc/net/tcp*. Asking for more bits makes recent kernels
+# also dump sockets which are bound but never listened or connected
+# (TCP_BOUND_INACTIVE), reported as CLOSE.
+TCP_DIAG_ALL_STATES = ((1 << 11) - 1) << 1
+
+# process_events() event types
+PROC_EVENT_FORK = "fork"
+PROC_EVENT_EXEC = "exec"
+PROC_EVENT_UID = "uid"
+PROC_EVENT_EXIT = "exit"
+
+# https://github.com/torvalds/linux/blob/master/include/uapi/linux/cn_proc.h
+CN_PROC_EVENTS = {
+    0x00000001: PROC_EVENT_FORK,
+    0x00000002: PROC_EVENT_EXEC,
+    0x00000004: PROC_EVENT_UID,
+    0x80000000: PROC_EVENT_EXIT,
+}
+
 # these get overwritten on "import psutil" from the __init__.py file
 NoSuchProcess = None
 ZombieProcess = None
@@ -163,6 +208,9 @@ sdiskio = namedtuple(
 # psutil.Process().open_files()
 popenfile = namedtuple(
     'popenfile', ['path', 'fd', 'position', 'mode', 'flags'])
+# psutil.open_files_all()
+sopenfile = namedtuple(
+    'sopenfile', ['pid', 'fd', 'path', 'position', 'mode', 'flags', 'type'])
 # psutil.Process().memory_info()
 pmem = namedtuple('pmem', 'rss vms shared text lib data dirty')
 # psutil.Process().memory_full_info()
@@ -179,6 +227,19 @@ pmmap_ext = namedtuple(
 pio = namedtuple('pio', ['read_count', 'write_count',
                          'read_bytes', 'write_bytes',
                          'read_chars', 'write_chars'])
+# psutil.Process.threads()
+pthread = namedtuple('pthread', ['id', 'user_time', 'system_time', 'name',
+                                 'status', 'cpu_num', 'minor_faults',
+                                 'major_faults'])
+# psutil.net_connections.cache_info()
+sconncache = namedtuple('sconncache', ['hits', 'misses', 'scans', 'pids'])
+# psutil.file_users.cache_info()
+sfileindex = namedtuple('sfileindex', ['hits', 'misses', 'scans', 'pids'])
+# psutil.keep_files_open.cache_info()
+sfilecache = namedtuple('sfilecache', ['hits', 'misses', 'reopens', 'files'])
+# psutil.process_events()
+pevent = namedtuple('pevent', ['type', 'pid', 'ppid', 'exitcode', 'ruid',
+                               'euid'])
 
 
 # =====================================================================
@@ -204,6 +265,174 @@ def open_text(fname, **kwargs):
     return open(fname, "rt", **kwargs)
 
 
+if hasattr(os, 'pread'):
+    _pread = os.pread
+else:
+    def _pread(fd, size, offset):
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, size)
+
+
+class _FileHandleCache(object):
+    """Keeps system-wide /proc and /sys files (e.g. /proc/stat or
+    cpufreq's scaling_cur_freq) open, re-reading them with pread()
+    at offset 0 instead of opening and closing them on every call.
+    Per-process files are never cached as PIDs may be reused.
+    Disabled by default; see psutil.keep_files_open().
+    """
+    # errors meaning the fd is not usable anymore (e.g. the CPU or
+    # device it refers to was unplugged) but the path may be valid
+    REOPEN_ERRNOS = frozenset([errno.ESTALE, errno.ENODEV, errno.ENXIO,
+                               errno.ENOENT, errno.EBADF])
+    # Multi-record seq_files (e.g. /proc/diskstats) may return a short
+    # read before EOF if the next record (a line) doesn't fit in the
+    # buffer. A read shorter than the requested size by more than this
+    # is assumed to have reached EOF.
+    RECORD_SLACK = 1024
+
+    def __init__(self, maxsize=1024):
+        self.enabled = False
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._fds = {}
+        # last read size for each file, used as a hint for the next
+        # read so that the content is usually retrieved in one go
+        self._sizes = {}
+        self._hits = self._misses = self._reopens = 0
+
+    def is_cacheable(self, fname):
+        procfs_path = get_procfs_path()
+        if fname.startswith(procfs_path + '/'):
+            first = fname[len(procfs_path) + 1:].split('/', 1)[0]
+            if first.isdigit() or first in ('self', 'thread-self'):
+                return False
+        return True
+
+    def _open(self, fname):
+        try:
+            fd = os.open(fname, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+        except OSError as err:
+            # mimic open() (on Python 2 it raises IOError)
+            raise IOError(err.errno, err.strerror, fname)
+        if len(self._fds) >= self.maxsize:
+            self._close(next(iter(self._fds)))
+        self._fds[fname] = fd
+        return fd
+
+    def _close(self, fname):
+        fd = self._fds.pop(fname, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _read(self, fd, fname):
+        size = self._sizes.get(fname, 4096)
+        chunks = []
+        offset = 0
+        while True:
+            try:
+                chunk = _pread(fd, size, offset)
+            except OSError as err:
+                raise IOError(err.errno, err.strerror, fname)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            if len(chunk) < size - self.RECORD_SLACK:
+                # EOF; save another pread()
+                break
+        self._sizes[fname] = max(offset * 2, 4096)
+        return b"".join(chunks)
+
+    def read(self, fname):
+        """Return the content of *fname* as bytes. Raise IOError
+        on failure (as open() would).
+        """
+        with self._lock:
+            fd = self._fds.get(fname)
+            if fd is None:
+                self._misses += 1
+                return self._read(self._open(fname), fname)
+            self._hits += 1
+            try:
+                return self._read(fd, fname)
+            except IOError as err:
+                self._close(fname)
+                if err.errno not in self.REOPEN_ERRNOS:
+                    raise
+            self._reopens += 1
+            return self._read(self._open(fname), fname)
+
+    def cache_clear(self):
+        """Close all cached file handles."""
+        with self._lock:
+            for fname in list(self._fds):
+                self._close(fname)
+            self._sizes.clear()
+            self._hits = self._misses = self._reopens = 0
+
+    def cache_info(self):
+        with self._lock:
+            return sfilecache(self._hits, self._misses, self._reopens,
+                              len(self._fds))
+
+
+file_cache = _FileHandleCache()
+
+
+def read_file(fname):
+    """Return the whole content of a file as bytes, possibly using
+    the file handle cache.
+    """
+    if file_cache.enabled and file_cache.is_cacheable(fname):
+        return file_cache.read(fname)
+    with open_binary(fname) as f:
+        return f.read()
+
+
+# thread-local storage used by system_oneshot()
+_oneshot = threading.local()
+
+
+@contextlib.contextmanager
+def system_oneshot():
+    """Context manager which makes system-wide functions read every
+    /proc file they need only once, in order to speed up collecting
+    many metrics at once and make them consistent with each other.
+    The cache is only visible to the current thread.
+    """
+    if getattr(_oneshot, 'cache', None) is not None:
+        # nested call
+        yield
+        return
+    _oneshot.cache = {}
+    try:
+        yield
+    finally:
+        _oneshot.cache = None
+
+
+def open_oneshot(fname, binary=True):
+    """Same as open_binary() / open_text() but, within a
+    system_oneshot() context, the file is read only once and
+    subsequent calls are served from memory. Also the file handle
+    cache is used, if enabled.
+    """
+    cache = getattr(_oneshot, 'cache', None)
+    if cache is None:
+        if not file_cache.enabled:
+            return open_binary(fname) if binary else open_text(fname)
+        data = read_file(fname)
+    else:
+        try:
+            data = cache[fname]
+        except KeyError:
+            data = cache[fname] = read_file(fname)
+    if binary or not PY3:
+        return io.BytesIO(data)
+    return io.TextIOWrapper(io.BytesIO(data), encoding=ENCODING,
+                            errors=ENCODING_ERRS)
+
+
 if PY3:
     def decode(s):
         return s.decode(encoding=ENCODING, errors=ENCODING_ERRS)
@@ -295,6 +524,9 @@ def cat(fname, fallback=_DEFAULT, binary=True):
     binary: whether to open the file in binary or text mode.
     """
     try:
+        if file_cache.enabled and file_cache.is_cacheable(fname):
+            data = file_cache.read(fname)
+            return (data if binary else decode(data)).strip()
         with open_binary(fname) if binary else open_text(fname) as f:
             return f.read().strip()
     except IOError:
@@ -304,12 +536,20 @@ def cat(fname, fallback=_DEFAULT, binary=True):
             raise
 
 
-try:
-    set_scputimes_ntuple("/proc")
-except Exception:
-    # Don't want to crash at import time.
-    traceback.print_exc()
-    scputimes = namedtuple('scputimes', 'user system idle')(0.0, 0.0, 0.0)
+@memoize
+def has_proc_file(name):
+    """Return whether /proc/self/{name} is available on this kernel.
+    Optional /proc files are probed with a single stat() and never
+    opened; "io" and "smaps" are probed at import time since the
+    Process methods depending on them are only defined if available:
+
+    - smaps: kernel >= 2.6.14 with CONFIG_MMU
+    - smaps_rollup: Linux >= 4.14
+    - io: CONFIG_TASK_IO_ACCOUNTING
+    - task/{tid}/children: Linux >= 3.5 with CONFIG_PROC_CHILDREN
+    """
+    # {tid} refers to the main thread
+    return os.path.exists('/proc/self/%s' % name.format(tid=os.getpid()))
 
 
 # =====================================================================
@@ -349,7 +589,7 @@ def calculate_avail_vmem(mems):
     except KeyError:
         return fallback
     try:
-        f = open_binary('%s/zoneinfo' % get_procfs_path())
+        f = open_oneshot('%s/zoneinfo' % get_procfs_path())
     except IOError:
         return fallback  # kernel 2.6.13
 
@@ -388,7 +628,7 @@ def virtual_memory():
     """
     missing_fields = []
     mems = {}
-    with open_binary('%s/meminfo' % get_procfs_path()) as f:
+    with open_oneshot('%s/meminfo' % get_procfs_path()) as f:
         for line in f:
             fields = line.split()
             mems[fields[0]] = int(fields[1]) * 1024
@@ -490,7 +730,7 @@ def virtual_memory():
 def swap_memory():
     """Return swap memory metrics."""
     mems = {}
-    with open_binary('%s/meminfo' % get_procfs_path()) as f:
+    with open_oneshot('%s/meminfo' % get_procfs_path()) as f:
         for line in f:
             fields = line.split()
             mems[fields[0]] = int(fields[1]) * 1024
@@ -510,7 +750,7 @@ def swap_memory():
     percent = usage_percent(used, total, _round=1)
     # get pgin/pgouts
     try:
-        f = open_binary("%s/vmstat" % get_procfs_path())
+        f = open_oneshot("%s/vmstat" % get_procfs_path())
     except IOError as err:
         # see https://github.com/giampaolo/psutil/issues/722
         msg = "'sin' and 'sout' swap memory stats couldn't " \
@@ -554,7 +794,7 @@ def cpu_times():
     """
     procfs_path = get_procfs_path()
     set_scputimes_ntuple(procfs_path)
-    with open_binary('%s/stat' % procfs_path) as f:
+    with open_oneshot('%s/stat' % procfs_path) as f:
         values = f.readline().split()
     fields = values[1:len(scputimes._fields) + 1]
     fields = [float(x) / CLOCK_TICKS for x in fields]
@@ -568,7 +808,7 @@ def per_cpu_times():
     procfs_path = get_procfs_path()
     set_scputimes_ntuple(procfs_path)
     cpus = []
-    with open_binary('%s/stat' % procfs_path) as f:
+    with open_oneshot('%s/stat' % procfs_path) as f:
         # get rid of the first line which refers to system wide CPU stats
         f.readline()
         for line in f:
@@ -637,7 +877,7 @@ def cpu_count_physical():
 
 def cpu_stats():
     """Return various CPU stats as a named tuple."""
-    with open_binary('%s/stat' % get_procfs_path()) as f:
+    with open_oneshot('%s/stat' % get_procfs_path()) as f:
         ctx_switches = None
         interrupts = None
         soft_interrupts = None
@@ -707,6 +947,114 @@ class _Ipv6UnsupportedError(Exception):
     pass
 
 
+if LITTLE_ENDIAN:
+    def _decode_ipv4(ip):
+        n = int(ip, 16)
+        return "%d.%d.%d.%d" % (
+            n & 0xff, n >> 8 & 0xff, n >> 16 & 0xff, n >> 24)
+else:
+    def _decode_ipv4(ip):
+        n = int(ip, 16)
+        return "%d.%d.%d.%d" % (
+            n >> 24, n >> 16 & 0xff, n >> 8 & 0xff, n & 0xff)
+
+
+class _AddressDecoder:
+    """Decode all the "ip:port" address fields of a /proc/net/tcp* or
+    /proc/net/udp* file, returning the same values as
+    Connections.decode_address().
+    Results are memoized for the lifetime of the instance (one file):
+    the same local address usually shows up on thousands of rows
+    (e.g. a listening IP) and so does the IP part of many remote
+    addresses. IPv4 addresses are converted arithmetically instead
+    of going through base64.b16decode() and inet_ntop().
+    """
+
+    def __init__(self, family):
+        self.family = family
+        self.addrs = {}
+        self.ips = {}
+        if family == socket.AF_INET:
+            self.decode_ip = _decode_ipv4
+
+    def decode_ip(self, ip):
+        # let decode_address() deal with IPv6 (and its errors)
+        return Connections.decode_address(ip + ':1', self.family).ip
+
+    def __call__(self, addr):
+        ret = self.addrs.get(addr)
+        if ret is None:
+            ip, port = addr.split(':')
+            port = int(port, 16)
+            if not port:
+                ret = ()
+            else:
+                ipstr = self.ips.get(ip)
+                if ipstr is None:
+                    ipstr = self.ips[ip] = self.decode_ip(ip)
+                ret = _common.addr(ipstr, port)
+            self.addrs[addr] = ret
+        return ret
+
+
+class _RawConnFilters:
+    """The filters accepted by net_connections_iter() translated into
+    the raw form sockets are read in (hex strings from /proc/net/*,
+    ints and a TCP states bitmask for NETLINK_SOCK_DIAG), so that
+    rows can be discarded before being decoded.
+    """
+
+    def __init__(self, status=None, lport=None, rport=None):
+        self.status = status
+        self.lport = lport
+        self.rport = rport
+        if status is None:
+            self.tcp_hex_statuses = None
+            self.tcp_diag_states = TCP_DIAG_ALL_STATES
+        else:
+            self.tcp_hex_statuses = set(
+                k for k, v in TCP_STATUSES.items() if v in status)
+            self.tcp_diag_states = 0
+            for k in self.tcp_hex_statuses:
+                self.tcp_diag_states |= 1 << int(k, 16)
+            if _common.CONN_SYN_RECV in status:
+                # TCP_NEW_SYN_RECV (Linux >= 4.4), reported as SYN_RECV
+                self.tcp_diag_states |= 1 << 12
+        self.lport_hex = None if lport is None else ":%04X" % lport
+        self.rport_hex = None if rport is None else ":%04X" % rport
+
+    def skip_table(self, family, type_):
+        """Return True if no socket of this family and type can
+        possibly match.
+        """
+        if family == socket.AF_UNIX:
+            if self.lport is not None or self.rport is not None:
+                return True
+        if self.status is None:
+            return False
+        if type_ == socket.SOCK_STREAM and family != socket.AF_UNIX:
+            return not self.tcp_hex_statuses
+        return _common.CONN_NONE not in self.status
+
+
+_NO_FILTERS = _RawConnFilters()
+
+
+def _first_fd_per_pid(pairs):
+    """Given a list of (pid, fd) pairs referencing the same socket
+    return the first pair of each PID.
+    """
+    if len(pairs) == 1:
+        return pairs
+    seen = set()
+    ret = []
+    for pid, fd in pairs:
+        if pid not in seen:
+            seen.add(pid)
+            ret.append((pid, fd))
+    return ret
+
+
 class Connections:
     """A wrapper on top of /proc/net/* files, retrieving per-process
     and system-wide open connections (TCP, UDP, UNIX) similarly to
@@ -837,11 +1185,23 @@ class Connections:
         return _common.addr(ip, port)
 
     @staticmethod
-    def process_inet(file, family, type_, inodes, filter_pid=None):
-        """Parse /proc/net/tcp* and /proc/net/udp* files."""
+    def process_inet(file, family, type_, inodes, filter_pid=None,
+                     filters=_NO_FILTERS, all_owners=False):
+        """Parse /proc/net/tcp* and /proc/net/udp* files.
+        If *all_owners* is True a socket referenced by more than one
+        process is returned once per process (along with its first
+        fd, same as Process.connections()), else only once.
+        """
         if file.endswith('6') and not os.path.exists(file):
             # IPv6 not supported
             return
+        decode_address = _AddressDecoder(family)
+        if type_ == socket.SOCK_STREAM:
+            hex_statuses = filters.tcp_hex_statuses
+        else:
+            hex_statuses = None
+        lport_hex = filters.lport_hex
+        rport_hex = filters.rport_hex
         with open_text(file, buffering=BIGFILE_BUFFERING) as f:
             f.readline()  # skip the first line
             for lineno, line in enumerate(f, 1):
@@ -852,6 +1212,12 @@ class Connections:
                     raise RuntimeError(
                         "error while parsing %s; malformed line %s %r" % (
                             file, lineno, line))
+                if hex_statuses is not None and status not in hex_statuses:
+                    continue
+                if lport_hex is not None and not laddr.endswith(lport_hex):
+                    continue
+                if rport_hex is not None and not raddr.endswith(rport_hex):
+                    continue
                 if inode in inodes:
                     # # We assume inet sockets are unique, so we error
                     # # out if there are multiple references to the
@@ -859,22 +1225,126 @@ class Connections:
                     # if len(inodes[inode]) > 1 and family != socket.AF_UNIX:
                     #     raise ValueError("ambiguos inode with multiple "
                     #                      "PIDs references")
-                    pid, fd = inodes[inode][0]
-                else:
-                    pid, fd = None, -1
-                if filter_pid is not None and filter_pid != pid:
-                    continue
+                    pairs = inodes[inode]
+                    if all_owners:
+                        pairs = _first_fd_per_pid(pairs)
+                    else:
+                        pairs = pairs[:1]
                 else:
+                    pairs = [(None, -1)]
+                for pid, fd in pairs:
+                    if filter_pid is not None and filter_pid != pid:
+                        continue
                     if type_ == socket.SOCK_STREAM:
-                        status = TCP_STATUSES[status]
+                        cstatus = TCP_STATUSES[status]
                     else:
-                        status = _common.CONN_NONE
+                        cstatus = _common.CONN_NONE
                     try:
-                        laddr = Connections.decode_address(laddr, family)
-                        raddr = Connections.decode_address(raddr, family)
+                        caddr = decode_address(laddr)
+                        craddr = decode_address(raddr)
                     except _Ipv6UnsupportedError:
+                        break
+                    yield (fd, family, type_, caddr, craddr, cstatus, pid)
+
+    @staticmethod
+    def process_inet_diag(family, type_, inodes, filter_pid=None,
+                          filters=_NO_FILTERS, all_owners=False):
+        """Same as process_inet() but get TCP and UDP sockets from the
+        kernel via NETLINK_SOCK_DIAG, which is a lot faster than
+        parsing /proc/net/* text files. TCP status filtering is done
+        by the kernel, port filtering by the C extension.
+        Return a generator; OSError is raised immediately (not on
+        iteration) if netlink is not available.
+        """
+        lport = filters.lport if filters.lport is not None else -1
+        rport = filters.rport if filters.rport is not None else -1
+        if type_ == socket.SOCK_STREAM:
+            rawlist = cext.net_connections_inet(
+                family, socket.IPPROTO_TCP, filters.tcp_diag_states,
+                lport, rport)
+        else:
+            rawlist = cext.net_connections_inet(
+                family, socket.IPPROTO_UDP, TCP_DIAG_ALL_STATES,
+                lport, rport)
+
+        def gen():
+            for lip, lport, rip, rport, status, inode in rawlist:
+                inode = str(inode)
+                if inode in inodes:
+                    pairs = inodes[inode]
+                    if all_owners:
+                        pairs = _first_fd_per_pid(pairs)
+                    else:
+                        pairs = pairs[:1]
+                else:
+                    pairs = [(None, -1)]
+                for pid, fd in pairs:
+                    if filter_pid is not None and filter_pid != pid:
                         continue
-                    yield (fd, family, type_, laddr, raddr, status, pid)
+                    if type_ == socket.SOCK_STREAM:
+                        cstatus = TCP_DIAG_STATUSES[status]
+                    else:
+                        cstatus = _common.CONN_NONE
+                    # this usually refers to a local socket in listen
+                    # mode with no end-points connected
+                    laddr = _common.addr(lip, lport) if lport else ()
+                    raddr = _common.addr(rip, rport) if rport else ()
+                    yield (fd, family, type_, laddr, raddr, cstatus, pid)
+
+        return gen()
+
+    @staticmethod
+    def process_unix_diag(family, inodes, filter_pid=None):
+        """Same as process_unix() but get UNIX sockets from the kernel
+        via NETLINK_SOCK_DIAG.
+        Return a list; OSError is raised if netlink is not available.
+        """
+        ret = []
+        for type_, inode, path in cext.net_connections_unix():
+            inode = str(inode)
+            if inode in inodes:
+                pairs = inodes[inode]
+            else:
+                pairs = [(None, -1)]
+            for pid, fd in pairs:
+                if filter_pid is not None and filter_pid != pid:
+                    continue
+                ret.append((fd, family, type_, path, "", _common.CONN_NONE,
+                            pid))
+        return ret
+
+    def _iter_table(self, f, family, type_, inodes, filter_pid,
+                    filters=_NO_FILTERS, all_owners=False):
+        """Return the (fd, family, type, laddr, raddr, status, pid)
+        tuples of a /proc/net/{f} table, using NETLINK_SOCK_DIAG if
+        possible, else falling back on parsing the file.
+        """
+        if filters.skip_table(family, type_):
+            return []
+        # netlink only talks about the network namespace we're in,
+        # which may not be the one of a custom PROCFS_PATH
+        if HAS_SOCK_DIAG and self._procfs_path == '/proc':
+            try:
+                if family in (socket.AF_INET, socket.AF_INET6):
+                    return self.process_inet_diag(
+                        family, type_, inodes, filter_pid=filter_pid,
+                        filters=filters, all_owners=all_owners)
+                else:
+                    return self.process_unix_diag(
+                        family, inodes, filter_pid=filter_pid)
+            except OSError:
+                # e.g. netlink sockets are not permitted (seccomp) or
+                # the *_diag kernel module is not loaded
+                pass
+        if family in (socket.AF_INET, socket.AF_INET6):
+            return self.process_inet(
+                "%s/net/%s" % (self._procfs_path, f),
+                family, type_, inodes, filter_pid=filter_pid,
+                filters=filters, all_owners=all_owners)
+        else:
+            return self.process_unix(
+                "%s/net/%s" % (self._procfs_path, f),
+                family, inodes, filter_pid=filter_pid)
 
     @staticmethod
     def process_unix(file, family, inodes, filter_pid=None):
@@ -914,7 +1384,7 @@ class Connections:
                         status = _common.CONN_NONE
                         yield (fd, family, type_, path, raddr, status, pid)
 
-    def retrieve(self, kind, pid=None):
+    def retrieve(self, kind, pid=None, index=None):
         if kind not in self.tmap:
             raise ValueError("invalid %r kind argument; choose between %s"
                              % (kind, ', '.join([repr(x) for x in self.tmap])))
@@ -924,18 +1394,91 @@ class Connections:
             if not inodes:
                 # no connections for this process
                 return []
+        elif index is not None:
+            with index.lock:
+                index.refresh(self)
+                return self._retrieve(kind, index, pid)
         else:
             inodes = self.get_all_inodes()
+        return self._retrieve(kind, inodes, pid)
+
+    def retrieve_iter(self, kind, status=None, lport=None, rport=None,
+                      pid=None):
+        """Same as retrieve() but return a generator of sconn tuples
+        which are yielded as they are read, discarding the ones not
+        matching *status*, *lport*, *rport* and *pid* before they
+        are decoded.
+        """
+        if kind not in self.tmap:
+            raise ValueError("invalid %r kind argument; choose between %s"
+                             % (kind, ', '.join([repr(x) for x in self.tmap])))
+        if isinstance(status, basestring):
+            status = (status, )
+        filters = _RawConnFilters(status=status, lport=lport, rport=rport)
+        self._procfs_path = procfs_path = get_procfs_path()
+        if pid is not None:
+            try:
+                inodes = self.get_proc_inodes(pid)
+            except OSError as err:
+                if err.errno in (errno.ENOENT, errno.ESRCH):
+                    raise NoSuchProcess(pid)
+                if err.errno in (errno.EPERM, errno.EACCES):
+                    raise AccessDenied(pid)
+                raise
+            if not inodes:
+                # no connections for this process
+                return iter([])
+        else:
+            inodes = self.get_all_inodes()
+        return self._retrieve_iter(kind, inodes, pid, filters, procfs_path)
+
+    def _retrieve_iter(self, kind, inodes, pid, filters, procfs_path):
+        for f, family, type_ in self.tmap[kind]:
+            # this instance is shared: another call may have changed
+            # it in the meantime
+            self._procfs_path = procfs_path
+            ls = self._iter_table(f, family, type_, inodes, pid, filters)
+            for fd, family, type_, laddr, raddr, status, bound_pid in ls:
+                yield _common.sconn(fd, family, type_, laddr, raddr,
+                                    status, bound_pid)
+
+    def retrieve_by_pid(self, kind, pids):
+        """Return connections of multiple processes as a
+        {pid: [pconn, ...]} dict, reading every /proc/net/* table only
+        once. PIDs which no longer exist are not included.
+        """
+        if kind not in self.tmap:
+            raise ValueError("invalid %r kind argument; choose between %s"
+                             % (kind, ', '.join([repr(x) for x in self.tmap])))
+        self._procfs_path = get_procfs_path()
+        inodes = defaultdict(list)
+        ret = {}
+        for pid in pids:
+            try:
+                proc_inodes = self.get_proc_inodes(pid)
+            except OSError as err:
+                if err.errno in (errno.ENOENT, errno.ESRCH):
+                    continue
+                if err.errno in (errno.EPERM, errno.EACCES):
+                    raise AccessDenied(pid)
+                raise
+            ret[pid] = set()
+            for inode, pairs in proc_inodes.items():
+                inodes[inode].extend(pairs)
+        if inodes:
+            for f, family, type_ in self.tmap[kind]:
+                ls = self._iter_table(f, family, type_, inodes, None,
+                                      all_owners=True)
+                for fd, family, type_, laddr, raddr, status, pid in ls:
+                    if pid is not None:
+                        ret[pid].add(_common.pconn(fd, family, type_, laddr,
+                                                   raddr, status))
+        return dict((pid, list(conns)) for pid, conns in ret.items())
+
+    def _retrieve(self, kind, inodes, pid):
         ret = set()
         for f, family, type_ in self.tmap[kind]:
-            if family in (socket.AF_INET, socket.AF_INET6):
-                ls = self.process_inet(
-                    "%s/net/%s" % (self._procfs_path, f),
-                    family, type_, inodes, filter_pid=pid)
-            else:
-                ls = self.process_unix(
-                    "%s/net/%s" % (self._procfs_path, f),
-                    family, inodes, filter_pid=pid)
+            ls = self._iter_table(f, family, type_, inodes, pid)
             for fd, family, type_, laddr, raddr, status, bound_pid in ls:
                 if pid:
                     conn = _common.pconn(fd, family, type_, laddr, raddr,
@@ -947,19 +1490,179 @@ class Connections:
         return list(ret)
 
 
+def _fd_count(procfs_path, pid):
+    """Return the number of fds opened by *pid*, as reported by the
+    size of /proc/{pid}/fd on Linux >= 6.2, else 0.
+    """
+    try:
+        return os.stat("%s/%s/fd" % (procfs_path, pid)).st_size
+    except OSError:
+        return 0
+
+
+class _SocketInodeIndex:
+    """A {inode: [(pid, fd), ...]} map of socket inodes which is kept
+    across net_connections(cache=True) calls, so that we don't have
+    to readlink() every fd of every process each time.
+    On every call PIDs which are gone are forgotten and the fd dir
+    of new PIDs is scanned. Hits are checked against
+    /proc/{pid}/fd/{fd}: if the fd was closed or now refers to
+    something else (e.g. the PID was reused) only that PID is
+    scanned again. On the first miss of a call only the PIDs whose
+    number of fds changed since they were scanned are scanned again
+    (the number is known on Linux >= 6.2 only); inodes which can't
+    be resolved after that are reported with no PID.
+    The instance acts as the 'inodes' dict expected by
+    Connections.process_inet() and Connections.process_unix().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.conns = None
+        self.procfs_path = None
+        # {pid: (nfds, {inode: [(pid, fd), ...]})}
+        self.procs = {}
+        # {inode: {pid: [(pid, fd), ...]}}
+        self.inodes = {}
+        self.unresolved = set()
+        self.rescanned = False
+        self.hits = 0
+        self.misses = 0
+        self.scans = 0
+
+    def _scan(self, pid):
+        self.scans += 1
+        # count first: fds opened in the meantime are re-checked on
+        # next miss
+        nfds = _fd_count(self.procfs_path, pid)
+        try:
+            return (nfds, self.conns.get_proc_inodes(pid))
+        except OSError as err:
+            # same as Connections.get_all_inodes()
+            if err.errno not in (
+                    errno.ENOENT, errno.ESRCH, errno.EPERM, errno.EACCES):
+                raise
+            return (nfds, {})
+
+    def _set(self, pid, entry):
+        """Replace the sockets indexed for *pid* with *entry*, as
+        returned by _scan(), or forget *pid* if *entry* is None.
+        """
+        old = self.procs.pop(pid, None)
+        if old is not None:
+            for inode in old[1]:
+                owners = self.inodes.get(inode)
+                if owners is not None:
+                    owners.pop(pid, None)
+                    if not owners:
+                        del self.inodes[inode]
+        if entry is not None:
+            self.procs[pid] = entry
+            for inode, pairs in entry[1].items():
+                self.inodes.setdefault(inode, {})[pid] = pairs
+
+    def refresh(self, conns):
+        """Update the index against the PIDs currently running."""
+        self.conns = conns
+        if conns._procfs_path != self.procfs_path:
+            self.procs = {}
+            self.inodes = {}
+            self.procfs_path = conns._procfs_path
+        current = set(pids())
+        for pid in [x for x in self.procs if x not in current]:
+            self._set(pid, None)
+        for pid in current:
+            if pid not in self.procs:
+                self._set(pid, self._scan(pid))
+        self.unresolved.clear()
+        self.rescanned = False
+
+    def _alive(self, pid, fd, inode):
+        # make sure the fd still refers to the indexed socket
+        try:
+            target = readlink("%s/%s/fd/%s" % (self.procfs_path, pid, fd))
+        except OSError:
+            return False
+        return target == "socket:[%s]" % inode
+
+    def __contains__(self, inode):
+        owners = self.inodes.get(inode)
+        if owners:
+            for pid, pairs in list(owners.items()):
+                if not all(self._alive(pid, fd, inode) for _, fd in pairs):
+                    # closed, replaced or PID reused: scan it again
+                    self._set(pid, self._scan(pid))
+            if inode in self.inodes:
+                self.hits += 1
+                return True
+        if inode in self.unresolved:
+            return False
+        self.misses += 1
+        if not self.rescanned:
+            # a socket we don't know about, likely created by a
+            # process after it was indexed
+            self.rescanned = True
+            for pid, (nfds, _) in list(self.procs.items()):
+                if _fd_count(self.procfs_path, pid) != nfds:
+                    self._set(pid, self._scan(pid))
+            if inode in self.inodes:
+                return True
+        self.unresolved.add(inode)
+        return False
+
+    def __getitem__(self, inode):
+        # same as Connections.get_all_inodes(), where the highest PID
+        # sharing a socket wins
+        owners = self.inodes[inode]
+        return owners[max(owners)]
+
+    def cache_clear(self):
+        """Clear the internal index."""
+        with self.lock:
+            self._reset()
+
+    def cache_info(self):
+        """Return index hit/miss statistics as a namedtuple."""
+        with self.lock:
+            return sconncache(self.hits, self.misses, self.scans,
+                              len(self.procs))
+
+
 _connections = Connections()
+_socket_inode_index = _SocketInodeIndex()
 
 
-def net_connections(kind='inet'):
+def net_connections(kind='inet', cache=False):
     """Return system-wide open connections."""
+    if cache:
+        return _connections.retrieve(kind, index=_socket_inode_index)
     return _connections.retrieve(kind)
 
 
+net_connections.cache_clear = _socket_inode_index.cache_clear
+net_connections.cache_info = _socket_inode_index.cache_info
+
+
+def net_connections_iter(kind='inet', status=None, lport=None, rport=None,
+                         pid=None):
+    """Return a generator of system-wide open connections."""
+    return _connections.retrieve_iter(kind, status=status, lport=lport,
+                                      rport=rport, pid=pid)
+
+
+def connections_by_pid(pids, kind='inet'):
+    """Return open connections of multiple processes as a dict."""
+    return _connections.retrieve_by_pid(kind, pids)
+
+
 def net_io_counters():
     """Return network I/O statistics for every network interface
     installed on the system as a dict of raw tuples.
     """
-    with open_text("%s/net/dev" % get_procfs_path()) as f:
+    with open_oneshot("%s/net/dev" % get_procfs_path(), binary=False) as f:
         lines = f.readlines()
     retdict = {}
     for line in lines[2:]:
@@ -1015,33 +1718,72 @@ def net_if_stats():
 disk_usage = _psposix.disk_usage
 
 
+def get_partitions():
+    """Return the names of the disks and partitions listed in
+    /proc/partitions we want to report. Used by disk_io_counters().
+    """
+    partitions = []
+    with open_oneshot("%s/partitions" % get_procfs_path(),
+                      binary=False) as f:
+        lines = f.readlines()[2:]
+    for line in reversed(lines):
+        _, _, _, name = line.split()
+        if name[-1].isdigit():
+            # we're dealing with a partition (e.g. 'sda1'); 'sda' will
+            # also be around but we want to omit it
+            partitions.append(name)
+        else:
+            if not partitions or not partitions[-1].startswith(name):
+                # we're dealing with a disk entity for which no
+                # partitions have been defined (e.g. 'sda' but
+                # 'sda1' was not around), see:
+                # https://github.com/giampaolo/psutil/issues/338
+                partitions.append(name)
+    return partitions
+
+
+class _DiskTopology:
+    """Caches the devices listed in /proc/partitions we want to
+    report and their sector size, so that disk_io_counters() doesn't
+    have to read /proc/partitions and one sysfs file per device on
+    every call. Both are re-read only when the devices listed in
+    /proc/diskstats change (e.g. a disk is plugged or a loop / dm
+    device is created).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cache_clear()
+
+    def cache_clear(self):
+        """Forget the cached devices."""
+        self.key = None
+        self.sector_sizes = {}
+
+    def get(self, names):
+        """Given the device names listed in /proc/diskstats return
+        a {name: sector_size} dict of the devices to report.
+        """
+        key = (get_procfs_path(), tuple(names))
+        with self.lock:
+            if key != self.key:
+                wanted = set(get_partitions())
+                self.sector_sizes = dict(
+                    (name, get_sector_size(name)) for name in names
+                    if name in wanted)
+                self.key = key
+            return self.sector_sizes
+
+
+_disk_topology = _DiskTopology()
+
+
 def disk_io_counters():
     """Return disk I/O statistics for every disk installed on the
     system as a dict of raw tuples.
     """
-    # determine partitions we want to look for
-    def get_partitions():
-        partitions = []
-        with open_text("%s/partitions" % get_procfs_path()) as f:
-            lines = f.readlines()[2:]
-        for line in reversed(lines):
-            _, _, _, name = line.split()
-            if name[-1].isdigit():
-                # we're dealing with a partition (e.g. 'sda1'); 'sda' will
-                # also be around but we want to omit it
-                partitions.append(name)
-            else:
-                if not partitions or not partitions[-1].startswith(name):
-                    # we're dealing with a disk entity for which no
-                    # partitions have been defined (e.g. 'sda' but
-                    # 'sda1' was not around), see:
-                    # https://github.com/giampaolo/psutil/issues/338
-                    partitions.append(name)
-        return partitions
-
-    retdict = {}
-    partitions = get_partitions()
-    with open_text("%s/diskstats" % get_procfs_path()) as f:
+    rows = []
+    with open_oneshot("%s/diskstats" % get_procfs_path(), binary=False) as f:
         lines = f.readlines()
     for line in lines:
         # OK, this is a bit confusing. The format of /proc/diskstats can
@@ -1077,16 +1819,39 @@ def disk_io_counters():
             rtime = wtime = reads_merged = writes_merged = busy_time = 0
         else:
             raise ValueError("not sure how to interpret line %r" % line)
+        rows.append((name, reads, writes, rbytes, wbytes, rtime, wtime,
+                     reads_merged, writes_merged, busy_time))
 
-        if name in partitions:
-            ssize = get_sector_size(name)
-            rbytes *= ssize
-            wbytes *= ssize
-            retdict[name] = (reads, writes, rbytes, wbytes, rtime, wtime,
-                             reads_merged, writes_merged, busy_time)
+    # /proc/partitions and sector sizes are only read if the devices
+    # changed since last call
+    sector_sizes = _disk_topology.get([x[0] for x in rows])
+    retdict = {}
+    for (name, reads, writes, rbytes, wbytes, rtime, wtime, reads_merged,
+            writes_merged, busy_time) in rows:
+        ssize = sector_sizes.get(name)
+        if ssize is not None:
+            retdict[name] = (reads, writes, rbytes * ssize, wbytes * ssize,
+                             rtime, wtime, reads_merged, writes_merged,
+                             busy_time)
     return retdict
 
 
+def disk_io_inflight(names):
+    """Return the number of I/O requests currently in flight for the
+    given disks and partitions as a {name: count} dict, as listed in
+    /sys/class/block/{name}/inflight ("reads writes").
+    """
+    ret = {}
+    for name in names:
+        data = cat("/sys/class/block/%s/inflight" % name, fallback=None)
+        if data is not None:
+            try:
+                ret[name] = sum(map(int, data.split()))
+            except ValueError:
+                pass
+    return ret
+
+
 def disk_partitions(all=False):
     """Return mounted disk partitions as a list of namedtuples."""
     fstypes = set()
@@ -1303,7 +2068,7 @@ def boot_time():
     """Return the system boot time expressed in seconds since the epoch."""
     global BOOT_TIME
     path = '%s/stat' % get_procfs_path()
-    with open_binary(path) as f:
+    with open_oneshot(path) as f:
         for line in f:
             if line.startswith(b'btime'):
                 ret = float(line.strip().split()[1])
@@ -1323,6 +2088,263 @@ def pids():
     return [int(x) for x in os.listdir(b(get_procfs_path())) if x.isdigit()]
 
 
+def ppid_map():
+    """Obtain a {pid: ppid, ...} dict for all running processes in
+    one shot. Used to speed up Process.children().
+    """
+    return cext.ppid_map(get_procfs_path())
+
+
+_FD_TYPES = (
+    (stat.S_ISREG, "file"),
+    (stat.S_ISDIR, "dir"),
+    (stat.S_ISSOCK, "socket"),
+    (stat.S_ISFIFO, "fifo"),
+    (stat.S_ISCHR, "chardev"),
+    (stat.S_ISBLK, "blockdev"),
+)
+
+
+def open_files_all(pids):
+    """Return a generator yielding the file descriptors opened by
+    *pids* as sopenfile namedtuples. The fd and fdinfo directories of
+    each process are inspected in C, one process at a time.
+    Processes which are gone or can't be inspected are skipped.
+    """
+    procfs_path = get_procfs_path()
+    for pid in pids:
+        try:
+            rawlist = cext.proc_open_fds("%s/%s" % (procfs_path, pid))
+        except EnvironmentError as err:
+            if err.errno in (errno.ENOENT, errno.ESRCH, errno.EPERM,
+                             errno.EACCES):
+                continue
+            raise
+        for fd, path, pos, flags, mode, _, _ in rawlist:
+            if PY3:
+                path = decode(path)
+            for fun, type_ in _FD_TYPES:
+                if fun(mode):
+                    break
+            else:
+                type_ = "anon_inode" if path.startswith("anon_inode:") \
+                    else "unknown"
+            if type_ in ("file", "dir"):
+                # see readlink()
+                if path.endswith(' (deleted)') and \
+                        not path_exists_strict(path):
+                    path = path[:-10]
+            mode_ = file_flags_to_mode(flags) if flags != -1 else ''
+            yield sopenfile(pid, fd, path, pos, mode_, flags, type_)
+
+
+def unix_socket_inodes(path):
+    """Return the inodes of the UNIX sockets bound to *path*, as
+    listed in /proc/net/unix.
+    """
+    ret = set()
+    with open_text("%s/net/unix" % get_procfs_path()) as f:
+        f.readline()  # skip the first line
+        for line in f:
+            tokens = line.split()
+            if len(tokens) >= 8 and tokens[7] == path:
+                ret.add(int(tokens[6]))
+    return ret
+
+
+class _FileInodeIndex:
+    """A {(st_dev, st_ino): [(pid, fd), ...]} index of the files
+    opened by all processes, used by file_users(). It is built by
+    scanning the fd dir of every process in C (proc_open_fds()).
+    If kept across calls (file_users(cache=True)) PIDs which are gone
+    are forgotten and the fd dir is scanned only for PIDs which are
+    new or have been reused (different creation time). Results are
+    checked against the actual fds before being returned and PIDs
+    whose fds changed are scanned again. If a path turns out to have
+    no users only the PIDs whose number of fds changed are scanned
+    again (at most once per call), same as _SocketInodeIndex.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.procfs_path = None
+        # {pid: (starttime, nfds, rows)}
+        self.procs = {}
+        # {(dev, ino): [(pid, fd), ...]}
+        self.inodes = {}
+        # {socket inode: [(pid, fd), ...]}
+        self.sockets = {}
+        # {path of a deleted file: [(pid, fd), ...]}
+        self.deleted = {}
+        # {(pid, fd): (dev, ino)}
+        self.fds = {}
+        self.rechecked = False
+        self.hits = 0
+        self.misses = 0
+        self.scans = 0
+
+    def _scan(self, pid, starttime):
+        self.scans += 1
+        nfds = _fd_count(self.procfs_path, pid)
+        try:
+            rows = cext.proc_open_fds("%s/%s" % (self.procfs_path, pid))
+        except EnvironmentError as err:
+            # same as open_files_all()
+            if err.errno not in (
+                    errno.ENOENT, errno.ESRCH, errno.EPERM, errno.EACCES):
+                raise
+            rows = []
+        return (starttime, nfds, rows)
+
+    def _index_rows(self, pid, rows, add):
+        for fd, path, _, _, mode, dev, ino in rows:
+            if not mode:
+                continue
+            pair = (pid, fd)
+            if stat.S_ISSOCK(mode):
+                keys = [(self.sockets, ino)]
+            else:
+                keys = [(self.inodes, (dev, ino))]
+                if path.endswith(b' (deleted)'):
+                    path = path[:-10]
+                    keys.append((self.deleted, decode(path) if PY3 else path))
+            if add:
+                self.fds[pair] = (dev, ino)
+            else:
+                self.fds.pop(pair, None)
+            for dct, key in keys:
+                if add:
+                    dct.setdefault(key, []).append(pair)
+                else:
+                    pairs = dct.get(key)
+                    if pairs is not None and pair in pairs:
+                        pairs.remove(pair)
+                        if not pairs:
+                            del dct[key]
+
+    def _set(self, pid, entry):
+        """Replace the files indexed for *pid* with *entry*, as
+        returned by _scan(), or forget *pid* if *entry* is None.
+        """
+        old = self.procs.pop(pid, None)
+        if old is not None:
+            self._index_rows(pid, old[2], False)
+        if entry is not None:
+            self.procs[pid] = entry
+            self._index_rows(pid, entry[2], True)
+
+    def _rescan(self, pid):
+        self._set(pid, self._scan(pid, self.procs[pid][0]))
+
+    def refresh(self):
+        """Update the index against the PIDs currently running."""
+        procfs_path = get_procfs_path()
+        if procfs_path != self.procfs_path:
+            for pid in list(self.procs):
+                self._set(pid, None)
+            self.procfs_path = procfs_path
+        current = {}
+        for pid in pids():
+            try:
+                with open_binary("%s/%s/stat" % (procfs_path, pid)) as f:
+                    current[pid] = cext.proc_parse_stat(f.read())[8]
+            except EnvironmentError as err:
+                if err.errno in (errno.ENOENT, errno.ESRCH):
+                    # process is gone
+                    continue
+                raise
+        for pid in [x for x in self.procs if x not in current]:
+            self._set(pid, None)
+        for pid, starttime in current.items():
+            old = self.procs.get(pid)
+            if old is None or old[0] != starttime:
+                self._set(pid, self._scan(pid, starttime))
+        self.rechecked = False
+
+    def _alive(self, pid, fd):
+        # make sure the fd still refers to the indexed file
+        try:
+            st = os.stat("%s/%s/fd/%s" % (self.procfs_path, pid, fd))
+        except OSError:
+            return False
+        return (st.st_dev, st.st_ino) == self.fds.get((pid, fd))
+
+    def _lookup(self, path):
+        ret = set(self.deleted.get(os.path.abspath(path), ()))
+        try:
+            st = os.stat(path)
+        except OSError as err:
+            if err.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+        else:
+            if stat.S_ISSOCK(st.st_mode):
+                for inode in unix_socket_inodes(path):
+                    ret.update(self.sockets.get(inode, ()))
+            else:
+                ret.update(self.inodes.get((st.st_dev, st.st_ino), ()))
+        return ret
+
+    def lookup(self, paths, cached=False):
+        """Return a {path: [(pid, fd), ...]} dict."""
+        self.refresh()
+        ret = {}
+        for path in paths:
+            users = self._lookup(path)
+            if cached:
+                stale = set(pid for pid, fd in users
+                            if not self._alive(pid, fd))
+                if stale:
+                    # fds closed or replaced in the meantime
+                    for pid in stale:
+                        self._rescan(pid)
+                    users = self._lookup(path)
+                if users:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    if not self.rechecked:
+                        # the file may have been opened by an indexed
+                        # process after it was scanned
+                        self.rechecked = True
+                        for pid, entry in list(self.procs.items()):
+                            if _fd_count(self.procfs_path, pid) != entry[1]:
+                                self._rescan(pid)
+                        users = self._lookup(path)
+            ret[path] = sorted(users)
+        return ret
+
+    def cache_clear(self):
+        """Clear the internal index."""
+        with self.lock:
+            self._reset()
+
+    def cache_info(self):
+        """Return index hit/miss statistics as a namedtuple."""
+        with self.lock:
+            return sfileindex(self.hits, self.misses, self.scans,
+                              len(self.procs))
+
+
+_file_inode_index = _FileInodeIndex()
+
+
+def file_users(paths, cache=False):
+    """Return the processes which have *paths* open as a
+    {path: [(pid, fd), ...]} dict.
+    """
+    if cache:
+        with _file_inode_index.lock:
+            return _file_inode_index.lookup(paths, cached=True)
+    return _FileInodeIndex().lookup(paths)
+
+
+file_users.cache_clear = _file_inode_index.cache_clear
+file_users.cache_info = _file_inode_index.cache_info
+
+
 def pid_exists(pid):
     """Check for the existence of a unix PID. Linux TIDs are not
     supported (always return False).
@@ -1355,6 +2377,441 @@ def pid_exists(pid):
             return pid in pids()
 
 
+def open_pidfd(pid):
+    """Return a pidfd referring to *pid* or None if that is not
+    possible (pidfds not supported, too many open files or process
+    gone, in which case the caller is supposed to fall back on the
+    polling strategy).
+    """
+    if not HAS_PIDFD:
+        return None
+    try:
+        return _pidfd_open(pid)
+    except OSError as err:
+        if err.errno in (errno.ESRCH, errno.ENOSYS, errno.EPERM,
+                         errno.EINVAL, errno.EMFILE, errno.ENFILE):
+            return None
+        raise
+
+
+def _epoll_wait(ep, timeout):
+    """Call ep.poll() retrying on EINTR (Python < 3.5). *timeout* is
+    expressed in seconds. Return a list of (fd, event) tuples.
+    """
+    if timeout is not None:
+        stop_at = _timer() + timeout
+    while True:
+        tout = -1 if timeout is None else max(stop_at - _timer(), 0)
+        try:
+            return ep.poll(tout)
+        except (IOError, OSError) as err:
+            if err.errno != errno.EINTR:
+                raise
+
+
+def wait_pid(pid, timeout=None):
+    """Same as _psposix.wait_pid() but, if supported by the kernel
+    (Linux >= 5.3), sleep on a pidfd until the process terminates
+    instead of polling it.
+    """
+    fd = open_pidfd(pid)
+    if fd is None:
+        return _psposix.wait_pid(pid, timeout)
+    ep = select.epoll()
+    try:
+        ep.register(fd, select.EPOLLIN)
+        if not _epoll_wait(ep, timeout):
+            raise _psposix.TimeoutExpired()
+    finally:
+        ep.close()
+        os.close(fd)
+    try:
+        # reap it if it's our children and get the exit code
+        return _psposix.wait_pid(pid, 0)
+    except _psposix.TimeoutExpired:
+        # not our children and not reaped by its parent yet (zombie)
+        return None
+
+
+def wait_pidfds(pids, timeout=None, poll=None):
+    """Wait for multiple processes at once by multiplexing their
+    pidfds through a single epoll fd. This is a generator yielding
+    PIDs as soon as they terminate; it returns when all of them are
+    gone or *timeout* expires.
+    PIDs for which a pidfd could not be obtained (e.g. pidfds are
+    not supported or fds are exhausted) are checked while waiting by
+    calling *poll(pid)* with an increasing delay (same as
+    _psposix.wait_pid()) and yielded as soon as it returns True.
+    If *poll* is None they are not yielded, unless they do not exist
+    anymore; the caller is supposed to poll them.
+    """
+    if not HAS_PIDFD:
+        return
+    fds = {}
+    unwatched = []
+    ep = select.epoll()
+    try:
+        pids = list(pids)
+        for i, pid in enumerate(pids):
+            try:
+                fd = _pidfd_open(pid)
+            except OSError as err:
+                if err.errno == errno.ESRCH:
+                    yield pid
+                    continue
+                if err.errno in (errno.ENOSYS, errno.EPERM, errno.EINVAL,
+                                 errno.EMFILE, errno.ENFILE):
+                    if poll is not None:
+                        unwatched = pids[i:]
+                    break
+                raise
+            fds[fd] = pid
+            ep.register(fd, select.EPOLLIN)
+
+        if timeout is not None:
+            stop_at = _timer() + timeout
+        delay = 0.0001
+        while fds or unwatched:
+            if timeout is None:
+                tout = None
+            else:
+                tout = stop_at - _timer()
+                if tout <= 0:
+                    break
+            if unwatched:
+                tout = delay if tout is None else min(delay, tout)
+                delay = min(delay * 2, 0.04)
+            for fd, event in _epoll_wait(ep, tout):
+                ep.unregister(fd)
+                os.close(fd)
+                yield fds.pop(fd)
+            for pid in [x for x in unwatched if poll(x)]:
+                unwatched.remove(pid)
+                yield pid
+    finally:
+        for fd in fds:
+            os.close(fd)
+        ep.close()
+
+
+class ProcEventsListener(object):
+    """Subscribe to the kernel proc connector (NETLINK_CONNECTOR,
+    requires CONFIG_PROC_EVENTS and CAP_NET_ADMIN) in order to be
+    notified about processes being created, executing a new program,
+    changing UID and terminating. Events concerning threads are
+    ignored.
+    It also keeps track of the PIDs which are alive, so that they can
+    be known without listing /proc.
+    """
+    # max number of events retained for read(); live_pids() keeps
+    # consuming the socket buffer even if nobody calls read(), in
+    # which case the oldest events are discarded (the PIDs set is
+    # still updated)
+    MAX_PENDING = 16384
+    NETLINK_CONNECTOR = 11
+    CN_IDX_PROC = 1
+    CN_VAL_PROC = 1
+    PROC_CN_MCAST_LISTEN = 1
+    PROC_CN_MCAST_IGNORE = 2
+    NLMSG_DONE = 3
+    NLMSG_HDR = struct.Struct("=IHHII")
+    CN_MSG = struct.Struct("=IIIIHH")
+    EVENT_HDR = struct.Struct("=IIQ")
+    # fork: parent pid, parent tgid, child pid, child tgid
+    # exec: pid, tgid
+    # uid:  pid, tgid, ruid, euid
+    # exit: pid, tgid, exit code, exit signal
+    EVENT_DATA = struct.Struct("=iiII")
+
+    def __init__(self):
+        try:
+            self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                       self.NETLINK_CONNECTOR)
+        except (socket.error, AttributeError) as err:
+            if getattr(err, 'errno', None) in (
+                    None, errno.EPROTONOSUPPORT, errno.EAFNOSUPPORT):
+                raise NotImplementedError(
+                    "proc connector is not supported by the kernel")
+            raise
+        try:
+            self._sock.bind((0, self.CN_IDX_PROC))
+            self._send_op(self.PROC_CN_MCAST_LISTEN)
+        except socket.error as err:
+            self._sock.close()
+            if err.errno in (errno.EPERM, errno.EACCES):
+                raise AccessDenied(
+                    msg="subscribing to proc connector requires "
+                        "CAP_NET_ADMIN")
+            raise
+        # the socket is never blocking: read() waits for it to become
+        # readable with select() *without* holding the lock, so that
+        # live_pids() (hence process_iter()) is never blocked by a
+        # thread waiting for events
+        self._sock.setblocking(False)
+        self._init_wakeup()
+        self._lock = threading.Lock()
+        self._pending = collections.deque(maxlen=self.MAX_PENDING)
+        # list /proc *after* subscribing so that no PID gets lost
+        self._pids = set(pids())
+
+    def _send_op(self, op):
+        data = struct.pack("=I", op)
+        cn_msg = self.CN_MSG.pack(
+            self.CN_IDX_PROC, self.CN_VAL_PROC, 0, 0, len(data), 0) + data
+        nl_hdr = self.NLMSG_HDR.pack(
+            self.NLMSG_HDR.size + len(cn_msg), self.NLMSG_DONE, 0, 0,
+            self._sock.getsockname()[0])
+        self._sock.send(nl_hdr + cn_msg)
+
+    def _parse(self, data):
+        """Parse a netlink datagram, update the PIDs set and return
+        a list of events.
+        """
+        events = []
+        offset = 0
+        while offset + self.NLMSG_HDR.size <= len(data):
+            msg_len = self.NLMSG_HDR.unpack_from(data, offset)[0]
+            if msg_len < self.NLMSG_HDR.size:
+                break
+            pos = offset + self.NLMSG_HDR.size
+            # align to 4 bytes (NLMSG_ALIGN)
+            offset += (msg_len + 3) & ~3
+            idx, val = self.CN_MSG.unpack_from(data, pos)[:2]
+            if (idx, val) != (self.CN_IDX_PROC, self.CN_VAL_PROC):
+                continue
+            pos += self.CN_MSG.size
+            what = self.EVENT_HDR.unpack_from(data, pos)[0]
+            pos += self.EVENT_HDR.size
+            try:
+                type_ = CN_PROC_EVENTS[what]
+            except KeyError:
+                continue
+            if type_ == PROC_EVENT_FORK:
+                ppid, ptgid, cpid, ctgid = struct.unpack_from(
+                    "=iiii", data, pos)
+                if cpid != ctgid:
+                    continue  # new thread
+                self._pids.add(ctgid)
+                events.append(pevent(type_, ctgid, ptgid, None, None, None))
+                continue
+
+            pid, tgid, arg1, arg2 = self.EVENT_DATA.unpack_from(data, pos)
+            if pid != tgid:
+                continue  # thread
+            if type_ == PROC_EVENT_EXEC:
+                events.append(pevent(type_, pid, None, None, None, None))
+            elif type_ == PROC_EVENT_UID:
+                events.append(pevent(type_, pid, None, None, arg1, arg2))
+            elif type_ == PROC_EVENT_EXIT:
+                self._pids.discard(pid)
+                # exit code is in the same format returned by waitpid()
+                if os.WIFSIGNALED(arg1):
+                    exitcode = -os.WTERMSIG(arg1)
+                else:
+                    exitcode = os.WEXITSTATUS(arg1)
+                events.append(pevent(type_, pid, None, exitcode, None, None))
+        return events
+
+    def _init_wakeup(self):
+        # A pipe used to wake up read() when live_pids() consumed the
+        # datagrams read() was waiting for, or on close().
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL,
+                        fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b"x")
+        except OSError as err:
+            # the pipe is full: readers will wake up anyway
+            if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _drain(self):
+        """Receive all datagrams waiting in the socket buffer (never
+        blocking) and put parsed events in the pending queue. Must be
+        called with the lock held.
+        """
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(65536)
+            except socket.error as err:
+                if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                elif err.errno == errno.EINTR:
+                    continue
+                elif err.errno == errno.ENOBUFS:
+                    # the socket buffer overflowed and some events got
+                    # lost; re-sync the PIDs set
+                    self._pids = set(pids())
+                    continue
+                raise
+            self._pending.extend(self._parse(data))
+
+    def _wait_readable(self, timeout):
+        """Wait max *timeout* secs for the socket to be readable or
+        for a wakeup. Must be called *without* holding the lock.
+        """
+        sock = self._sock
+        if sock is None:
+            return
+        while True:
+            try:
+                r = select.select([sock, self._wakeup_r], [], [], timeout)[0]
+            except (select.error, OSError) as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                elif err.args[0] == errno.EBADF:
+                    # closed in the meantime
+                    return
+                raise
+            except ValueError:
+                # closed in the meantime (fileno() == -1)
+                return
+            break
+        if self._wakeup_r in r:
+            try:
+                os.read(self._wakeup_r, 4096)
+            except OSError:
+                pass
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def read(self, timeout=None):
+        """Return a list of events, waiting max *timeout* seconds for
+        at least one event to be available (None means forever).
+        """
+        if timeout is not None:
+            stop_at = _timer() + timeout
+        # datagrams may contain no interesting events (e.g. they're
+        # about threads) so keep going until we have something
+        while True:
+            with self._lock:
+                self._drain()
+                if self._pending or self._sock is None:
+                    events = list(self._pending)
+                    self._pending.clear()
+                    return events
+            if timeout is None:
+                tout = None
+            else:
+                tout = stop_at - _timer()
+                if tout <= 0:
+                    return []
+            self._wait_readable(tout)
+
+    def live_pids(self):
+        """Return the set of PIDs currently alive."""
+        with self._lock:
+            if self._sock is None:
+                return set(pids())
+            # consume what's in the socket buffer; events are retained
+            # and returned on the next read()
+            npending = len(self._pending)
+            self._drain()
+            if len(self._pending) > npending:
+                # a thread may be waiting in read() for these
+                self._wakeup()
+            return set(self._pids)
+
+    def close(self):
+        with self._lock:
+            if self._sock is None:
+                return
+            try:
+                self._send_op(self.PROC_CN_MCAST_IGNORE)
+            except socket.error:
+                pass
+            self._sock.close()
+            self._sock = None
+            # let threads blocked in read() notice the socket is closed
+            self._wakeup()
+            os.close(self._wakeup_w)
+            os.close(self._wakeup_r)
+
+
+# Process attributes process_table() is able to collect natively by
+# reading /proc/{pid}/stat, statm and status.
+PROCESS_TABLE_ATTRS = frozenset([
+    'pid', 'create_time', 'name', 'ppid', 'status', 'terminal',
+    'cpu_times', 'cpu_num', 'num_threads', 'memory_info', 'uids', 'gids',
+    'num_ctx_switches'])
+
+
+def process_table(attrs, ad_value=None):
+    """Return info about all running processes as a {name: list}
+    dict of columns sorted by PID, walking /proc only once.
+    *attrs* must be a subset of PROCESS_TABLE_ATTRS; 'pid' and
+    'create_time' columns are always returned.
+    Processes disappearing in the meantime are skipped; *ad_value*
+    is used for the files which cannot be read.
+    """
+    procfs_path = get_procfs_path()
+    raw = cext.proc_table(
+        procfs_path,
+        'memory_info' in attrs,
+        not attrs.isdisjoint(('uids', 'gids', 'num_ctx_switches')))
+    bt = BOOT_TIME or boot_time()
+    ret = {'pid': raw['pid'],
+           'create_time': [bt + x for x in raw['starttime']]}
+    for name in attrs:
+        if name in ret:
+            continue
+        elif name == 'name':
+            col = []
+            for pid, pname in zip(raw['pid'], raw['name']):
+                if PY3:
+                    pname = decode(pname)
+                if len(pname) >= 15:
+                    # Same as Process.name(): the name is truncated
+                    # by the kernel, try to extend it by using the
+                    # cmdline.
+                    cmdline = cat("%s/%s/cmdline" % (procfs_path, pid),
+                                  fallback="", binary=False)
+                    if cmdline:
+                        extended_name = os.path.basename(
+                            cmdline.split('\x00')[0])
+                        if extended_name.startswith(pname):
+                            pname = extended_name
+                col.append(pname)
+        elif name == 'ppid':
+            col = raw['ppid']
+        elif name == 'status':
+            col = [PROC_STATUSES.get(x.decode() if PY3 else x, '?')
+                   for x in raw['status']]
+        elif name == 'terminal':
+            tmap = _psposix.get_terminal_map()
+            col = [tmap.get(x) for x in raw['tty_nr']]
+        elif name == 'cpu_times':
+            col = list(map(_common.pcputimes, raw['utime'], raw['stime'],
+                           raw['cutime'], raw['cstime']))
+        elif name == 'cpu_num':
+            col = raw['cpu_num']
+        elif name == 'num_threads':
+            col = raw['num_threads']
+        elif name == 'memory_info':
+            col = [ad_value if x is None else
+                   pmem(x[1] * PAGESIZE, x[0] * PAGESIZE, x[2] * PAGESIZE,
+                        x[3] * PAGESIZE, x[4] * PAGESIZE, x[5] * PAGESIZE,
+                        x[6] * PAGESIZE)
+                   for x in raw['statm']]
+        elif name == 'uids':
+            col = [ad_value if x is None else _common.puids(*x)
+                   for x in raw['uids']]
+        elif name == 'gids':
+            col = [ad_value if x is None else _common.pgids(*x)
+                   for x in raw['gids']]
+        elif name == 'num_ctx_switches':
+            col = [ad_value if x is None else _common.pctxsw(*x)
+                   for x in raw['ctxsw']]
+        else:
+            raise ValueError("invalid attr name %r" % name)
+        ret[name] = col
+    return ret
+
+
 def wrap_exceptions(fun):
     """Decorator which translates bare OSError and IOError exceptions
     into NoSuchProcess and AccessDenied.
@@ -1380,36 +2837,132 @@ def wrap_exceptions(fun):
     return wrapper
 
 
+def wrap_exceptions_iter(proc, it):
+    """Wrap generator *it*, lazily produced by a method of *proc*,
+    so that exceptions raised while iterating over it are translated
+    the same way wrap_exceptions() does.
+    """
+    get_next = wrap_exceptions(lambda self: next(it))
+    while True:
+        try:
+            item = get_next(proc)
+        except StopIteration:
+            return
+        yield item
+
+
 class Process(object):
     """Linux process implementation."""
 
-    __slots__ = ["pid", "_name", "_ppid", "_procfs_path"]
+    __slots__ = ["pid", "_name", "_ppid", "_procfs_path", "_dirfd",
+                 "_pidfd"]
 
     def __init__(self, pid):
         self.pid = pid
         self._name = None
         self._ppid = None
         self._procfs_path = get_procfs_path()
+        # see anchor()
+        self._dirfd = None
+        self._pidfd = None
+
+    def __del__(self):
+        try:
+            self.unanchor()
+        except Exception:
+            pass
+
+    # --- anchoring
+
+    @wrap_exceptions
+    def anchor(self):
+        """Keep /proc/{pid} directory open (plus a pidfd, if supported)
+        and read /proc/{pid}/* files relative to it. Once the original
+        process is gone (and reaped) those reads fail with ESRCH, even
+        if its PID gets reused, so that the process identity can be
+        checked without comparing creation times.
+        This is a no-op on Python < 3.3 (no openat() support).
+        """
+        if not HAS_DIR_FD or self._dirfd is not None:
+            return
+        dirfd = os.open("%s/%s" % (self._procfs_path, self.pid),
+                        os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        try:
+            if _pidfd_send_signal is not None:
+                self._pidfd = open_pidfd(self.pid)
+            # make sure the pidfd refers to the same process as dirfd
+            # (the PID may have been reused in the meantime)
+            os.stat("stat", dir_fd=dirfd)
+        except Exception:
+            os.close(dirfd)
+            self.unanchor()
+            raise
+        self._dirfd = dirfd
+
+    def unanchor(self):
+        """Close the fds opened by anchor()."""
+        dirfd, pidfd = self._dirfd, self._pidfd
+        self._dirfd = self._pidfd = None
+        if dirfd is not None:
+            os.close(dirfd)
+        if pidfd is not None:
+            os.close(pidfd)
+
+    @property
+    def anchored(self):
+        return self._dirfd is not None
+
+    def is_running(self):
+        """Return whether the anchored process still exists (zombies
+        included).
+        """
+        try:
+            os.stat("stat", dir_fd=self._dirfd)
+        except OSError as err:
+            if err.errno in (errno.ESRCH, errno.ENOENT):
+                return False
+            raise
+        return True
+
+    def send_signal(self, sig):
+        """Send a signal via pidfd if the process is anchored, so that
+        it can't be delivered to another process which reused the PID.
+        """
+        if self._pidfd is not None:
+            _pidfd_send_signal(self._pidfd, sig)
+        else:
+            os.kill(self.pid, sig)
+
+    def _open_binary(self, name, **kwargs):
+        """Open /proc/{pid}/{name} in binary mode."""
+        if self._dirfd is None:
+            return open_binary(
+                "%s/%s/%s" % (self._procfs_path, self.pid, name), **kwargs)
+        fd = os.open(name, os.O_RDONLY | os.O_CLOEXEC, dir_fd=self._dirfd)
+        return open(fd, "rb", **kwargs)
+
+    def _open_text(self, name):
+        """Open /proc/{pid}/{name} in text mode."""
+        if self._dirfd is None:
+            return open_text(
+                "%s/%s/%s" % (self._procfs_path, self.pid, name))
+        fd = os.open(name, os.O_RDONLY | os.O_CLOEXEC, dir_fd=self._dirfd)
+        return open(fd, "rt", encoding=ENCODING, errors=ENCODING_ERRS)
 
     @memoize_when_activated
     def _parse_stat_file(self):
-        """Parse /proc/{pid}/stat file. Return a list of fields where
-        process name is in position 0.
-        Using "man proc" as a reference: where "man proc" refers to
-        position N, always substract 2 (e.g starttime pos 22 in
-        'man proc' == pos 20 in the list returned here).
+        """Parse /proc/{pid}/stat file. Return a (name, status, ppid,
+        ttynr, utime, stime, children_utime, children_stime,
+        starttime, cpu_num) tuple where CPU times are expressed in
+        seconds and starttime in seconds since boot.
+        Parsing happens in C; the file is read here so that
+        PROCFS_PATH and errors are handled as for other files.
         The return value is cached in case oneshot() ctx manager is
         in use.
         """
-        with open_binary("%s/%s/stat" % (self._procfs_path, self.pid)) as f:
+        with self._open_binary("stat") as f:
             data = f.read()
-        # Process name is between parentheses. It can contain spaces and
-        # other parentheses. This is taken into account by looking for
-        # the first occurrence of "(" and the last occurence of ")".
-        rpar = data.rfind(b')')
-        name = data[data.find(b'(') + 1:rpar]
-        others = data[rpar + 2:].split()
-        return [name] + others
+        return cext.proc_parse_stat(data)
 
     @memoize_when_activated
     def _read_status_file(self):
@@ -1417,13 +2970,12 @@ class Process(object):
         The return value is cached in case oneshot() ctx manager is
         in use.
         """
-        with open_binary("%s/%s/status" % (self._procfs_path, self.pid)) as f:
+        with self._open_binary("status") as f:
             return f.read()
 
     @memoize_when_activated
     def _read_smaps_file(self):
-        with open_binary("%s/%s/smaps" % (self._procfs_path, self.pid),
-                         buffering=BIGFILE_BUFFERING) as f:
+        with self._open_binary("smaps", buffering=BIGFILE_BUFFERING) as f:
             return f.read().strip()
 
     def oneshot_enter(self):
@@ -1465,7 +3017,7 @@ class Process(object):
 
     @wrap_exceptions
     def cmdline(self):
-        with open_text("%s/%s/cmdline" % (self._procfs_path, self.pid)) as f:
+        with self._open_text("cmdline") as f:
             data = f.read()
         if not data:
             # may happen in case of zombie process
@@ -1476,25 +3028,26 @@ class Process(object):
 
     @wrap_exceptions
     def environ(self):
-        with open_text("%s/%s/environ" % (self._procfs_path, self.pid)) as f:
+        with self._open_text("environ") as f:
             data = f.read()
         return parse_environ_block(data)
 
     @wrap_exceptions
     def terminal(self):
-        tty_nr = int(self._parse_stat_file()[5])
+        tty_nr = self._parse_stat_file()[3]
         tmap = _psposix.get_terminal_map()
         try:
             return tmap[tty_nr]
         except KeyError:
             return None
 
-    if os.path.exists('/proc/%s/io' % os.getpid()):
+    # /proc/pid/io requires CONFIG_TASK_IO_ACCOUNTING
+    if has_proc_file("io"):
         @wrap_exceptions
         def io_counters(self):
             fname = "%s/%s/io" % (self._procfs_path, self.pid)
             fields = {}
-            with open_binary(fname) as f:
+            with self._open_binary("io") as f:
                 for line in f:
                     # https://github.com/giampaolo/psutil/issues/1004
                     line = line.strip()
@@ -1511,42 +3064,36 @@ class Process(object):
                 fields[b'rchar'],  # read chars
                 fields[b'wchar'],  # write chars
             )
-    else:
-        def io_counters(self):
-            raise NotImplementedError("couldn't find /proc/%s/io (kernel "
-                                      "too old?)" % self.pid)
 
     @wrap_exceptions
     def cpu_times(self):
-        values = self._parse_stat_file()
-        utime = float(values[12]) / CLOCK_TICKS
-        stime = float(values[13]) / CLOCK_TICKS
-        children_utime = float(values[14]) / CLOCK_TICKS
-        children_stime = float(values[15]) / CLOCK_TICKS
-        return _common.pcputimes(utime, stime, children_utime, children_stime)
+        return _common.pcputimes(*self._parse_stat_file()[4:8])
 
     @wrap_exceptions
     def cpu_num(self):
         """What CPU the process is on."""
-        return int(self._parse_stat_file()[37])
+        cpu_num = self._parse_stat_file()[9]
+        if cpu_num is None:
+            raise NotImplementedError("'processor' field not found in "
+                                      "/proc/%s/stat" % self.pid)
+        return cpu_num
 
     @wrap_exceptions
     def wait(self, timeout=None):
         try:
-            return _psposix.wait_pid(self.pid, timeout)
+            return wait_pid(self.pid, timeout)
         except _psposix.TimeoutExpired:
             raise TimeoutExpired(timeout, self.pid, self._name)
 
     @wrap_exceptions
     def create_time(self):
-        values = self._parse_stat_file()
         # According to documentation, starttime is in field 21 and the
-        # unit is jiffies (clock ticks).
-        # We first divide it for clock ticks and then add uptime returning
-        # seconds since the epoch, in UTC.
+        # unit is jiffies (clock ticks), which the C parser already
+        # divided for clock ticks. We add uptime returning seconds
+        # since the epoch, in UTC.
         # Also use cached value if available.
         bt = BOOT_TIME or boot_time()
-        return (float(values[20]) / CLOCK_TICKS) + bt
+        return self._parse_stat_file()[8] + bt
 
     @wrap_exceptions
     def memory_info(self):
@@ -1561,46 +3108,39 @@ class Process(object):
         # | data   | data + stack                        | drs  | DATA |
         # | dirty  | dirty pages (unused in Linux 2.6)   | dt   |      |
         #  ============================================================
-        with open_binary("%s/%s/statm" % (self._procfs_path, self.pid)) as f:
+        with self._open_binary("statm") as f:
             vms, rss, shared, text, lib, data, dirty = \
                 [int(x) * PAGESIZE for x in f.readline().split()[:7]]
         return pmem(rss, vms, shared, text, lib, data, dirty)
 
+    @wrap_exceptions
+    def memory_full_info(self):
+        basic_mem = self.memory_info()
+        if not has_proc_file("smaps"):
+            return basic_mem
+        # You might be tempted to calculate USS by subtracting
+        # the "shared" value from the "resident" value in
+        # /proc/<pid>/statm. But at least on Linux, statm's "shared"
+        # value actually counts pages backed by files, which has
+        # little to do with whether the pages are actually shared.
+        # /proc/self/smaps on the other hand appears to give us the
+        # correct information.
+        # smaps_rollup has the same fields already summed up for
+        # all mappings, so it's a lot smaller and faster to read.
+        # In both cases the file is parsed in C line by line, so
+        # that it is never held in memory all at once.
+        # Note: smaps file can be empty for certain processes, in
+        # which case we'll return 0.
+        if has_proc_file("smaps_rollup"):
+            path = "%s/%s/smaps_rollup" % (self._procfs_path, self.pid)
+        else:
+            path = "%s/%s/smaps" % (self._procfs_path, self.pid)
+        uss, pss, swap = cext.proc_smaps_totals(path)
+        return pfullmem(*basic_mem + (uss, pss, swap))
+
     # /proc/pid/smaps does not exist on kernels < 2.6.14 or if
     # CONFIG_MMU kernel configuration option is not enabled.
-    if HAS_SMAPS:
-
-        @wrap_exceptions
-        def memory_full_info(
-                self,
-                _private_re=re.compile(br"Private.*:\s+(\d+)"),
-                _pss_re=re.compile(br"Pss.*:\s+(\d+)"),
-                _swap_re=re.compile(br"Swap.*:\s+(\d+)")):
-            basic_mem = self.memory_info()
-            # Note: using 3 regexes is faster than reading the file
-            # line by line.
-            # XXX: on Python 3 the 2 regexes are 30% slower than on
-            # Python 2 though. Figure out why.
-            #
-            # You might be tempted to calculate USS by subtracting
-            # the "shared" value from the "resident" value in
-            # /proc/<pid>/statm. But at least on Linux, statm's "shared"
-            # value actually counts pages backed by files, which has
-            # little to do with whether the pages are actually shared.
-            # /proc/self/smaps on the other hand appears to give us the
-            # correct information.
-            smaps_data = self._read_smaps_file()
-            # Note: smaps file can be empty for certain processes.
-            # The code below will not crash though and will result to 0.
-            uss = sum(map(int, _private_re.findall(smaps_data))) * 1024
-            pss = sum(map(int, _pss_re.findall(smaps_data))) * 1024
-            swap = sum(map(int, _swap_re.findall(smaps_data))) * 1024
-            return pfullmem(*basic_mem + (uss, pss, swap))
-
-    else:
-        memory_full_info = memory_info
-
-    if HAS_SMAPS:
+    if has_proc_file("smaps"):
 
         @wrap_exceptions
         def memory_maps(self):
@@ -1608,6 +3148,7 @@ class Process(object):
             tuples. Fields are explained in 'man proc'; here is an updated
             (Apr 2012) version: http://goo.gl/fmebo
             """
+
             def get_blocks(lines, current_block):
                 data = {}
                 for line in lines:
@@ -1667,12 +3208,76 @@ class Process(object):
                 ))
             return ls
 
-    else:  # pragma: no cover
-        def memory_maps(self):
-            raise NotImplementedError(
-                "/proc/%s/smaps does not exist on kernels < 2.6.14 or "
-                "if CONFIG_MMU kernel configuration option is not "
-                "enabled." % self.pid)
+        # field name -> index in the tuples returned by
+        # memory_maps_iter() (after addr, perms and path)
+        _smaps_fields = dict((name, i) for i, name in enumerate((
+            b'Rss:', b'Size:', b'Pss:', b'Shared_Clean:', b'Shared_Dirty:',
+            b'Private_Clean:', b'Private_Dirty:', b'Referenced:',
+            b'Anonymous:', b'Swap:')))
+
+        @wrap_exceptions
+        def memory_maps_iter(self, grouped=False, path=None):
+            """Same as memory_maps() but read the smaps file line by
+            line. If *path* is specified mappings of other paths are
+            skipped without parsing their fields.
+            If *grouped* is True return a list of (path, rss, ...)
+            tuples, summing the fields of mappings with the same path
+            while parsing, else a generator of (addr, perms, path, rss,
+            ...) tuples yielded as they are read.
+            """
+            f = self._open_binary("smaps", buffering=BIGFILE_BUFFERING)
+            if not grouped:
+                return wrap_exceptions_iter(
+                    self, self._iter_smaps(f, path, None))
+            totals = {}
+            for _ in self._iter_smaps(f, path, totals):
+                pass
+            return [(k, ) + tuple(v) for k, v in totals.items()]
+
+        def _iter_smaps(self, f, path_filter, totals):
+            # If 'totals' is a dict, fields are summed in it by path
+            # and nothing is yielded.
+            fields = self._smaps_fields
+            header = None
+            current = None
+            with f:
+                for line in f:
+                    key = line[:line.find(b' ')]
+                    if key.endswith(b':'):
+                        if current is not None and key in fields:
+                            value = int(line.split()[1]) * 1024
+                            current[fields[key]] += value
+                        continue
+                    # new block section
+                    if header is not None and current is not None:
+                        yield header + tuple(current)
+                    hfields = line.split(None, 5)
+                    try:
+                        addr, perms, offset, dev, inode, path = hfields
+                    except ValueError:
+                        addr, perms, offset, dev, inode, path = \
+                            hfields + ['']
+                    if not path:
+                        path = '[anon]'
+                    else:
+                        if PY3:
+                            path = decode(path)
+                        path = path.strip()
+                        if (path.endswith(' (deleted)') and not
+                                path_exists_strict(path)):
+                            path = path[:-10]
+                    if path_filter is not None and path != path_filter:
+                        current = None
+                    elif totals is not None:
+                        header = None
+                        current = totals.get(path)
+                        if current is None:
+                            current = totals[path] = [0] * len(fields)
+                    else:
+                        header = (decode(addr), decode(perms), path)
+                        current = [0] * len(fields)
+                if header is not None and current is not None:
+                    yield header + tuple(current)
 
     @wrap_exceptions
     def cwd(self):
@@ -1710,35 +3315,53 @@ class Process(object):
         return int(_num_threads_re.findall(data)[0])
 
     @wrap_exceptions
-    def threads(self):
-        thread_ids = os.listdir("%s/%s/task" % (self._procfs_path, self.pid))
-        thread_ids.sort()
+    def threads(self, tids=None):
+        # All task/{tid}/stat files are read and parsed in C, relative
+        # to the task directory fd; threads disappearing in the
+        # meantime are skipped.
+        if self._dirfd is not None:
+            path, dirfd = "task", self._dirfd
+        else:
+            path, dirfd = "%s/%s/task" % (self._procfs_path, self.pid), -1
+        if tids is not None:
+            tids = list(tids)
+        rawlist, missing = cext.proc_threads(path, dirfd, tids)
         retlist = []
-        hit_enoent = False
-        for thread_id in thread_ids:
-            fname = "%s/%s/task/%s/stat" % (
-                self._procfs_path, self.pid, thread_id)
+        for (tid, name, status, utime, stime, cpu_num, minflt,
+                majflt) in rawlist:
+            if PY3:
+                name = decode(name)
+                status = status.decode()
+            ntuple = pthread(tid, utime, stime, name,
+                             PROC_STATUSES.get(status, '?'), cpu_num,
+                             minflt, majflt)
+            retlist.append(ntuple)
+        if missing:
+            # raise NSP if the process disappeared on us
+            os.stat('%s/%s' % (self._procfs_path, self.pid))
+        return retlist
+
+    @wrap_exceptions
+    def children_pids(self):
+        """Return the PIDs of the direct children of this process
+        as listed by the kernel in /proc/{pid}/task/{tid}/children.
+        Used to speed up Process.children().
+        """
+        if not has_proc_file("task/{tid}/children"):
+            raise NotImplementedError(
+                "/proc/{pid}/task/{tid}/children not available")
+        task_dir = "%s/%s/task" % (self._procfs_path, self.pid)
+        ret = []
+        for tid in os.listdir(task_dir):
             try:
-                with open_binary(fname) as f:
-                    st = f.read().strip()
+                with open_binary("%s/%s/children" % (task_dir, tid)) as f:
+                    ret.extend(int(x) for x in f.read().split())
             except IOError as err:
                 if err.errno == errno.ENOENT:
-                    # no such file or directory; it means thread
-                    # disappeared on us
-                    hit_enoent = True
+                    # thread disappeared on us
                     continue
                 raise
-            # ignore the first two values ("pid (exe)")
-            st = st[st.find(b')') + 2:]
-            values = st.split(b' ')
-            utime = float(values[11]) / CLOCK_TICKS
-            stime = float(values[12]) / CLOCK_TICKS
-            ntuple = _common.pthread(int(thread_id), utime, stime)
-            retlist.append(ntuple)
-        if hit_enoent:
-            # raise NSP if the process disappeared on us
-            os.stat('%s/%s' % (self._procfs_path, self.pid))
-        return retlist
+        return ret
 
     @wrap_exceptions
     def nice_get(self):
@@ -1928,7 +3551,7 @@ class Process(object):
 
     @wrap_exceptions
     def ppid(self):
-        return int(self._parse_stat_file()[2])
+        return self._parse_stat_file()[2]
 
     @wrap_exceptions
     def uids(self, _uids_re=re.compile(br'Uid:\t(\d+)\t(\d+)\t(\d+)')):
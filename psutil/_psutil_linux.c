@@ -10,8 +10,14 @@
     #define _GNU_SOURCE 1
 #endif
 #include <Python.h>
+#include <ctype.h>
+#include <dirent.h>
 #include <errno.h>
+#include <fcntl.h>
+#include <limits.h>
 #include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
 #include <mntent.h>
 #include <features.h>
 #include <utmp.h>
@@ -19,10 +25,13 @@
 #include <linux/version.h>
 #include <sys/syscall.h>
 #include <sys/sysinfo.h>
+#include <sys/stat.h>
 #include <sys/ioctl.h>
 #include <sys/socket.h>
 #include <linux/sockios.h>
 #include <linux/if.h>
+#include <netinet/in.h>
+#include <arpa/inet.h>
 
 // see: https://github.com/giampaolo/psutil/issues/659
 #ifdef PSUTIL_ETHTOOL_MISSING_TYPES
@@ -48,6 +57,26 @@ static const int NCPUS_START = sizeof(unsigned long) * CHAR_BIT;
     (__GLIBC__ >= 2 && __GLIBC_MINOR__ >= 13) && \
     defined(__NR_prlimit64)
 
+// Linux >= 5.3
+#define PSUTIL_HAVE_PIDFD_OPEN defined(__NR_pidfd_open)
+
+// Linux >= 5.1
+#define PSUTIL_HAVE_PIDFD_SEND_SIGNAL defined(__NR_pidfd_send_signal)
+
+// Linux >= 3.3
+#define PSUTIL_HAVE_SOCK_DIAG \
+    LINUX_VERSION_CODE >= KERNEL_VERSION(3, 3, 0)
+
+#if PSUTIL_HAVE_SOCK_DIAG
+    #include <sys/un.h>
+    #include <linux/netlink.h>
+    #include <linux/rtnetlink.h>
+    #include <linux/sock_diag.h>
+    #include <linux/inet_diag.h>
+    #include <linux/unix_diag.h>
+    #define PSUTIL_UNIX_PATH_MAX sizeof(((struct sockaddr_un *)0)->sun_path)
+#endif
+
 #if PSUTIL_HAVE_PRLIMIT
     #define _FILE_OFFSET_BITS 64
     #include <time.h>
@@ -63,6 +92,16 @@ static const int NCPUS_START = sizeof(unsigned long) * CHAR_BIT;
     #define DUPLEX_UNKNOWN 0xff
 #endif
 
+#if PY_MAJOR_VERSION >= 3
+    #define PSUTIL_PyInt_FromLong PyLong_FromLong
+#else
+    #define PSUTIL_PyInt_FromLong PyInt_FromLong
+#endif
+
+// Max length of the process name shown in /proc/{pid}/stat (kernel
+// threads may have names longer than TASK_COMM_LEN).
+#define PSUTIL_COMM_LEN 64
+
 
 #if PSUTIL_HAVE_IOPRIO
 enum {
@@ -569,6 +608,1335 @@ error:
 }
 
 
+static PyObject *
+psutil_none(void) {
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+
+/*
+ * Parsed content of a /proc/{pid}/stat or /proc/{pid}/task/{tid}/stat
+ * file. Only the fields psutil is interested in are kept.
+ */
+typedef struct {
+    char name[PSUTIL_COMM_LEN + 1];
+    char state;
+    long ppid;
+    long tty_nr;
+    unsigned long long minflt;
+    unsigned long long majflt;
+    unsigned long long utime;
+    unsigned long long stime;
+    long long cutime;
+    long long cstime;
+    long num_threads;
+    unsigned long long starttime;
+    long processor;  // -1 if not available
+} psutil_stat_t;
+
+
+/*
+ * Parse the NUL terminated content of a stat file into *st.
+ * The process name is between parentheses and it can contain spaces
+ * and other parentheses, so we look for the first occurrence of "("
+ * and the last occurrence of ")".
+ * Return 0 on success or -1 if the content is malformed.
+ */
+static int
+psutil_parse_stat(const char *buf, size_t len, psutil_stat_t *st) {
+    const char *lpar;
+    const char *rpar;
+    const char *p;
+    char *end;
+    size_t namelen;
+    long long values[38];
+    int i;
+
+    lpar = memchr(buf, '(', len);
+    rpar = memrchr(buf, ')', len);
+    if ((lpar == NULL) || (rpar == NULL) || (rpar < lpar) ||
+            (rpar + 2 >= buf + len))
+        return -1;
+    namelen = rpar - lpar - 1;
+    if (namelen > PSUTIL_COMM_LEN)
+        namelen = PSUTIL_COMM_LEN;
+    memcpy(st->name, lpar + 1, namelen);
+    st->name[namelen] = '\0';
+
+    // Using "man proc" as a reference: where "man proc" refers to
+    // position N, always substract 2 (e.g starttime pos 22 in
+    // 'man proc' == pos 20 here).
+    p = rpar + 2;
+    st->state = *p++;
+    st->processor = -1;
+    for (i = 2; i <= 37; i++) {
+        values[i] = strtoll(p, &end, 10);
+        if (end == p) {
+            // "processor" field is missing on very old kernels
+            if (i > 20)
+                break;
+            return -1;
+        }
+        p = end;
+    }
+
+    st->ppid = (long)values[2];
+    st->tty_nr = (long)values[5];
+    st->minflt = (unsigned long long)values[8];
+    st->majflt = (unsigned long long)values[10];
+    st->utime = (unsigned long long)values[12];
+    st->stime = (unsigned long long)values[13];
+    st->cutime = values[14];
+    st->cstime = values[15];
+    st->num_threads = (long)values[18];
+    st->starttime = (unsigned long long)values[20];
+    if (i > 37)
+        st->processor = (long)values[37];
+    return 0;
+}
+
+
+/*
+ * Read the whole content of a file into *buf, growing it as needed.
+ * *path* is relative to the *dirfd* directory (see openat(2)).
+ * The content is NUL terminated. Return the number of bytes read or
+ * -1 on error, in which case errno is set.
+ * Meant to be called with the GIL released.
+ */
+static ssize_t
+psutil_slurp_at(int dirfd, const char *path, char **buf, size_t *bufsize) {
+    int fd;
+    int saved_errno;
+    ssize_t n;
+    size_t tot = 0;
+    char *tmp;
+
+    fd = openat(dirfd, path, O_RDONLY | O_CLOEXEC);
+    if (fd == -1)
+        return -1;
+    while (1) {
+        if (tot + 1 >= *bufsize) {
+            tmp = realloc(*buf, *bufsize ? *bufsize * 2 : 4096);
+            if (tmp == NULL) {
+                close(fd);
+                errno = ENOMEM;
+                return -1;
+            }
+            *buf = tmp;
+            *bufsize = *bufsize ? *bufsize * 2 : 4096;
+        }
+        n = read(fd, *buf + tot, *bufsize - tot - 1);
+        if (n == -1) {
+            if (errno == EINTR)
+                continue;
+            saved_errno = errno;
+            close(fd);
+            errno = saved_errno;
+            return -1;
+        }
+        if (n == 0)
+            break;
+        tot += n;
+    }
+    close(fd);
+    (*buf)[tot] = '\0';
+    return (ssize_t)tot;
+}
+
+
+static ssize_t
+psutil_slurp(const char *path, char **buf, size_t *bufsize) {
+    return psutil_slurp_at(AT_FDCWD, path, buf, bufsize);
+}
+
+
+/*
+ * Parse the content of a /proc/{pid}/stat file passed as a bytes
+ * object and return a (name, status, ppid, tty_nr, utime, stime,
+ * children_utime, children_stime, starttime, cpu_num) tuple.
+ * Times are expressed in seconds (starttime is relative to boot
+ * time) and cpu_num is None if not available.
+ */
+static PyObject *
+psutil_proc_parse_stat(PyObject *self, PyObject *args) {
+    PyObject *py_data;
+    PyObject *py_name;
+    PyObject *py_cpu_num;
+    char *buf;
+    Py_ssize_t len;
+    double ticks;
+    psutil_stat_t st;
+
+    if (! PyArg_ParseTuple(args, "O", &py_data))
+        return NULL;
+    if (PyBytes_AsStringAndSize(py_data, &buf, &len) != 0)
+        return NULL;
+    if (psutil_parse_stat(buf, (size_t)len, &st) != 0) {
+        PyErr_SetString(PyExc_ValueError, "malformed stat file content");
+        return NULL;
+    }
+    ticks = (double)sysconf(_SC_CLK_TCK);
+    py_name = PyBytes_FromString(st.name);
+    if (py_name == NULL)
+        return NULL;
+    if (st.processor == -1)
+        py_cpu_num = psutil_none();
+    else
+        py_cpu_num = PSUTIL_PyInt_FromLong(st.processor);
+    if (py_cpu_num == NULL) {
+        Py_DECREF(py_name);
+        return NULL;
+    }
+    return Py_BuildValue(
+        "(NclldddddN)",
+        py_name,                // name
+        st.state,               // status
+        st.ppid,                // ppid
+        st.tty_nr,              // tty_nr
+        st.utime / ticks,       // utime
+        st.stime / ticks,       // stime
+        st.cutime / ticks,      // children utime
+        st.cstime / ticks,      // children stime
+        st.starttime / ticks,   // starttime
+        py_cpu_num);            // cpu_num
+}
+
+
+/*
+ * A row of the process table. statm and status fields are only set
+ * if they were requested and the file could be read.
+ */
+typedef struct {
+    long pid;
+    psutil_stat_t stat;
+    int has_statm;
+    unsigned long long statm[7];
+    int has_status;
+    long uids[3];
+    long gids[3];
+    long ctxsw[2];  // -1 if not available (Linux < 2.6.23)
+} psutil_proc_row_t;
+
+
+/*
+ * Parse the NUL terminated content of /proc/{pid}/status into *row.
+ */
+static void
+psutil_parse_status(char *buf, psutil_proc_row_t *row) {
+    char *line = buf;
+    char *next;
+
+    row->uids[0] = row->uids[1] = row->uids[2] = -1;
+    row->gids[0] = row->gids[1] = row->gids[2] = -1;
+    row->ctxsw[0] = row->ctxsw[1] = -1;
+    while ((line != NULL) && (*line != '\0')) {
+        next = strchr(line, '\n');
+        if (next != NULL)
+            *next++ = '\0';
+        if (strncmp(line, "Uid:", 4) == 0)
+            sscanf(line + 4, "%ld %ld %ld",
+                   &row->uids[0], &row->uids[1], &row->uids[2]);
+        else if (strncmp(line, "Gid:", 4) == 0)
+            sscanf(line + 4, "%ld %ld %ld",
+                   &row->gids[0], &row->gids[1], &row->gids[2]);
+        else if (strncmp(line, "voluntary_ctxt_switches:", 24) == 0)
+            sscanf(line + 24, "%ld", &row->ctxsw[0]);
+        else if (strncmp(line, "nonvoluntary_ctxt_switches:", 27) == 0)
+            sscanf(line + 27, "%ld", &row->ctxsw[1]);
+        line = next;
+    }
+}
+
+
+static int
+psutil_cmp_rows(const void *a, const void *b) {
+    long pa = ((const psutil_proc_row_t *)a)->pid;
+    long pb = ((const psutil_proc_row_t *)b)->pid;
+    return (pa > pb) - (pa < pb);
+}
+
+
+/*
+ * Add a new list of the given length to *py_dict under *key*.
+ * Return a borrowed reference to it or NULL on error.
+ */
+static PyObject *
+psutil_table_column(PyObject *py_dict, const char *key, Py_ssize_t len) {
+    PyObject *py_list = PyList_New(len);
+
+    if (py_list == NULL)
+        return NULL;
+    if (PyDict_SetItemString(py_dict, key, py_list) != 0) {
+        Py_DECREF(py_list);
+        return NULL;
+    }
+    Py_DECREF(py_list);
+    return py_list;
+}
+
+
+// Fill the column *key* of the process table, one item per row, by
+// evaluating *expr* (a new reference) against every row.
+#define PSUTIL_TABLE_FILL(key, expr) \
+    do { \
+        py_list = psutil_table_column(py_retdict, key, (Py_ssize_t)nrows); \
+        if (py_list == NULL) \
+            goto error; \
+        for (i = 0; i < nrows; i++) { \
+            row = &rows[i]; \
+            py_item = (expr); \
+            if (py_item == NULL) \
+                goto error; \
+            PyList_SET_ITEM(py_list, (Py_ssize_t)i, py_item); \
+        } \
+    } while (0)
+
+
+/*
+ * Walk /proc once and return info about all processes as a dict of
+ * columns (lists), where every list has one item per process, sorted
+ * by PID. /proc/{pid}/stat is always read; /proc/{pid}/statm and
+ * /proc/{pid}/status are read only if requested, and their columns
+ * contain None for processes which could not be inspected.
+ * Processes disappearing in the meantime are skipped.
+ */
+static PyObject *
+psutil_proc_table(PyObject *self, PyObject *args) {
+    char *procfs_path;
+    int want_statm;
+    int want_status;
+    int err = 0;
+    double ticks;
+    char path[PATH_MAX];
+    char *buf = NULL;
+    size_t bufsize = 0;
+    ssize_t len;
+    size_t i;
+    size_t nrows = 0;
+    size_t maxrows = 0;
+    DIR *dir = NULL;
+    struct dirent *entry;
+    psutil_proc_row_t *rows = NULL;
+    psutil_proc_row_t *row;
+    psutil_proc_row_t *tmp;
+    PyObject *py_retdict = NULL;
+    PyObject *py_list;
+    PyObject *py_item;
+
+    if (! PyArg_ParseTuple(args, "sii", &procfs_path, &want_statm,
+                           &want_status))
+        return NULL;
+    ticks = (double)sysconf(_SC_CLK_TCK);
+
+    Py_BEGIN_ALLOW_THREADS
+    dir = opendir(procfs_path);
+    if (dir == NULL)
+        err = errno;
+    while ((dir != NULL) && ((entry = readdir(dir)) != NULL)) {
+        if (! isdigit((unsigned char)entry->d_name[0]))
+            continue;
+        if (nrows == maxrows) {
+            maxrows = maxrows ? maxrows * 2 : 512;
+            tmp = realloc(rows, maxrows * sizeof(psutil_proc_row_t));
+            if (tmp == NULL) {
+                err = ENOMEM;
+                break;
+            }
+            rows = tmp;
+        }
+        row = &rows[nrows];
+        memset(row, 0, sizeof(psutil_proc_row_t));
+        row->pid = strtol(entry->d_name, NULL, 10);
+
+        // stat: if we can't read it the process is gone
+        snprintf(path, sizeof(path), "%s/%s/stat", procfs_path,
+                 entry->d_name);
+        len = psutil_slurp(path, &buf, &bufsize);
+        if (len == -1) {
+            if (errno == ENOMEM) {
+                err = ENOMEM;
+                break;
+            }
+            continue;
+        }
+        if (psutil_parse_stat(buf, (size_t)len, &row->stat) != 0)
+            continue;
+
+        if (want_statm) {
+            snprintf(path, sizeof(path), "%s/%s/statm", procfs_path,
+                     entry->d_name);
+            len = psutil_slurp(path, &buf, &bufsize);
+            if (len == -1) {
+                if ((errno != EPERM) && (errno != EACCES))
+                    continue;
+            }
+            else if (sscanf(buf, "%llu %llu %llu %llu %llu %llu %llu",
+                            &row->statm[0], &row->statm[1],
+                            &row->statm[2], &row->statm[3],
+                            &row->statm[4], &row->statm[5],
+                            &row->statm[6]) == 7) {
+                row->has_statm = 1;
+            }
+        }
+
+        if (want_status) {
+            snprintf(path, sizeof(path), "%s/%s/status", procfs_path,
+                     entry->d_name);
+            len = psutil_slurp(path, &buf, &bufsize);
+            if (len == -1) {
+                if ((errno != EPERM) && (errno != EACCES))
+                    continue;
+            }
+            else {
+                psutil_parse_status(buf, row);
+                row->has_status = 1;
+            }
+        }
+
+        nrows++;
+    }
+    if (dir != NULL)
+        closedir(dir);
+    free(buf);
+    if (err == 0)
+        qsort(rows, nrows, sizeof(psutil_proc_row_t), psutil_cmp_rows);
+    Py_END_ALLOW_THREADS
+
+    if (err != 0) {
+        errno = err;
+        if (err == ENOMEM)
+            PyErr_NoMemory();
+        else
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, procfs_path);
+        goto error;
+    }
+
+    py_retdict = PyDict_New();
+    if (py_retdict == NULL)
+        goto error;
+
+    // stat
+    PSUTIL_TABLE_FILL("pid", PSUTIL_PyInt_FromLong(row->pid));
+    PSUTIL_TABLE_FILL("name", PyBytes_FromString(row->stat.name));
+    PSUTIL_TABLE_FILL("status",
+                      PyBytes_FromStringAndSize(&row->stat.state, 1));
+    PSUTIL_TABLE_FILL("ppid", PSUTIL_PyInt_FromLong(row->stat.ppid));
+    PSUTIL_TABLE_FILL("tty_nr", PSUTIL_PyInt_FromLong(row->stat.tty_nr));
+    PSUTIL_TABLE_FILL("utime", PyFloat_FromDouble(row->stat.utime / ticks));
+    PSUTIL_TABLE_FILL("stime", PyFloat_FromDouble(row->stat.stime / ticks));
+    PSUTIL_TABLE_FILL("cutime",
+                      PyFloat_FromDouble(row->stat.cutime / ticks));
+    PSUTIL_TABLE_FILL("cstime",
+                      PyFloat_FromDouble(row->stat.cstime / ticks));
+    PSUTIL_TABLE_FILL("starttime",
+                      PyFloat_FromDouble(row->stat.starttime / ticks));
+    PSUTIL_TABLE_FILL("num_threads",
+                      PSUTIL_PyInt_FromLong(row->stat.num_threads));
+    PSUTIL_TABLE_FILL("cpu_num",
+                      row->stat.processor == -1 ? psutil_none() :
+                      PSUTIL_PyInt_FromLong(row->stat.processor));
+
+    // statm; values are expressed in pages
+    if (want_statm) {
+        PSUTIL_TABLE_FILL("statm",
+            ! row->has_statm ? psutil_none() : Py_BuildValue(
+                "(KKKKKKK)",
+                row->statm[0], row->statm[1], row->statm[2], row->statm[3],
+                row->statm[4], row->statm[5], row->statm[6]));
+    }
+
+    // status
+    if (want_status) {
+        PSUTIL_TABLE_FILL("uids",
+            ! row->has_status ? psutil_none() : Py_BuildValue(
+                "(lll)", row->uids[0], row->uids[1], row->uids[2]));
+        PSUTIL_TABLE_FILL("gids",
+            ! row->has_status ? psutil_none() : Py_BuildValue(
+                "(lll)", row->gids[0], row->gids[1], row->gids[2]));
+        PSUTIL_TABLE_FILL("ctxsw",
+            (! row->has_status || row->ctxsw[0] == -1) ? psutil_none() :
+            Py_BuildValue("(ll)", row->ctxsw[0], row->ctxsw[1]));
+    }
+
+    free(rows);
+    return py_retdict;
+
+error:
+    free(rows);
+    Py_XDECREF(py_retdict);
+    return NULL;
+}
+
+
+/*
+ * A row of the threads table.
+ */
+typedef struct {
+    long tid;
+    psutil_stat_t stat;
+} psutil_thread_row_t;
+
+
+static int
+psutil_cmp_thread_rows(const void *a, const void *b) {
+    long ta = ((const psutil_thread_row_t *)a)->tid;
+    long tb = ((const psutil_thread_row_t *)b)->tid;
+    return (ta > tb) - (ta < tb);
+}
+
+
+/*
+ * Read the stat file of every thread listed in a /proc/{pid}/task
+ * directory and return a (threads, missing) tuple. *threads* is a list
+ * of (tid, name, status, utime, stime, cpu_num, minflt, majflt) tuples
+ * sorted by TID, where times are expressed in seconds and cpu_num is
+ * None if not available. *missing* is True if some thread disappeared
+ * in the meantime.
+ * *path* is relative to the *dirfd* directory, or to the current
+ * working directory if *dirfd* is -1. Each stat file is opened
+ * relative to the task directory fd (openat(2)).
+ * If *tids* is not None only the threads with those IDs are read,
+ * without listing the directory.
+ */
+static PyObject *
+psutil_proc_threads(PyObject *self, PyObject *args) {
+    char *path;
+    int dirfd;
+    int taskfd = -1;
+    int err = 0;
+    int missing = 0;
+    double ticks;
+    char relpath[NAME_MAX + 8];
+    char *buf = NULL;
+    size_t bufsize = 0;
+    ssize_t len;
+    size_t i;
+    size_t ntids = 0;
+    size_t nrows = 0;
+    size_t maxrows = 0;
+    long *tids = NULL;
+    DIR *dir = NULL;
+    struct dirent *entry;
+    psutil_thread_row_t *rows = NULL;
+    psutil_thread_row_t *row;
+    psutil_thread_row_t *tmp;
+    PyObject *py_tids;
+    PyObject *py_seq = NULL;
+    PyObject *py_retlist = NULL;
+    PyObject *py_tuple;
+    PyObject *py_name;
+    PyObject *py_cpu_num;
+
+    if (! PyArg_ParseTuple(args, "siO", &path, &dirfd, &py_tids))
+        return NULL;
+    if (dirfd == -1)
+        dirfd = AT_FDCWD;
+    if (py_tids != Py_None) {
+        py_seq = PySequence_Fast(py_tids, "tids must be a sequence");
+        if (py_seq == NULL)
+            return NULL;
+        ntids = (size_t)PySequence_Fast_GET_SIZE(py_seq);
+        tids = malloc((ntids ? ntids : 1) * sizeof(long));
+        if (tids == NULL) {
+            Py_DECREF(py_seq);
+            return PyErr_NoMemory();
+        }
+        for (i = 0; i < ntids; i++) {
+            tids[i] = PyLong_AsLong(PySequence_Fast_GET_ITEM(py_seq, i));
+            if ((tids[i] == -1) && PyErr_Occurred()) {
+                free(tids);
+                Py_DECREF(py_seq);
+                return NULL;
+            }
+        }
+        Py_DECREF(py_seq);
+    }
+    ticks = (double)sysconf(_SC_CLK_TCK);
+
+    Py_BEGIN_ALLOW_THREADS
+    taskfd = openat(dirfd, path, O_RDONLY | O_DIRECTORY | O_CLOEXEC);
+    if (taskfd == -1) {
+        err = errno;
+    }
+    else if (tids == NULL) {
+        // fdopendir() takes ownership of the fd: use a duplicate so
+        // that taskfd can be used with openat() in the meantime
+        dir = fdopendir(dup(taskfd));
+        if (dir == NULL)
+            err = errno;
+    }
+    i = 0;
+    while (err == 0) {
+        // either walk the directory or the requested TIDs
+        if (dir != NULL) {
+            entry = readdir(dir);
+            if (entry == NULL)
+                break;
+            if (! isdigit((unsigned char)entry->d_name[0]))
+                continue;
+            snprintf(relpath, sizeof(relpath), "%s/stat", entry->d_name);
+        }
+        else {
+            if (i == ntids)
+                break;
+            snprintf(relpath, sizeof(relpath), "%ld/stat", tids[i++]);
+        }
+        if (nrows == maxrows) {
+            maxrows = maxrows ? maxrows * 2 : 64;
+            tmp = realloc(rows, maxrows * sizeof(psutil_thread_row_t));
+            if (tmp == NULL) {
+                err = ENOMEM;
+                break;
+            }
+            rows = tmp;
+        }
+        row = &rows[nrows];
+        row->tid = strtol(relpath, NULL, 10);
+        len = psutil_slurp_at(taskfd, relpath, &buf, &bufsize);
+        if (len == -1) {
+            if ((errno == ENOENT) || (errno == ESRCH)) {
+                // the thread is gone
+                missing = 1;
+                continue;
+            }
+            err = errno;
+            break;
+        }
+        if (psutil_parse_stat(buf, (size_t)len, &row->stat) != 0)
+            continue;
+        nrows++;
+    }
+    if (dir != NULL)
+        closedir(dir);
+    if (taskfd != -1)
+        close(taskfd);
+    free(buf);
+    free(tids);
+    if (err == 0)
+        qsort(rows, nrows, sizeof(psutil_thread_row_t),
+              psutil_cmp_thread_rows);
+    Py_END_ALLOW_THREADS
+
+    if (err != 0) {
+        errno = err;
+        if (err == ENOMEM)
+            PyErr_NoMemory();
+        else
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+        goto error;
+    }
+
+    py_retlist = PyList_New((Py_ssize_t)nrows);
+    if (py_retlist == NULL)
+        goto error;
+    for (i = 0; i < nrows; i++) {
+        row = &rows[i];
+        py_name = PyBytes_FromString(row->stat.name);
+        if (py_name == NULL)
+            goto error;
+        if (row->stat.processor == -1)
+            py_cpu_num = psutil_none();
+        else
+            py_cpu_num = PSUTIL_PyInt_FromLong(row->stat.processor);
+        if (py_cpu_num == NULL) {
+            Py_DECREF(py_name);
+            goto error;
+        }
+        py_tuple = Py_BuildValue(
+            "(lNcddNKK)",
+            row->tid,                           // tid
+            py_name,                            // name
+            row->stat.state,                    // status
+            row->stat.utime / ticks,            // utime
+            row->stat.stime / ticks,            // stime
+            py_cpu_num,                         // cpu_num
+            row->stat.minflt,                   // minor faults
+            row->stat.majflt);                  // major faults
+        if (py_tuple == NULL)
+            goto error;
+        PyList_SET_ITEM(py_retlist, (Py_ssize_t)i, py_tuple);
+    }
+    free(rows);
+    return Py_BuildValue("(NO)", py_retlist, missing ? Py_True : Py_False);
+
+error:
+    free(rows);
+    Py_XDECREF(py_retlist);
+    return NULL;
+}
+
+
+/*
+ * An open file descriptor of a process. Link targets are stored
+ * back to back in a separate buffer (not NUL terminated), so that a
+ * row only takes a few dozen bytes no matter how long its path is.
+ */
+typedef struct {
+    int fd;
+    size_t path_off;
+    size_t path_len;
+    long long pos;
+    long flags;
+    mode_t mode;
+    dev_t dev;
+    ino_t ino;
+} psutil_fd_row_t;
+
+
+static int
+psutil_cmp_fd_rows(const void *a, const void *b) {
+    int fa = ((const psutil_fd_row_t *)a)->fd;
+    int fb = ((const psutil_fd_row_t *)b)->fd;
+    return (fa > fb) - (fa < fb);
+}
+
+
+/*
+ * Inspect all the file descriptors of a process given its /proc/{pid}
+ * directory path and return a list of
+ * (fd, path, pos, flags, st_mode, st_dev, st_ino) tuples sorted by fd
+ * number, where *path* is the link target (bytes), *pos* and *flags*
+ * come from /proc/{pid}/fdinfo/{fd} and st_* fields are the ones of
+ * the target (0 if it can't be stat()ed). Everything is read relative
+ * to the fd and fdinfo directory fds (readlinkat(2), fstatat(2),
+ * openat(2)).
+ * File descriptors closed in the meantime are skipped.
+ */
+static PyObject *
+psutil_proc_open_fds(PyObject *self, PyObject *args) {
+    char *path;
+    int err = 0;
+    int piddirfd = -1;
+    int fddirfd = -1;
+    int infodirfd = -1;
+    char *buf = NULL;
+    char *line;
+    size_t bufsize = 0;
+    char target[PATH_MAX];
+    char *paths = NULL;
+    char *ptmp;
+    size_t pathlen;
+    size_t paths_len = 0;
+    size_t paths_size = 0;
+    ssize_t len;
+    size_t i;
+    size_t nrows = 0;
+    size_t maxrows = 0;
+    struct stat st;
+    DIR *dir = NULL;
+    struct dirent *entry;
+    psutil_fd_row_t *rows = NULL;
+    psutil_fd_row_t *row;
+    psutil_fd_row_t *tmp;
+    PyObject *py_retlist = NULL;
+    PyObject *py_tuple;
+
+    if (! PyArg_ParseTuple(args, "s", &path))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    piddirfd = open(path, O_RDONLY | O_DIRECTORY | O_CLOEXEC);
+    if (piddirfd == -1)
+        goto done;
+    fddirfd = openat(piddirfd, "fd", O_RDONLY | O_DIRECTORY | O_CLOEXEC);
+    if (fddirfd == -1)
+        goto done;
+    infodirfd = openat(piddirfd, "fdinfo",
+                       O_RDONLY | O_DIRECTORY | O_CLOEXEC);
+    if (infodirfd == -1)
+        goto done;
+    // fdopendir() takes ownership of the fd: use a duplicate so that
+    // fddirfd can be used with *at() functions in the meantime
+    dir = fdopendir(dup(fddirfd));
+    if (dir == NULL)
+        goto done;
+
+    while (1) {
+        errno = 0;
+        entry = readdir(dir);
+        if (entry == NULL)
+            break;
+        if (! isdigit((unsigned char)entry->d_name[0]))
+            continue;
+        if (nrows == maxrows) {
+            maxrows = maxrows ? maxrows * 2 : 64;
+            tmp = realloc(rows, maxrows * sizeof(psutil_fd_row_t));
+            if (tmp == NULL) {
+                errno = ENOMEM;
+                goto done;
+            }
+            rows = tmp;
+        }
+        row = &rows[nrows];
+        row->fd = (int)strtol(entry->d_name, NULL, 10);
+
+        // link target; everything after a NUL byte is garbage, see:
+        // https://github.com/giampaolo/psutil/issues/717
+        len = readlinkat(fddirfd, entry->d_name, target, sizeof(target) - 1);
+        if (len == -1) {
+            // fd closed in the meantime or not a link
+            if ((errno == ENOENT) || (errno == EINVAL))
+                continue;
+            goto done;
+        }
+        target[len] = '\0';
+        pathlen = strlen(target);
+
+        // file type and identity of the target (the link is followed)
+        if (fstatat(fddirfd, entry->d_name, &st, 0) == 0) {
+            row->mode = st.st_mode;
+            row->dev = st.st_dev;
+            row->ino = st.st_ino;
+        }
+        else if (errno == ENOENT) {
+            continue;
+        }
+        else {
+            row->mode = 0;
+            row->dev = 0;
+            row->ino = 0;
+        }
+
+        // position and flags
+        len = psutil_slurp_at(infodirfd, entry->d_name, &buf, &bufsize);
+        if (len == -1) {
+            if (errno == ENOENT)
+                continue;
+            goto done;
+        }
+        row->pos = -1;
+        row->flags = -1;
+        line = buf;
+        while ((line != NULL) && (*line != '\0')) {
+            if (strncmp(line, "pos:", 4) == 0)
+                row->pos = strtoll(line + 4, NULL, 10);
+            else if (strncmp(line, "flags:", 6) == 0)
+                row->flags = strtol(line + 6, NULL, 8);
+            line = strchr(line, '\n');
+            if (line != NULL)
+                line++;
+        }
+
+        // append the link target to the paths buffer
+        if (paths_len + pathlen > paths_size) {
+            paths_size = paths_size ? paths_size * 2 : 4096;
+            while (paths_len + pathlen > paths_size)
+                paths_size *= 2;
+            ptmp = realloc(paths, paths_size);
+            if (ptmp == NULL) {
+                errno = ENOMEM;
+                goto done;
+            }
+            paths = ptmp;
+        }
+        memcpy(paths + paths_len, target, pathlen);
+        row->path_off = paths_len;
+        row->path_len = pathlen;
+        paths_len += pathlen;
+        nrows++;
+    }
+
+done:
+    err = errno;
+    if (dir != NULL)
+        closedir(dir);
+    if (piddirfd != -1)
+        close(piddirfd);
+    if (fddirfd != -1)
+        close(fddirfd);
+    if (infodirfd != -1)
+        close(infodirfd);
+    free(buf);
+    if (err == 0)
+        qsort(rows, nrows, sizeof(psutil_fd_row_t), psutil_cmp_fd_rows);
+    Py_END_ALLOW_THREADS
+
+    if (err != 0) {
+        errno = err;
+        if (err == ENOMEM)
+            PyErr_NoMemory();
+        else
+            PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+        goto error;
+    }
+
+    py_retlist = PyList_New((Py_ssize_t)nrows);
+    if (py_retlist == NULL)
+        goto error;
+    for (i = 0; i < nrows; i++) {
+        row = &rows[i];
+        py_tuple = Py_BuildValue(
+            "(iNLlIKK)",
+            row->fd,                                // fd
+            PyBytes_FromStringAndSize(              // path
+                paths + row->path_off, (Py_ssize_t)row->path_len),
+            row->pos,                               // position
+            row->flags,                             // flags
+            (unsigned int)row->mode,                // st_mode
+            (unsigned long long)row->dev,           // st_dev
+            (unsigned long long)row->ino);          // st_ino
+        if (py_tuple == NULL)
+            goto error;
+        PyList_SET_ITEM(py_retlist, (Py_ssize_t)i, py_tuple);
+    }
+    free(rows);
+    free(paths);
+    return py_retlist;
+
+error:
+    free(rows);
+    free(paths);
+    Py_XDECREF(py_retlist);
+    return NULL;
+}
+
+
+/*
+ * Parse a /proc/{pid}/smaps or /proc/{pid}/smaps_rollup file line by
+ * line (without holding it all in memory) and return a
+ * (uss, pss, swap) tuple, in bytes, summing the "Private_*", "Pss"
+ * and "Swap" fields of all mappings.
+ */
+static PyObject *
+psutil_proc_smaps_totals(PyObject *self, PyObject *args) {
+    char *path;
+    char line[1024];
+    char *colon;
+    size_t len;
+    int continuation = 0;
+    int saved_errno;
+    unsigned long long value;
+    unsigned long long uss = 0;
+    unsigned long long pss = 0;
+    unsigned long long swap = 0;
+    FILE *file = NULL;
+
+    if (! PyArg_ParseTuple(args, "s", &path))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    file = fopen(path, "re");
+    if (file != NULL) {
+        while (fgets(line, sizeof(line), file) != NULL) {
+            len = strlen(line);
+            if (len == 0) {
+                // the line starts with a NUL byte
+                continue;
+            }
+            if (continuation) {
+                // rest of a line which didn't fit in the buffer (e.g.
+                // a mapping header with a long path)
+                continuation = (line[len - 1] != '\n');
+                continue;
+            }
+            continuation = (line[len - 1] != '\n');
+            if (strncmp(line, "Private_", 8) == 0) {
+                colon = strchr(line, ':');
+                if ((colon != NULL) && (sscanf(colon + 1, "%llu",
+                                               &value) == 1))
+                    uss += value;
+            }
+            else if (strncmp(line, "Pss:", 4) == 0) {
+                if (sscanf(line + 4, "%llu", &value) == 1)
+                    pss += value;
+            }
+            else if (strncmp(line, "Swap:", 5) == 0) {
+                if (sscanf(line + 5, "%llu", &value) == 1)
+                    swap += value;
+            }
+        }
+        if (ferror(file)) {
+            saved_errno = errno;
+            fclose(file);
+            file = NULL;
+            errno = saved_errno;
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    if (file == NULL)
+        return PyErr_SetFromErrnoWithFilename(PyExc_OSError, path);
+    fclose(file);
+    return Py_BuildValue(
+        "KKK", uss * 1024, pss * 1024, swap * 1024);
+}
+
+
+/*
+ * Walk /proc and return a {pid: ppid, ...} dict for all running
+ * processes. Only the ppid field of /proc/{pid}/stat is parsed.
+ * Processes disappearing in the meantime are skipped.
+ */
+static PyObject *
+psutil_ppid_map(PyObject *self, PyObject *args) {
+    char *procfs_path;
+    char path[PATH_MAX];
+    char buf[1024];
+    char *rpar;
+    char state;
+    long pid;
+    long ppid;
+    int fd;
+    ssize_t len;
+    DIR *dir = NULL;
+    struct dirent *entry;
+    PyObject *py_pid = NULL;
+    PyObject *py_ppid = NULL;
+    PyObject *py_retdict = PyDict_New();
+
+    if (py_retdict == NULL)
+        return NULL;
+    if (! PyArg_ParseTuple(args, "s", &procfs_path))
+        goto error;
+    dir = opendir(procfs_path);
+    if (dir == NULL) {
+        PyErr_SetFromErrnoWithFilename(PyExc_OSError, procfs_path);
+        goto error;
+    }
+
+    while ((entry = readdir(dir)) != NULL) {
+        if (! isdigit((unsigned char)entry->d_name[0]))
+            continue;
+        pid = strtol(entry->d_name, NULL, 10);
+        snprintf(path, sizeof(path), "%s/%s/stat", procfs_path,
+                 entry->d_name);
+        // the ppid is within the first 1024 bytes; the process name
+        // can be at most PSUTIL_COMM_LEN chars
+        Py_BEGIN_ALLOW_THREADS
+        fd = open(path, O_RDONLY | O_CLOEXEC);
+        if (fd != -1) {
+            len = read(fd, buf, sizeof(buf) - 1);
+            close(fd);
+        }
+        Py_END_ALLOW_THREADS
+        if ((fd == -1) || (len <= 0))
+            continue;  // process gone
+        buf[len] = '\0';
+        rpar = strrchr(buf, ')');
+        if ((rpar == NULL) || (sscanf(rpar + 1, " %c %ld", &state,
+                                      &ppid) != 2))
+            continue;
+
+        py_pid = PSUTIL_PyInt_FromLong(pid);
+        if (py_pid == NULL)
+            goto error;
+        py_ppid = PSUTIL_PyInt_FromLong(ppid);
+        if (py_ppid == NULL)
+            goto error;
+        if (PyDict_SetItem(py_retdict, py_pid, py_ppid))
+            goto error;
+        Py_CLEAR(py_pid);
+        Py_CLEAR(py_ppid);
+    }
+    closedir(dir);
+    return py_retdict;
+
+error:
+    if (dir != NULL)
+        closedir(dir);
+    Py_XDECREF(py_pid);
+    Py_XDECREF(py_ppid);
+    Py_DECREF(py_retdict);
+    return NULL;
+}
+
+
+#if PSUTIL_HAVE_PIDFD_OPEN
+/*
+ * A wrapper around pidfd_open(2). Return a file descriptor referring
+ * to the process, which becomes readable when the process terminates.
+ * The fd is always close-on-exec.
+ */
+static PyObject *
+psutil_pidfd_open(PyObject *self, PyObject *args) {
+    long pid;
+    int fd;
+
+    if (! PyArg_ParseTuple(args, "l", &pid))
+        return NULL;
+    fd = (int)syscall(__NR_pidfd_open, (pid_t)pid, 0);
+    if (fd == -1)
+        return PyErr_SetFromErrno(PyExc_OSError);
+    return Py_BuildValue("i", fd);
+}
+#endif
+
+
+#if PSUTIL_HAVE_PIDFD_SEND_SIGNAL
+/*
+ * A wrapper around pidfd_send_signal(2). Contrarily to kill(2) the
+ * signal can't be delivered to another process which reused the PID.
+ */
+static PyObject *
+psutil_pidfd_send_signal(PyObject *self, PyObject *args) {
+    int pidfd;
+    int sig;
+
+    if (! PyArg_ParseTuple(args, "ii", &pidfd, &sig))
+        return NULL;
+    if (syscall(__NR_pidfd_send_signal, pidfd, sig, NULL, 0) == -1)
+        return PyErr_SetFromErrno(PyExc_OSError);
+    Py_RETURN_NONE;
+}
+#endif
+
+
+#if PSUTIL_HAVE_SOCK_DIAG
+/*
+ * Send a NETLINK_SOCK_DIAG dump request and call parse_msg() for every
+ * message received back, passing ctx along.
+ * Return 0 on success, -1 on failure with a Python exception set.
+ */
+static int
+psutil_sock_diag_dump(void *req, size_t reqlen,
+                      int (*parse_msg)(struct nlmsghdr *, void *),
+                      void *ctx) {
+    int sock;
+    int done = 0;
+    ssize_t len;
+    // recommended size in order to avoid message truncation
+    long buf[8192 / sizeof(long)];
+    struct sockaddr_nl nladdr;
+    struct nlmsghdr *nlh;
+    struct nlmsgerr *err;
+
+    sock = socket(AF_NETLINK, SOCK_DGRAM | SOCK_CLOEXEC, NETLINK_SOCK_DIAG);
+    if (sock == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    memset(&nladdr, 0, sizeof(nladdr));
+    nladdr.nl_family = AF_NETLINK;
+    if (sendto(sock, req, reqlen, 0, (struct sockaddr *)&nladdr,
+               sizeof(nladdr)) == -1) {
+        PyErr_SetFromErrno(PyExc_OSError);
+        goto error;
+    }
+
+    while (! done) {
+        Py_BEGIN_ALLOW_THREADS
+        len = recv(sock, buf, sizeof(buf), 0);
+        Py_END_ALLOW_THREADS
+        if (len == -1) {
+            if (errno == EINTR)
+                continue;
+            PyErr_SetFromErrno(PyExc_OSError);
+            goto error;
+        }
+        if (len == 0)
+            break;
+        for (nlh = (struct nlmsghdr *)buf; NLMSG_OK(nlh, len);
+                nlh = NLMSG_NEXT(nlh, len)) {
+            if (nlh->nlmsg_type == NLMSG_DONE) {
+                done = 1;
+                break;
+            }
+            if (nlh->nlmsg_type == NLMSG_ERROR) {
+                // e.g. ENOENT if the diag module for the requested
+                // family / protocol is not loaded
+                err = (struct nlmsgerr *)NLMSG_DATA(nlh);
+                errno = -err->error;
+                PyErr_SetFromErrno(PyExc_OSError);
+                goto error;
+            }
+            if (parse_msg(nlh, ctx) != 0)
+                goto error;
+        }
+    }
+
+    close(sock);
+    return 0;
+
+error:
+    close(sock);
+    return -1;
+}
+
+
+/*
+ * Port filters of an inet_diag dump; -1 means "any port".
+ */
+typedef struct {
+    PyObject *py_retlist;
+    int lport;
+    int rport;
+} psutil_inet_diag_ctx;
+
+
+static int
+psutil_parse_inet_diag_msg(struct nlmsghdr *nlh, void *ctx) {
+    struct inet_diag_msg *msg = (struct inet_diag_msg *)NLMSG_DATA(nlh);
+    psutil_inet_diag_ctx *filter = (psutil_inet_diag_ctx *)ctx;
+    char lip[INET6_ADDRSTRLEN];
+    char rip[INET6_ADDRSTRLEN];
+    PyObject *py_tuple;
+
+    if (nlh->nlmsg_len < NLMSG_LENGTH(sizeof(*msg)))
+        return 0;
+    // skip non matching sockets before decoding them
+    if ((filter->lport != -1) &&
+            (filter->lport != ntohs(msg->id.idiag_sport)))
+        return 0;
+    if ((filter->rport != -1) &&
+            (filter->rport != ntohs(msg->id.idiag_dport)))
+        return 0;
+    inet_ntop(msg->idiag_family, msg->id.idiag_src, lip, sizeof(lip));
+    inet_ntop(msg->idiag_family, msg->id.idiag_dst, rip, sizeof(rip));
+    py_tuple = Py_BuildValue(
+        "(sHsHIk)",
+        lip,                                    // laddr ip
+        ntohs(msg->id.idiag_sport),             // laddr port
+        rip,                                    // raddr ip
+        ntohs(msg->id.idiag_dport),             // raddr port
+        (unsigned int)msg->idiag_state,         // TCP state
+        (unsigned long)msg->idiag_inode);       // inode
+    if (py_tuple == NULL)
+        return -1;
+    if (PyList_Append(filter->py_retlist, py_tuple)) {
+        Py_DECREF(py_tuple);
+        return -1;
+    }
+    Py_DECREF(py_tuple);
+    return 0;
+}
+
+
+static int
+psutil_parse_unix_diag_msg(struct nlmsghdr *nlh, void *ctx) {
+    struct unix_diag_msg *msg = (struct unix_diag_msg *)NLMSG_DATA(nlh);
+    PyObject *py_retlist = (PyObject *)ctx;
+    struct rtattr *attr;
+    int attrlen;
+    char path[PSUTIL_UNIX_PATH_MAX + 1];
+    int pathlen = 0;
+    int i;
+    PyObject *py_path;
+    PyObject *py_tuple;
+
+    if (nlh->nlmsg_len < NLMSG_LENGTH(sizeof(*msg)))
+        return 0;
+    attrlen = nlh->nlmsg_len - NLMSG_LENGTH(sizeof(*msg));
+    for (attr = (struct rtattr *)(msg + 1); RTA_OK(attr, attrlen);
+            attr = RTA_NEXT(attr, attrlen)) {
+        if (attr->rta_type == UNIX_DIAG_NAME) {
+            pathlen = RTA_PAYLOAD(attr);
+            if (pathlen > (int)PSUTIL_UNIX_PATH_MAX)
+                pathlen = PSUTIL_UNIX_PATH_MAX;
+            memcpy(path, RTA_DATA(attr), pathlen);
+            // mimic /proc/net/unix: strip the trailing NULL byte of
+            // filesystem paths; represent NULL bytes of abstract
+            // socket names as "@"
+            if ((pathlen > 0) && (path[0] != '\0') &&
+                    (path[pathlen - 1] == '\0'))
+                pathlen--;
+            for (i = 0; i < pathlen; i++) {
+                if (path[i] == '\0')
+                    path[i] = '@';
+            }
+        }
+    }
+    path[pathlen] = '\0';
+
+    py_path = PyUnicode_DecodeFSDefaultAndSize(path, pathlen);
+    if (py_path == NULL)
+        return -1;
+    py_tuple = Py_BuildValue(
+        "(ikO)",
+        (int)msg->udiag_type,                   // type
+        (unsigned long)msg->udiag_ino,          // inode
+        py_path);                               // path
+    Py_DECREF(py_path);
+    if (py_tuple == NULL)
+        return -1;
+    if (PyList_Append(py_retlist, py_tuple)) {
+        Py_DECREF(py_tuple);
+        return -1;
+    }
+    Py_DECREF(py_tuple);
+    return 0;
+}
+
+
+/*
+ * Return TCP or UDP sockets of the given family as a list of
+ * (laddr_ip, laddr_port, raddr_ip, raddr_port, state, inode) tuples
+ * by using NETLINK_SOCK_DIAG. "states" is a bitmask of TCP states
+ * (1 << state) the kernel should filter for. If "lport" / "rport" are
+ * not -1 only sockets with that local / remote port are returned.
+ */
+static PyObject *
+psutil_net_connections_inet(PyObject *self, PyObject *args) {
+    int family;
+    int protocol;
+    unsigned int states;
+    psutil_inet_diag_ctx ctx;
+    struct {
+        struct nlmsghdr nlh;
+        struct inet_diag_req_v2 r;
+    } req;
+    PyObject *py_retlist = PyList_New(0);
+
+    if (py_retlist == NULL)
+        return NULL;
+    ctx.py_retlist = py_retlist;
+    ctx.lport = -1;
+    ctx.rport = -1;
+    if (! PyArg_ParseTuple(args, "iiI|ii", &family, &protocol, &states,
+                           &ctx.lport, &ctx.rport))
+        goto error;
+
+    memset(&req, 0, sizeof(req));
+    req.nlh.nlmsg_len = sizeof(req);
+    req.nlh.nlmsg_type = SOCK_DIAG_BY_FAMILY;
+    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    req.r.sdiag_family = family;
+    req.r.sdiag_protocol = protocol;
+    req.r.idiag_states = states;
+    if (psutil_sock_diag_dump(&req, sizeof(req), psutil_parse_inet_diag_msg,
+                              &ctx) != 0)
+        goto error;
+    return py_retlist;
+
+error:
+    Py_DECREF(py_retlist);
+    return NULL;
+}
+
+
+/*
+ * Return UNIX sockets as a list of (type, inode, path) tuples by
+ * using NETLINK_SOCK_DIAG.
+ */
+static PyObject *
+psutil_net_connections_unix(PyObject *self, PyObject *args) {
+    struct {
+        struct nlmsghdr nlh;
+        struct unix_diag_req r;
+    } req;
+    PyObject *py_retlist = PyList_New(0);
+
+    if (py_retlist == NULL)
+        return NULL;
+    memset(&req, 0, sizeof(req));
+    req.nlh.nlmsg_len = sizeof(req);
+    req.nlh.nlmsg_type = SOCK_DIAG_BY_FAMILY;
+    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    req.r.sdiag_family = AF_UNIX;
+    req.r.udiag_states = -1;  // all
+    req.r.udiag_show = UDIAG_SHOW_NAME;
+    if (psutil_sock_diag_dump(&req, sizeof(req), psutil_parse_unix_diag_msg,
+                              py_retlist) != 0)
+        goto error;
+    return py_retlist;
+
+error:
+    Py_DECREF(py_retlist);
+    return NULL;
+}
+#endif  // PSUTIL_HAVE_SOCK_DIAG
+
+
 /*
  * Define the psutil C module methods and initialize the module.
  */
@@ -586,6 +1954,24 @@ PsutilMethods[] = {
      "Return process CPU affinity as a Python long (the bitmask)."},
     {"proc_cpu_affinity_set", psutil_proc_cpu_affinity_set, METH_VARARGS,
      "Set process CPU affinity; expects a bitmask."},
+    {"proc_parse_stat", psutil_proc_parse_stat, METH_VARARGS,
+     "Parse the content of a /proc/{pid}/stat file"},
+    {"proc_threads", psutil_proc_threads, METH_VARARGS,
+     "Return info about all the threads listed in a /proc/{pid}/task "
+     "directory"},
+    {"proc_open_fds", psutil_proc_open_fds, METH_VARARGS,
+     "Return info about all the file descriptors of a process"},
+    {"proc_table", psutil_proc_table, METH_VARARGS,
+     "Walk /proc once and return info about all processes as a dict "
+     "of columns"},
+#if PSUTIL_HAVE_PIDFD_OPEN
+    {"pidfd_open", psutil_pidfd_open, METH_VARARGS,
+     "Return a file descriptor referring to a process (pidfd_open(2))"},
+#endif
+#if PSUTIL_HAVE_PIDFD_SEND_SIGNAL
+    {"pidfd_send_signal", psutil_pidfd_send_signal, METH_VARARGS,
+     "Send a signal to a process via its pidfd (pidfd_send_signal(2))"},
+#endif
 
     // --- system related functions
 
@@ -596,6 +1982,16 @@ PsutilMethods[] = {
      "Return currently connected users as a list of tuples"},
     {"net_if_duplex_speed", psutil_net_if_duplex_speed, METH_VARARGS,
      "Return duplex and speed info about a NIC"},
+    {"proc_smaps_totals", psutil_proc_smaps_totals, METH_VARARGS,
+     "Return process USS, PSS and swap memory by parsing an smaps file"},
+    {"ppid_map", psutil_ppid_map, METH_VARARGS,
+     "Return a {pid: ppid, ...} dict for all running processes"},
+#if PSUTIL_HAVE_SOCK_DIAG
+    {"net_connections_inet", psutil_net_connections_inet, METH_VARARGS,
+     "Return TCP or UDP sockets by using NETLINK_SOCK_DIAG"},
+    {"net_connections_unix", psutil_net_connections_unix, METH_VARARGS,
+     "Return UNIX sockets by using NETLINK_SOCK_DIAG"},
+#endif
 
     // --- linux specific
 
@@ -0,0 +1,255 @@
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""asyncio-native versions of psutil blocking APIs (Python >= 3.6).
+
+Functions here never block the event loop: intervals are awaited with
+asyncio.sleep() and process waits are driven by the event loop itself.
+On Linux >= 5.3 a pidfd is registered with the loop so
+that waiting for a process costs nothing until it actually terminates;
+elsewhere the process is polled with an increasing delay, same as
+psutil.Process.wait() does.
+
+>>> import asyncio, psutil.aio
+>>> async def main():
+...     print(await psutil.aio.cpu_percent(interval=1))
+...     async for proc in psutil.aio.process_iter(attrs=['name']):
+...         print(proc.info)
+...
+>>> asyncio.get_event_loop().run_until_complete(main())
+"""
+
+import asyncio
+import errno
+import os
+
+from . import _cpu_percent_calc
+from . import _cpu_times_percent_calc
+from . import _psplatform
+from . import _timer
+from . import cpu_percent as _cpu_percent
+from . import cpu_times
+from . import cpu_times_percent as _cpu_times_percent
+from . import Popen as _Popen
+from . import Process as _Process
+from . import process_iter as _process_iter
+from . import TimeoutExpired
+from ._compat import callable
+
+
+__all__ = ["cpu_percent", "cpu_times_percent", "wait", "wait_procs",
+           "process_iter", "Process", "Popen"]
+
+# Python >= 3.7
+_get_running_loop = getattr(asyncio, "get_running_loop",
+                            asyncio.get_event_loop)
+
+# =====================================================================
+# --- CPU
+# =====================================================================
+
+
+async def cpu_percent(interval=None, percpu=False):
+    """Same as psutil.cpu_percent() but the *interval* is awaited
+    instead of slept.
+    """
+    if interval is not None and interval < 0:
+        raise ValueError("interval is not positive (got %r)" % interval)
+    if not interval:
+        return _cpu_percent(interval=None, percpu=percpu)
+    t1 = cpu_times(percpu=percpu)
+    await asyncio.sleep(interval)
+    t2 = cpu_times(percpu=percpu)
+    if percpu:
+        return [_cpu_percent_calc(a, b) for a, b in zip(t1, t2)]
+    return _cpu_percent_calc(t1, t2)
+
+
+async def cpu_times_percent(interval=None, percpu=False):
+    """Same as psutil.cpu_times_percent() but the *interval* is
+    awaited instead of slept.
+    """
+    if interval is not None and interval < 0:
+        raise ValueError("interval is not positive (got %r)" % interval)
+    if not interval:
+        return _cpu_times_percent(interval=None, percpu=percpu)
+    t1 = cpu_times(percpu=percpu)
+    await asyncio.sleep(interval)
+    t2 = cpu_times(percpu=percpu)
+    if percpu:
+        return [_cpu_times_percent_calc(a, b) for a, b in zip(t1, t2)]
+    return _cpu_times_percent_calc(t1, t2)
+
+
+# =====================================================================
+# --- processes
+# =====================================================================
+
+
+def _open_pidfd(pid):
+    """Return a pidfd referring to *pid* or None if that's not
+    possible, in which case the process is supposed to be polled.
+    """
+    if hasattr(_psplatform, "open_pidfd"):
+        return _psplatform.open_pidfd(pid)
+    return None
+
+
+async def _wait_readable(fd, timeout):
+    loop = _get_running_loop()
+    fut = loop.create_future()
+
+    def on_ready():
+        if not fut.done():
+            fut.set_result(None)
+
+    loop.add_reader(fd, on_ready)
+    try:
+        await asyncio.wait_for(fut, timeout)
+    finally:
+        loop.remove_reader(fd)
+
+
+def _poll(proc):
+    """Non-blocking version of proc.wait(). Return a (done, retcode)
+    tuple.
+    """
+    # use the sync implementation: Process and Popen classes below
+    # override wait() with a coroutine
+    meth = _Popen.wait if isinstance(proc, _Popen) else _Process.wait
+    try:
+        return (True, meth(proc, timeout=0))
+    except TimeoutExpired:
+        return (False, None)
+
+
+async def wait(proc, timeout=None):
+    """Same as psutil.Process.wait() but for use within a coroutine.
+    *proc* may be any Process (or Popen) instance.
+    """
+    if timeout is not None and not timeout >= 0:
+        raise ValueError("timeout must be a positive integer")
+    # The pidfd is opened before polling: if the process terminates
+    # and gets reaped in between, its PID may be reused by another
+    # process, and we would end up waiting for the wrong one.
+    pidfd = _open_pidfd(proc.pid)
+    if pidfd is not None:
+        try:
+            done, retcode = _poll(proc)
+            if done:
+                return retcode
+            try:
+                await _wait_readable(pidfd, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutExpired(timeout, proc.pid, proc._name)
+        finally:
+            os.close(pidfd)
+        # The process has terminated. If it's not our children and its
+        # parent hasn't reaped it yet it may still be a zombie, in which
+        # case the exit code can't be determined anyway.
+        return _poll(proc)[1]
+
+    done, retcode = _poll(proc)
+    if done:
+        return retcode
+    # no pidfd support; poll with an increasing delay
+    if timeout is not None:
+        stop_at = _timer() + timeout
+    delay = 0.0001
+    while True:
+        if timeout is not None:
+            remaining = stop_at - _timer()
+            if remaining <= 0:
+                raise TimeoutExpired(timeout, proc.pid, proc._name)
+            delay = min(delay, remaining)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.04)
+        done, retcode = _poll(proc)
+        if done:
+            return retcode
+
+
+async def wait_procs(procs, timeout=None, callback=None):
+    """Same as psutil.wait_procs() but for use within a coroutine.
+    All processes are waited for concurrently. *callback* may be
+    either a function or a coroutine function.
+    """
+    if timeout is not None and not timeout >= 0:
+        msg = "timeout must be a positive integer, got %s" % timeout
+        raise ValueError(msg)
+    if callback is not None and not callable(callback):
+        raise TypeError("callback %r is not a callable" % callback)
+
+    async def waiter(proc):
+        proc.returncode = await wait(proc)
+        if callback is not None:
+            ret = callback(proc)
+            if asyncio.iscoroutine(ret):
+                await ret
+        return proc
+
+    procs = list(procs)
+    if not procs:
+        return ([], [])
+    tasks = dict((asyncio.ensure_future(waiter(proc)), proc)
+                 for proc in procs)
+    done, pending = await asyncio.wait(list(tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    gone = []
+    for task in done:
+        # re-raise unexpected errors (e.g. AccessDenied or
+        # exceptions raised by callback)
+        gone.append(task.result())
+    alive = [tasks[task] for task in pending]
+    return (gone, alive)
+
+
+async def process_iter(attrs=None, ad_value=None):
+    """Same as psutil.process_iter() but returns an async iterator.
+    Control is given back to the event loop before inspecting each
+    process so that scanning a big process table doesn't starve
+    other tasks.
+    """
+    for proc in _process_iter(attrs=attrs, ad_value=ad_value):
+        yield proc
+        await asyncio.sleep(0)
+
+
+class Process(_Process):
+    """Same as psutil.Process except wait() is a coroutine."""
+
+    async def wait(self, timeout=None):
+        return await wait(self, timeout)
+
+
+class Popen(_Popen):
+    """Same as psutil.Popen except wait() is a coroutine and it's
+    an asynchronous context manager ("async with").
+    """
+
+    def __enter__(self):
+        # __exit__() would wait for the process blocking the event loop
+        raise TypeError("use 'async with' instead of 'with'")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        if self.stdout:
+            self.stdout.close()
+        if self.stderr:
+            self.stderr.close()
+        try:
+            # Flushing a BufferedWriter may raise an error.
+            if self.stdin:
+                self.stdin.close()
+        finally:
+            # Wait for the process to terminate, to avoid zombies.
+            await self.wait()
+
+    async def wait(self, timeout=None):
+        return await wait(self, timeout)
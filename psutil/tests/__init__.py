@@ -72,6 +72,7 @@ __all__ = [
     "HAS_IONICE", "HAS_MEMORY_MAPS", "HAS_PROC_CPU_NUM", "HAS_RLIMIT",
     "HAS_SENSORS_BATTERY", "HAS_BATTERY""HAS_SENSORS_FANS",
     "HAS_SENSORS_TEMPERATURES", "HAS_MEMORY_FULL_INFO",
+    "HAS_CONCURRENT_FUTURES", "HAS_ASYNCIO",
     # subprocesses
     'pyrun', 'reap_children', 'get_test_subprocess', 'create_zombie_proc',
     'create_proc_children_pair',
@@ -162,6 +163,14 @@ HAS_SENSORS_BATTERY = hasattr(psutil, "sensors_battery")
 HAS_BATTERY = HAS_SENSORS_BATTERY and psutil.sensors_battery()
 HAS_SENSORS_FANS = hasattr(psutil, "sensors_fans")
 HAS_SENSORS_TEMPERATURES = hasattr(psutil, "sensors_temperatures")
+try:
+    import concurrent.futures  # NOQA - requires "pip install futures" on py2
+except ImportError:
+    HAS_CONCURRENT_FUTURES = False
+else:
+    HAS_CONCURRENT_FUTURES = True
+# psutil.aio uses async generators
+HAS_ASYNCIO = sys.version_info >= (3, 6)
 
 # --- misc
 
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Tests for psutil.aio module."""
+
+import os
+import signal
+import subprocess
+
+import psutil
+from psutil import POSIX
+from psutil.tests import get_test_subprocess
+from psutil.tests import HAS_ASYNCIO
+from psutil.tests import mock
+from psutil.tests import PYTHON
+from psutil.tests import reap_children
+from psutil.tests import reload_module
+from psutil.tests import run_test_module_by_name
+from psutil.tests import unittest
+
+if HAS_ASYNCIO:
+    import asyncio
+    import psutil.aio
+
+
+@unittest.skipIf(not HAS_ASYNCIO, "not supported")
+class TestAio(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # other test modules may have reloaded psutil module
+        reload_module(psutil.aio)
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        reap_children()
+
+    def run_coro(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def collect(self, agen):
+        ret = []
+        while True:
+            try:
+                ret.append(self.run_coro(agen.__anext__()))
+            except StopAsyncIteration:  # NOQA
+                return ret
+
+    def test_cpu_percent(self):
+        percent = self.run_coro(psutil.aio.cpu_percent(interval=0.01))
+        self.assertGreaterEqual(percent, 0.0)
+        self.assertLessEqual(percent, 100.0)
+        ret = self.run_coro(psutil.aio.cpu_percent(0.01, percpu=True))
+        self.assertEqual(len(ret), psutil.cpu_count())
+        self.assertIsInstance(self.run_coro(psutil.aio.cpu_percent()), float)
+        with self.assertRaises(ValueError):
+            self.run_coro(psutil.aio.cpu_percent(interval=-1))
+
+    def test_cpu_times_percent(self):
+        ret = self.run_coro(psutil.aio.cpu_times_percent(interval=0.01))
+        self.assertEqual(ret._fields, psutil.cpu_times()._fields)
+        ret = self.run_coro(psutil.aio.cpu_times_percent(0.01, percpu=True))
+        self.assertEqual(len(ret), psutil.cpu_count())
+        with self.assertRaises(ValueError):
+            self.run_coro(psutil.aio.cpu_times_percent(interval=-1))
+
+    def _test_wait(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid)
+        with self.assertRaises(psutil.TimeoutExpired):
+            self.run_coro(psutil.aio.wait(p, timeout=0.01))
+        p.terminate()
+        code = self.run_coro(psutil.aio.wait(p, timeout=3))
+        if POSIX:
+            self.assertEqual(code, -signal.SIGTERM)
+        # already gone
+        self.assertIsNone(self.run_coro(psutil.aio.wait(p)))
+        with self.assertRaises(ValueError):
+            self.run_coro(psutil.aio.wait(p, timeout=-1))
+
+    def test_wait(self):
+        self._test_wait()
+
+    def test_wait_no_pidfd(self):
+        with mock.patch("psutil._psplatform.open_pidfd", create=True,
+                        return_value=None):
+            self._test_wait()
+
+    @unittest.skipIf(not getattr(psutil._psplatform, "HAS_PIDFD", False),
+                     "not supported")
+    def test_wait_pidfd_before_poll(self):
+        # the pidfd is supposed to be opened before the process is
+        # polled, else its PID may be reused in between
+        p = psutil.Process(get_test_subprocess().pid)
+        calls = []
+        open_pidfd = psutil._psplatform.open_pidfd
+        poll = psutil.aio._poll
+
+        def open_pidfd_mock(pid):
+            calls.append('open_pidfd')
+            return open_pidfd(pid)
+
+        def poll_mock(proc):
+            calls.append('poll')
+            return poll(proc)
+
+        with mock.patch("psutil._psplatform.open_pidfd",
+                        side_effect=open_pidfd_mock):
+            with mock.patch("psutil.aio._poll", side_effect=poll_mock):
+                with self.assertRaises(psutil.TimeoutExpired):
+                    self.run_coro(psutil.aio.wait(p, timeout=0.01))
+        self.assertEqual(calls[:2], ['open_pidfd', 'poll'])
+
+    def test_wait_procs(self):
+        sprocs = [get_test_subprocess() for x in range(3)]
+        procs = [psutil.Process(x.pid) for x in sprocs]
+        called = []
+
+        def callback(proc):
+            called.append(proc)
+
+        for p in procs[:2]:
+            p.terminate()
+        gone, alive = self.run_coro(
+            psutil.aio.wait_procs(procs, timeout=3, callback=callback))
+        self.assertEqual(sorted(gone, key=id), sorted(procs[:2], key=id))
+        self.assertEqual(alive, [procs[2]])
+        self.assertEqual(sorted(called, key=id), sorted(gone, key=id))
+        for p in gone:
+            if POSIX:
+                self.assertEqual(p.returncode, -signal.SIGTERM)
+        self.assertFalse(hasattr(procs[2], "returncode"))
+        self.assertEqual(self.run_coro(psutil.aio.wait_procs([])), ([], []))
+        with self.assertRaises(TypeError):
+            self.run_coro(psutil.aio.wait_procs(procs, callback=1))
+
+    def test_process_iter(self):
+        procs = self.collect(psutil.aio.process_iter(attrs=['pid']))
+        self.assertIn(os.getpid(), [x.pid for x in procs])
+        for p in procs:
+            self.assertEqual(p.info['pid'], p.pid)
+
+    def test_process_iter_yields_control(self):
+        agen = psutil.aio.process_iter()
+        self.run_coro(agen.__anext__())
+        # before inspecting the next process the generator is supposed
+        # to suspend itself (asyncio.sleep(0) yields None to the loop)
+        aw = agen.__anext__()
+        self.assertIsNone(aw.send(None))
+        with self.assertRaises(StopIteration) as cm:
+            aw.send(None)
+        self.assertIsInstance(cm.exception.value, psutil.Process)
+        self.run_coro(agen.aclose())
+
+    def test_popen(self):
+        p = psutil.aio.Popen([PYTHON, "-c", "import sys; sys.exit(5)"])
+        self.assertEqual(self.run_coro(p.wait()), 5)
+        self.assertEqual(p.returncode, 5)
+
+    def test_popen_ctx_manager(self):
+        async def run():
+            async with psutil.aio.Popen(
+                    [PYTHON, "-c", "pass"], stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE, stdin=subprocess.PIPE) as p:
+                pass
+            return p
+
+        p = self.run_coro(run())
+        self.assertTrue(p.stdout.closed)
+        self.assertTrue(p.stderr.closed)
+        self.assertTrue(p.stdin.closed)
+        self.assertEqual(p.returncode, 0)
+        # "with" would block the event loop
+        p = psutil.aio.Popen([PYTHON, "-V"])
+        self.addCleanup(p.kill)
+        with self.assertRaises(TypeError):
+            with p:
+                pass
+
+
+if __name__ == '__main__':
+    run_test_module_by_name(__file__)
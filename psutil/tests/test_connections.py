@@ -32,6 +32,7 @@ from psutil.tests import bind_unix_socket
 from psutil.tests import check_connection_ntuple
 from psutil.tests import create_sockets
 from psutil.tests import get_free_port
+from psutil.tests import get_test_subprocess
 from psutil.tests import HAS_CONNECTIONS_UNIX
 from psutil.tests import pyrun
 from psutil.tests import reap_children
@@ -492,6 +493,67 @@ class TestSystemWideConnections(unittest.TestCase):
             p = psutil.Process(pid)
             self.assertEqual(len(p.connections('all')), expected)
 
+    @skip_on_access_denied()
+    def test_iter(self):
+        with create_sockets():
+            conns = psutil.net_connections(kind='all')
+            self.assertEqual(
+                set(psutil.net_connections_iter(kind='all')), set(conns))
+            self.assertEqual(
+                set(psutil.net_connections_iter(kind='tcp',
+                                                status=psutil.CONN_LISTEN)),
+                set(x for x in psutil.net_connections(kind='tcp')
+                    if x.status == psutil.CONN_LISTEN))
+            self.assertEqual(
+                set(psutil.net_connections_iter(kind='all',
+                                                pid=os.getpid())),
+                set(x for x in conns if x.pid == os.getpid()))
+        self.assertRaises(ValueError, psutil.net_connections_iter,
+                          kind='???')
+
+    @skip_on_access_denied()
+    def test_by_pid(self):
+        sproc = get_test_subprocess()
+        self.addCleanup(reap_children)
+        with create_sockets():
+            pids = [os.getpid(), sproc.pid]
+            for kind in ('all', 'inet', 'tcp'):
+                ret = psutil.connections_by_pid(pids, kind)
+                self.assertEqual(sorted(ret.keys()), sorted(pids))
+                for pid in pids:
+                    self.assertEqual(
+                        sorted(ret[pid]),
+                        sorted(psutil.Process(pid).connections(kind)))
+        # gone processes are skipped
+        self.assertEqual(psutil.connections_by_pid([sproc.pid], 'inet'),
+                         {sproc.pid: []})
+        sproc.terminate()
+        sproc.wait()
+        self.assertEqual(psutil.connections_by_pid([sproc.pid], 'inet'), {})
+        self.assertRaises(ValueError, psutil.connections_by_pid, pids,
+                          kind='???')
+
+    @skip_on_access_denied()
+    def test_iter_ports(self):
+        server, client = tcp_socketpair(AF_INET, addr=("127.0.0.1", 0))
+        self.addCleanup(server.close)
+        self.addCleanup(client.close)
+        port = server.getsockname()[1]
+        conns = list(psutil.net_connections_iter(
+            kind='tcp4', lport=port, pid=os.getpid()))
+        self.assertEqual(len(conns), 1)
+        self.assertEqual(conns[0].laddr, server.getsockname())
+        self.assertEqual(conns[0].fd, server.fileno())
+        conns = list(psutil.net_connections_iter(
+            kind='all', rport=port, pid=os.getpid()))
+        self.assertEqual(len(conns), 1)
+        self.assertEqual(conns[0].laddr, client.getsockname())
+        self.assertEqual(conns[0].status, psutil.CONN_ESTABLISHED)
+        conns = list(psutil.net_connections_iter(
+            kind='tcp4', lport=port, status=psutil.CONN_LISTEN,
+            pid=os.getpid()))
+        self.assertEqual(conns, [])
+
 
 # =====================================================================
 # --- Miscellaneous tests
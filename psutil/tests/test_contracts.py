@@ -281,6 +281,7 @@ class TestFetchAllProcesses(unittest.TestCase):
         excluded_names = set([
             'send_signal', 'suspend', 'resume', 'terminate', 'kill', 'wait',
             'as_dict', 'parent', 'children', 'memory_info_ex', 'oneshot',
+            'memory_maps_iter',
         ])
         if LINUX and not HAS_RLIMIT:
             excluded_names.add('rlimit')
@@ -454,8 +455,15 @@ class TestFetchAllProcesses(unittest.TestCase):
             self.assertGreaterEqual(t.id, 0)
             self.assertGreaterEqual(t.user_time, 0)
             self.assertGreaterEqual(t.system_time, 0)
-            for field in t:
+            for field in t[:3]:
                 self.assertIsInstance(field, (int, float))
+            if LINUX:
+                self.assertIsInstance(t.name, str)
+                self.assertIn(t.status, VALID_PROC_STATUSES)
+                if t.cpu_num is not None:
+                    self.assertGreaterEqual(t.cpu_num, 0)
+                self.assertGreaterEqual(t.minor_faults, 0)
+                self.assertGreaterEqual(t.major_faults, 0)
 
     def cpu_times(self, ret, proc):
         assert is_namedtuple(ret)
@@ -16,10 +16,12 @@ import os
 import pprint
 import re
 import shutil
+import signal
 import socket
 import struct
 import tempfile
 import textwrap
+import threading
 import time
 import warnings
 
@@ -28,6 +30,7 @@ from psutil import LINUX
 from psutil._compat import PY3
 from psutil._compat import u
 from psutil.tests import call_until
+from psutil.tests import get_test_subprocess
 from psutil.tests import HAS_BATTERY
 from psutil.tests import HAS_RLIMIT
 from psutil.tests import MEMORY_TOLERANCE
@@ -41,6 +44,7 @@ from psutil.tests import run_test_module_by_name
 from psutil.tests import safe_rmpath
 from psutil.tests import sh
 from psutil.tests import skip_on_not_implemented
+from psutil.tests import tcp_socketpair
 from psutil.tests import TESTFN
 from psutil.tests import ThreadTask
 from psutil.tests import TRAVIS
@@ -829,6 +833,7 @@ class TestSystemNetwork(unittest.TestCase):
             pass
         psutil.net_connections(kind='inet6')
 
+    @mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False)
     def test_net_connections_mocked(self):
         def open_mock(name, *args, **kwargs):
             if name == '/proc/net/unix':
@@ -847,6 +852,262 @@ class TestSystemNetwork(unittest.TestCase):
             psutil.net_connections(kind='unix')
             assert m.called
 
+    def test_net_connections_cache(self):
+        self.addCleanup(psutil.net_connections.cache_clear)
+        psutil.net_connections.cache_clear()
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(s.close)
+        s.bind(("127.0.0.1", 0))
+        s.listen(5)
+        laddr = s.getsockname()
+
+        def find():
+            for conn in psutil.net_connections(kind='tcp4', cache=True):
+                if conn.laddr == laddr:
+                    return conn
+
+        conn = find()
+        self.assertEqual(conn.pid, os.getpid())
+        self.assertEqual(conn.fd, s.fileno())
+        info = psutil.net_connections.cache_info()
+        self.assertGreater(info.scans, 0)
+        self.assertGreater(info.pids, 0)
+        # second call: no fd dir is supposed to be scanned for our
+        # socket, which is resolved from the index
+        with mock.patch('psutil._pslinux.Connections.get_proc_inodes',
+                        side_effect=psutil._pslinux.Connections.
+                        get_proc_inodes, autospec=True) as m:
+            conn = find()
+            self.assertNotIn(os.getpid(), [x[0][1] for x in m.call_args_list])
+        self.assertEqual(conn.pid, os.getpid())
+        self.assertGreater(psutil.net_connections.cache_info().hits,
+                           info.hits)
+        # a new socket causes a miss and a re-scan
+        s2 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(s2.close)
+        s2.bind(("127.0.0.1", 0))
+        s2.listen(5)
+        misses = psutil.net_connections.cache_info().misses
+        conns = psutil.net_connections(kind='tcp4', cache=True)
+        conn = [x for x in conns if x.laddr == s2.getsockname()][0]
+        self.assertEqual(conn.pid, os.getpid())
+        self.assertEqual(conn.fd, s2.fileno())
+        self.assertGreater(psutil.net_connections.cache_info().misses, misses)
+        # ...which doesn't involve all processes
+        info = psutil.net_connections.cache_info()
+        self.assertLess(info.scans, info.pids * 2)
+        # results are the same as the non cached version
+        self.assertEqual(
+            set(psutil.net_connections(kind='all', cache=True)),
+            set(psutil.net_connections(kind='all')))
+
+    def test_net_connections_cache_stale_fd(self):
+        self.addCleanup(psutil.net_connections.cache_clear)
+        psutil.net_connections.cache_clear()
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(s.close)
+        s.bind(("127.0.0.1", 0))
+        s.listen(5)
+        laddr = s.getsockname()
+
+        def find():
+            for conn in psutil.net_connections(kind='tcp4', cache=True):
+                if conn.laddr == laddr:
+                    return conn
+
+        self.assertEqual(find().fd, s.fileno())
+        # /proc/{pid}/stat files are not read on every call
+        with mock.patch('psutil._pslinux.open_binary',
+                        side_effect=psutil._pslinux.open_binary) as m:
+            find()
+            self.assertFalse([x for x in m.call_args_list
+                              if x[0][0].endswith('/stat')])
+        # the cached fd is checked: only our PID is scanned again
+        fd = os.dup(s.fileno())
+        self.addCleanup(os.close, fd)
+        s.close()
+        scans = psutil.net_connections.cache_info().scans
+        conn = find()
+        self.assertEqual((conn.pid, conn.fd), (os.getpid(), fd))
+        self.assertEqual(psutil.net_connections.cache_info().scans,
+                         scans + 1)
+
+    def test_tcp_diag_all_states(self):
+        # the states psutil knows about, same as /proc/net/tcp*
+        # (TCP_NEW_SYN_RECV, 12, is not included)
+        self.assertEqual(
+            psutil._pslinux.TCP_DIAG_ALL_STATES,
+            sum(1 << x for x in psutil._pslinux.TCP_DIAG_STATUSES))
+
+    @unittest.skipIf(not psutil._pslinux.HAS_SOCK_DIAG,
+                     "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_sock_diag(self):
+        socks = []
+        for family, type_, addr in (
+                (socket.AF_INET, socket.SOCK_STREAM, ("127.0.0.1", 0)),
+                (socket.AF_INET, socket.SOCK_DGRAM, ("127.0.0.1", 0)),
+                (socket.AF_UNIX, socket.SOCK_STREAM, "\0" + TESTFN)):
+            s = socket.socket(family, type_)
+            self.addCleanup(s.close)
+            s.bind(addr)
+            socks.append(s)
+        socks[0].listen(5)
+        cext = psutil._pslinux.cext
+        with mock.patch.object(cext, 'net_connections_inet',
+                               side_effect=cext.net_connections_inet) as m1:
+            with mock.patch.object(
+                    cext, 'net_connections_unix',
+                    side_effect=cext.net_connections_unix) as m2:
+                try:
+                    conns = psutil.net_connections(kind='all')
+                except OSError:
+                    raise unittest.SkipTest("netlink not available")
+                assert m1.called
+                assert m2.called
+        with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+            self.assertEqual(set(conns),
+                             set(psutil.net_connections(kind='all')))
+        mine = [x for x in conns if x.pid == os.getpid()]
+        laddrs = [x.laddr for x in mine]
+        self.assertIn(socks[0].getsockname(), laddrs)
+        self.assertIn(socks[1].getsockname(), laddrs)
+        self.assertIn("@" + TESTFN, laddrs)
+        listen = [x for x in mine if x.laddr == socks[0].getsockname()][0]
+        self.assertEqual(listen.status, psutil.CONN_LISTEN)
+        self.assertEqual(listen.fd, socks[0].fileno())
+
+    def test_net_connections_bound_inactive(self):
+        # a TCP socket which is bound but neither listening nor
+        # connected is not listed in /proc/net/tcp, nor via netlink
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(s.close)
+        s.bind(("127.0.0.1", 0))
+        addr = s.getsockname()
+        laddrs = [x.laddr for x in psutil.net_connections('tcp')]
+        self.assertNotIn(addr, laddrs)
+        with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+            laddrs = [x.laddr for x in psutil.net_connections('tcp')]
+            self.assertNotIn(addr, laddrs)
+
+    def test_net_connections_iter_procfs(self):
+        # filters are applied on raw /proc/net/* fields
+        server, client = tcp_socketpair(socket.AF_INET,
+                                        addr=("127.0.0.1", 0))
+        self.addCleanup(server.close)
+        self.addCleanup(client.close)
+        port = server.getsockname()[1]
+        with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+            with mock.patch('psutil._pslinux._AddressDecoder.__call__',
+                            autospec=True,
+                            side_effect=psutil._pslinux._AddressDecoder.
+                            __call__) as m:
+                conns = list(psutil.net_connections_iter(
+                    kind='tcp', status=psutil.CONN_ESTABLISHED, rport=port))
+            # only our client socket was decoded (laddr and raddr)
+            self.assertEqual(m.call_count, 2)
+            self.assertEqual(len(conns), 1)
+            self.assertEqual(conns[0].raddr, server.getsockname())
+            with mock.patch('psutil._pslinux.Connections.process_inet') as m:
+                list(psutil.net_connections_iter(
+                    kind='inet', status=psutil.CONN_NONE))
+                # only UDP tables are read
+                self.assertEqual(m.call_count, 2)
+
+    @unittest.skipIf(not psutil._pslinux.HAS_SOCK_DIAG,
+                     "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_iter_sock_diag(self):
+        # TCP status filtering is done by the kernel
+        cext = psutil._pslinux.cext
+        with mock.patch.object(cext, 'net_connections_inet',
+                               side_effect=cext.net_connections_inet) as m:
+            try:
+                list(psutil.net_connections_iter(
+                    kind='tcp4', status=[psutil.CONN_LISTEN,
+                                         psutil.CONN_ESTABLISHED]))
+            except OSError:
+                raise unittest.SkipTest("netlink not available")
+            m.assert_called_once_with(socket.AF_INET, socket.IPPROTO_TCP,
+                                      (1 << 0x0A) | (1 << 0x01), -1, -1)
+
+    @unittest.skipIf(not psutil._pslinux.HAS_SOCK_DIAG,
+                     "NETLINK_SOCK_DIAG not supported")
+    def test_net_connections_iter_sock_diag_port(self):
+        # port filtering is done by the C extension, before building
+        # the Python tuples
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(s.close)
+        s.bind(("127.0.0.1", 0))
+        s.listen(5)
+        port = s.getsockname()[1]
+        cext = psutil._pslinux.cext
+        try:
+            rawlist = cext.net_connections_inet(
+                socket.AF_INET, socket.IPPROTO_TCP,
+                psutil._pslinux.TCP_DIAG_ALL_STATES, port, -1)
+        except OSError:
+            raise unittest.SkipTest("netlink not available")
+        self.assertEqual([x[1] for x in rawlist], [port])
+        with mock.patch.object(cext, 'net_connections_inet',
+                               side_effect=cext.net_connections_inet) as m:
+            cons = list(psutil.net_connections_iter(kind='tcp4',
+                                                    lport=port))
+            self.assertEqual(m.call_args[0][3:], (port, -1))
+        self.assertEqual([x.laddr for x in cons], [("127.0.0.1", port)])
+
+    def test_connections_by_pid(self):
+        # every /proc/net/* file is read once, no matter how many PIDs
+        sprocs = [get_test_subprocess() for x in range(3)]
+        self.addCleanup(reap_children)
+        pids = [os.getpid()] + [x.pid for x in sprocs]
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(s.close)
+        s.bind(("127.0.0.1", 0))
+        s.listen(5)
+        with mock.patch('psutil._pslinux.HAS_SOCK_DIAG', False):
+            with mock.patch('psutil._pslinux.Connections.process_inet',
+                            side_effect=psutil._pslinux.Connections.
+                            process_inet) as m:
+                ret = psutil.connections_by_pid(pids, kind='inet')
+                self.assertEqual(m.call_count, 4)
+        self.assertEqual(len(ret[os.getpid()]), 1)
+        self.assertEqual(ret[os.getpid()][0].laddr, s.getsockname())
+        for sproc in sprocs:
+            self.assertEqual(ret[sproc.pid], [])
+        # a socket referenced by multiple fds is returned once, same
+        # as Process.connections()
+        s2 = s.dup()
+        self.addCleanup(s2.close)
+        ret = psutil.connections_by_pid([os.getpid()], kind='inet')
+        self.assertEqual(ret[os.getpid()],
+                         psutil.Process().connections(kind='inet'))
+        self.assertEqual(len(ret[os.getpid()]), 1)
+
+    def test_address_decoder(self):
+        Connections = psutil._pslinux.Connections
+        for family, addrs in (
+                (socket.AF_INET, ("0500000A:0016", "0100007F:9E49",
+                                  "0100007F:0000", "FFFFFFFF:FFFF")),
+                (socket.AF_INET6, ("0000000000000000FFFF00000100007F:9E49",
+                                   "00000000000000000000000001000000:0050",
+                                   "00000000000000000000000000000000:0000"))):
+            decode = psutil._pslinux._AddressDecoder(family)
+            for addr in addrs * 2:
+                self.assertEqual(decode(addr),
+                                 Connections.decode_address(addr, family))
+
+    def test_net_connections_sock_diag_fallback(self):
+        # netlink not available: /proc/net/* files are parsed instead
+        with mock.patch('psutil._pslinux.cext.net_connections_inet',
+                        create=True, side_effect=OSError) as m1:
+            with mock.patch('psutil._pslinux.cext.net_connections_unix',
+                            create=True, side_effect=OSError):
+                with mock.patch('psutil._pslinux.Connections.process_inet',
+                                return_value=[]) as m2:
+                    psutil.net_connections(kind='inet')
+                    assert m2.called
+        if psutil._pslinux.HAS_SOCK_DIAG:
+            assert m1.called
+
 
 # =====================================================================
 # --- system disk
@@ -856,6 +1117,11 @@ class TestSystemNetwork(unittest.TestCase):
 @unittest.skipIf(not LINUX, "LINUX only")
 class TestSystemDisks(unittest.TestCase):
 
+    def setUp(self):
+        psutil._pslinux._disk_topology.cache_clear()
+
+    tearDown = setUp
+
     @unittest.skipIf(not hasattr(os, 'statvfs'), "os.statvfs() not available")
     @skip_on_not_implemented()
     def test_disk_partitions_and_usage(self):
@@ -969,6 +1235,62 @@ class TestSystemDisks(unittest.TestCase):
             self.assertEqual(ret.write_time, 8)
             self.assertEqual(ret.busy_time, 10)
 
+    def test_disk_io_counters_topology_cache(self):
+        # /proc/partitions and sector sizes are read again only when
+        # devices listed in /proc/diskstats change
+        diskstats = [u("   3    0   hda 1 2 3 4 5 6 7 8 9 10 11\n")]
+
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/partitions':
+                return io.StringIO(textwrap.dedent(u"""\
+                    major minor  #blocks  name
+
+                       8        0  488386584 hda
+                       8       16  488386584 hdb
+                    """))
+            elif name == '/proc/diskstats':
+                return io.StringIO(u("").join(diskstats))
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock) as m:
+            with mock.patch('psutil._pslinux.get_sector_size',
+                            return_value=4096) as m2:
+                for x in range(3):
+                    ret = psutil.disk_io_counters(perdisk=True,
+                                                  nowrap=False)
+                    self.assertEqual(list(ret), ['hda'])
+                    self.assertEqual(ret['hda'].read_bytes, 3 * 4096)
+                self.assertEqual(m2.call_count, 1)
+                opened = [x[0][0] for x in m.call_args_list]
+                self.assertEqual(opened.count('/proc/partitions'), 1)
+                self.assertEqual(opened.count('/proc/diskstats'), 3)
+                # a new disk appears
+                diskstats.append(
+                    u("   3    16   hdb 1 2 3 4 5 6 7 8 9 10 11\n"))
+                ret = psutil.disk_io_counters(perdisk=True, nowrap=False)
+                self.assertEqual(sorted(ret), ['hda', 'hdb'])
+                self.assertEqual(m2.call_count, 3)
+                opened = [x[0][0] for x in m.call_args_list]
+                self.assertEqual(opened.count('/proc/partitions'), 2)
+
+    def test_disk_io_inflight(self):
+        def open_mock(name, *args, **kwargs):
+            if name == '/sys/class/block/sda/inflight':
+                return io.BytesIO(b"       2        3\n")
+            elif name.startswith('/sys/class/block/'):
+                raise IOError(errno.ENOENT, "")
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            self.assertEqual(
+                psutil._pslinux.disk_io_inflight(['sda', 'nosuchdev']),
+                {'sda': 5})
     def test_disk_io_counters_kernel_2_6_limited_mocked(self):
         # Tests /proc/diskstats parsing format for 2.6 kernels,
         # where one line of /proc/partitions return a limited
@@ -1018,8 +1340,7 @@ class TestMisc(unittest.TestCase):
         psutil_value = psutil.boot_time()
         self.assertEqual(int(vmstat_value), int(psutil_value))
 
-    @mock.patch('psutil.traceback.print_exc')
-    def test_no_procfs_on_import(self, tb):
+    def test_no_procfs_on_import(self):
         my_procfs = tempfile.mkdtemp()
 
         with open(os.path.join(my_procfs, 'stat'), 'w') as f:
@@ -1030,15 +1351,19 @@ class TestMisc(unittest.TestCase):
         try:
             orig_open = open
 
+            rejected = []
+
             def open_mock(name, *args, **kwargs):
                 if name.startswith('/proc'):
+                    rejected.append(name)
                     raise IOError(errno.ENOENT, 'rejecting access for test')
                 return orig_open(name, *args, **kwargs)
 
             patch_point = 'builtins.open' if PY3 else '__builtin__.open'
             with mock.patch(patch_point, side_effect=open_mock):
                 reload_module(psutil)
-                assert tb.called
+                # /proc is not accessed at import time
+                self.assertEqual(rejected, [])
 
                 self.assertRaises(IOError, psutil.cpu_times)
                 self.assertRaises(IOError, psutil.cpu_times, percpu=True)
@@ -1087,6 +1412,132 @@ class TestMisc(unittest.TestCase):
                 psutil._pslinux.boot_time)
             assert m.called
 
+    def test_system_snapshot(self):
+        # every /proc file is supposed to be read only once
+        fields = ['cpu_times', 'cpu_stats', 'virtual_memory', 'swap_memory',
+                  'net_io_counters', 'boot_time']
+        paths = []
+
+        def open_mock(name, *args, **kwargs):
+            paths.append(name)
+            return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        with mock.patch(patch_point, side_effect=open_mock):
+            ret = psutil.system_snapshot(fields=fields, percpu=True)
+        self.assertEqual(sorted(paths), sorted(set(paths)))
+        self.assertIn('/proc/stat', paths)
+        self.assertIn('/proc/meminfo', paths)
+        self.assertEqual(len(ret['cpu_times']), psutil.cpu_count())
+        self.assertEqual(ret['virtual_memory'].total,
+                         psutil.virtual_memory().total)
+        self.assertEqual(ret['boot_time'], psutil.boot_time())
+        # the cache is gone
+        self.assertIsNone(psutil._pslinux._oneshot.cache)
+        with mock.patch(patch_point, side_effect=open_mock):
+            paths = []
+            psutil.cpu_times()
+            psutil.cpu_stats()
+            self.assertEqual(paths, ['/proc/stat', '/proc/stat'])
+
+    def test_system_oneshot_thread_local(self):
+        with psutil._pslinux.system_oneshot():
+            with psutil._pslinux.system_oneshot():
+                psutil.cpu_times()
+            ret = []
+            t = threading.Thread(
+                target=lambda: ret.append(
+                    getattr(psutil._pslinux._oneshot, 'cache', None)))
+            t.start()
+            t.join()
+            self.assertEqual(ret, [None])
+            self.assertEqual(list(psutil._pslinux._oneshot.cache),
+                             ['/proc/stat'])
+
+    def test_keep_files_open(self):
+        cache = psutil._pslinux.file_cache
+        self.addCleanup(psutil.keep_files_open, False)
+        psutil.keep_files_open()
+        t1 = psutil.cpu_times()
+        t2 = psutil.cpu_times()
+        self.assertGreaterEqual(t2.user, t1.user)
+        info = psutil.keep_files_open.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertGreaterEqual(info.hits, 1)
+        self.assertEqual(info.files, 1)
+        fd = cache._fds['/proc/stat']
+        psutil.cpu_times()
+        self.assertEqual(cache._fds['/proc/stat'], fd)
+        # per-process files are never cached
+        psutil.Process().name()
+        psutil._pslinux.cat('/proc/self/stat')
+        self.assertEqual(list(cache._fds), ['/proc/stat'])
+        # disabling closes all fds
+        psutil.keep_files_open(False)
+        self.assertEqual(cache._fds, {})
+        self.assertRaises(OSError, os.fstat, fd)
+        self.assertEqual(psutil.keep_files_open.cache_info().files, 0)
+
+    def test_keep_files_open_reread(self):
+        self.addCleanup(safe_rmpath, TESTFN)
+        self.addCleanup(psutil.keep_files_open, False)
+        with open(TESTFN, 'wb') as f:
+            f.write(b"foo")
+        psutil.keep_files_open()
+        self.assertEqual(psutil._pslinux.cat(TESTFN, binary=False), "foo")
+        with open(TESTFN, 'r+b') as f:
+            f.write(b"x" * 10000)
+        # content changed and is now bigger than the size hint
+        self.assertEqual(psutil._pslinux.cat(TESTFN, binary=True),
+                         b"x" * 10000)
+        self.assertEqual(psutil.keep_files_open.cache_info().hits, 1)
+        orig_pread = psutil._pslinux._pread
+        # a read shorter than requested means EOF: no other pread()
+        with mock.patch('psutil._pslinux._pread',
+                        side_effect=orig_pread) as m:
+            psutil._pslinux.cat(TESTFN, binary=True)
+            self.assertEqual(m.call_count, 1)
+        # seq_files may return a record shorter than requested
+        # before EOF
+        psutil._pslinux.file_cache.cache_clear()
+        with mock.patch('psutil._pslinux._pread',
+                        side_effect=lambda fd, size, offset: orig_pread(
+                            fd, size - 100, offset)):
+            self.assertEqual(psutil._pslinux.cat(TESTFN, binary=True),
+                             b"x" * 10000)
+
+    def test_keep_files_open_reopen(self):
+        self.addCleanup(safe_rmpath, TESTFN)
+        self.addCleanup(psutil.keep_files_open, False)
+        with open(TESTFN, 'wb') as f:
+            f.write(b"foo")
+        psutil.keep_files_open()
+        psutil._pslinux.cat(TESTFN)
+        fd = psutil._pslinux.file_cache._fds[TESTFN]
+        # the device went away (e.g. a CPU was unplugged)
+        orig_pread = psutil._pslinux._pread
+        failed = []
+
+        def pread(fd_, size, offset):
+            # the new fd may get the same number: only fail once
+            if fd_ == fd and not failed:
+                failed.append(fd_)
+                raise OSError(errno.ENODEV, "")
+            return orig_pread(fd_, size, offset)
+
+        with mock.patch('psutil._pslinux._pread', side_effect=pread):
+            self.assertEqual(psutil._pslinux.cat(TESTFN), b"foo")
+        self.assertEqual(psutil.keep_files_open.cache_info().reopens, 1)
+        # the file is gone for real
+        safe_rmpath(TESTFN)
+        with mock.patch('psutil._pslinux._pread',
+                        side_effect=OSError(errno.ENODEV, "")):
+            self.assertRaises(IOError, psutil._pslinux.cat, TESTFN)
+            self.assertEqual(psutil._pslinux.cat(TESTFN, fallback=None),
+                             None)
+        self.assertNotIn(TESTFN, psutil._pslinux.file_cache._fds)
+
     def test_users_mocked(self):
         # Make sure ':0' and ':0.0' (returned by C ext) are converted
         # to 'localhost'.
@@ -1141,6 +1592,8 @@ class TestMisc(unittest.TestCase):
         flag = []
         orig_open = open
         patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        psutil._pslinux._disk_topology.cache_clear()
+        self.addCleanup(psutil._pslinux._disk_topology.cache_clear)
         with mock.patch(patch_point, side_effect=open_mock):
             psutil.disk_io_counters()
             assert flag
@@ -1470,6 +1923,72 @@ class TestProcess(unittest.TestCase):
         self.assertAlmostEqual(
             mem.swap, sum([x.swap for x in maps]), delta=4096)
 
+    def test_smaps_totals(self):
+        self.addCleanup(safe_rmpath, TESTFN)
+        with open(TESTFN, "w") as f:
+            f.write(textwrap.dedent("""\
+                00400000-0040b000 r-xp 00000000 fc:01 1 /usr/bin/%s
+                Size:                 44 kB
+                Rss:                  40 kB
+                Pss:                  20 kB
+                Pss_Dirty:             8 kB
+                Private_Clean:         4 kB
+                Private_Dirty:         8 kB
+                Swap:                  2 kB
+                SwapPss:               1 kB
+                VmFlags: rd ex mr mw me dw
+                7fff1000-7fff2000 rw-p 00000000 00:00 0 [stack]
+                Pss:                  10 kB
+                Private_Dirty:        16 kB
+                Private_Hugetlb:       1 kB
+                Swap:                  3 kB
+                """ % ("x" * 2000)))
+        self.assertEqual(psutil._pslinux.cext.proc_smaps_totals(TESTFN),
+                         (29 * 1024, 30 * 1024, 5 * 1024))
+        # a line starting with a NUL byte
+        with open(TESTFN, "wb") as f:
+            f.write(b"\0\nPss:   7 kB\n\0x\nSwap:   1 kB\n")
+        self.assertEqual(psutil._pslinux.cext.proc_smaps_totals(TESTFN),
+                         (0, 7 * 1024, 1024))
+        safe_rmpath(TESTFN)
+        self.assertRaises(OSError, psutil._pslinux.cext.proc_smaps_totals,
+                          TESTFN)
+
+    def test_memory_full_info_smaps_fallback(self):
+        # kernel < 4.14: no smaps_rollup
+        p = psutil.Process()
+        with mock.patch('psutil._pslinux.cext.proc_smaps_totals',
+                        return_value=(1, 2, 3)) as m:
+            with mock.patch('psutil._pslinux.has_proc_file',
+                            side_effect=lambda name: name != 'smaps_rollup'):
+                mem = p.memory_full_info()
+            self.assertEqual((mem.uss, mem.pss, mem.swap), (1, 2, 3))
+            self.assertEqual(m.call_args[0][0],
+                             '/proc/%s/smaps' % os.getpid())
+            if psutil._pslinux.has_proc_file('smaps_rollup'):
+                p.memory_full_info()
+                self.assertEqual(m.call_args[0][0],
+                                 '/proc/%s/smaps_rollup' % os.getpid())
+
+    def test_optional_proc_files_missing(self):
+        # emulate a kernel without /proc/{pid}/smaps
+        p = psutil.Process()
+        with mock.patch('psutil._pslinux.has_proc_file',
+                        return_value=False) as m:
+            mem = p.memory_full_info()
+            self.assertEqual(mem._fields, p.memory_info()._fields)
+            assert m.called
+
+    def test_optional_proc_files_methods(self):
+        # methods depending on optional /proc files are not defined
+        # if the kernel doesn't provide them
+        self.assertEqual(hasattr(psutil.Process, "io_counters"),
+                         os.path.exists('/proc/self/io'))
+        self.assertEqual(hasattr(psutil.Process, "memory_maps"),
+                         os.path.exists('/proc/self/smaps'))
+        self.assertEqual(hasattr(psutil._pslinux.Process, "memory_maps_iter"),
+                         os.path.exists('/proc/self/smaps'))
+
     # On PYPY file descriptors are not closed fast enough.
     @unittest.skipIf(PYPY, "unreliable on PYPY")
     def test_open_files_mode(self):
@@ -1579,35 +2098,173 @@ class TestProcess(unittest.TestCase):
             self.assertEqual(psutil.Process().exe(), "/home/foo")
             self.assertEqual(psutil.Process().cwd(), "/home/foo")
 
-    def test_threads_mocked(self):
-        # Test the case where os.listdir() returns a file (thread)
-        # which no longer exists by the time we open() it (race
-        # condition). threads() is supposed to ignore that instead
-        # of raising NSP.
-        def open_mock(name, *args, **kwargs):
-            if name.startswith('/proc/%s/task' % os.getpid()):
-                raise IOError(errno.ENOENT, "")
-            else:
-                return orig_open(name, *args, **kwargs)
+    def test_open_files_all(self):
+        self.addCleanup(safe_rmpath, TESTFN)
+        me = os.getpid()
+        with open(TESTFN, 'w') as f:
+            f.write("foo")
+            f.flush()
+            r, w = os.pipe()
+            self.addCleanup(os.close, r)
+            self.addCleanup(os.close, w)
+            sock = socket.socket()
+            self.addCleanup(sock.close)
+            files = [x for x in psutil.open_files_all() if x.pid == me]
+            self.assertEqual([x.fd for x in files],
+                             sorted(set(x.fd for x in files)))
+            byfd = dict((x.fd, x) for x in files)
+            ntuple = byfd[f.fileno()]
+            self.assertEqual(ntuple.path, os.path.abspath(TESTFN))
+            self.assertEqual(ntuple.type, "file")
+            self.assertEqual(ntuple.position, 3)
+            self.assertEqual(ntuple.mode, 'w')
+            self.assertEqual(ntuple.flags & os.O_WRONLY, os.O_WRONLY)
+            self.assertIn((ntuple.path, ntuple.fd, ntuple.position,
+                           ntuple.mode, ntuple.flags),
+                          psutil.Process().open_files())
+            self.assertEqual(byfd[r].type, "fifo")
+            self.assertTrue(byfd[r].path.startswith("pipe:"))
+            self.assertEqual(byfd[sock.fileno()].type, "socket")
+            # pids filter
+            self.assertEqual(sorted(psutil.open_files_all(pids=[me])),
+                             sorted(files))
+        self.assertEqual(list(psutil.open_files_all(pids=[2 ** 31])), [])
+        with mock.patch("psutil._pslinux.cext.proc_open_fds",
+                        side_effect=OSError(errno.EACCES, "")) as m:
+            self.assertEqual(list(psutil.open_files_all(pids=[me])), [])
+            assert m.called
+        with mock.patch("psutil._pslinux.cext.proc_open_fds",
+                        side_effect=OSError(errno.EIO, "")):
+            self.assertRaises(OSError, list, psutil.open_files_all([me]))
+
+    def test_file_users(self):
+        self.addCleanup(safe_rmpath, TESTFN)
+        self.addCleanup(safe_rmpath, TESTFN + '2')
+        self.addCleanup(psutil.file_users.cache_clear)
+        me = os.getpid()
+        nobody = TESTFN + '2'
+        with open(nobody, 'w'):
+            pass
+        with open(TESTFN, 'w') as f:
+            for cache in (False, True):
+                ret = psutil.file_users([TESTFN, nobody, "?"], cache=cache)
+                self.assertEqual(ret, {TESTFN: [(me, f.fileno())],
+                                       nobody: [], "?": []})
+            # relative vs absolute path
+            ret = psutil.file_users([os.path.abspath(TESTFN)])
+            self.assertEqual(ret[os.path.abspath(TESTFN)],
+                             [(me, f.fileno())])
+            # deleted file
+            os.remove(TESTFN)
+            self.assertEqual(psutil.file_users([TESTFN])[TESTFN],
+                             [(me, f.fileno())])
+        self.assertRaises(TypeError, psutil.file_users, TESTFN)
+
+    def test_file_users_cache(self):
+        self.addCleanup(reap_children)
+        self.addCleanup(safe_rmpath, TESTFN)
+        self.addCleanup(psutil.file_users.cache_clear)
+        psutil.file_users.cache_clear()
+        with open(TESTFN, 'w') as f:
+            expected = {TESTFN: [(os.getpid(), f.fileno())]}
+            self.assertEqual(psutil.file_users([TESTFN], cache=True),
+                             expected)
+            info = psutil.file_users.cache_info()
+            self.assertEqual(info.hits, 1)
+            self.assertGreater(info.pids, 0)
+            # processes are scanned once on the first call
+            self.assertLessEqual(info.scans, info.pids + 1)
+            # nothing changed: processes are not scanned again
+            self.assertEqual(psutil.file_users([TESTFN], cache=True),
+                             expected)
+            info2 = psutil.file_users.cache_info()
+            self.assertEqual(info2.hits, 2)
+            self.assertLess(info2.scans - info.scans, info.pids)
+            # a new process gets indexed
+            sproc = get_test_subprocess()
+            psutil.file_users([TESTFN], cache=True)
+            self.assertIn(sproc.pid,
+                          psutil._pslinux._file_inode_index.procs)
+        # fd closed in the meantime: cached entries are verified and
+        # the stale process is scanned again
+        self.assertEqual(psutil.file_users([TESTFN], cache=True),
+                         {TESTFN: []})
+        info = psutil.file_users.cache_info()
+        self.assertEqual(info.misses, 1)
+        # a path nobody has open does not cause all processes to be
+        # scanned again
+        for x in range(2):
+            self.assertEqual(psutil.file_users([TESTFN], cache=True),
+                             {TESTFN: []})
+        info2 = psutil.file_users.cache_info()
+        self.assertEqual(info2.misses, 3)
+        self.assertLess(info2.scans - info.scans, info.pids)
+        psutil.file_users.cache_clear()
+        self.assertEqual(psutil.file_users.cache_info().pids, 0)
+
+    def test_file_users_unix_socket(self):
+        self.addCleanup(safe_rmpath, TESTFN)
+        sock = socket.socket(socket.AF_UNIX)
+        self.addCleanup(sock.close)
+        sock.bind(TESTFN)
+        sock.listen(1)
+        path = os.path.abspath(TESTFN)
+        self.assertEqual(psutil.file_users([path])[path],
+                         [(os.getpid(), sock.fileno())])
 
-        orig_open = open
-        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
-        with mock.patch(patch_point, side_effect=open_mock) as m:
+    def test_threads_mocked(self):
+        # Test the case where the task directory lists a thread
+        # which no longer exists by the time its stat file is read
+        # (race condition). threads() is supposed to ignore that
+        # instead of raising NSP.
+        with mock.patch('psutil._pslinux.cext.proc_threads',
+                        return_value=([], True)) as m:
             ret = psutil.Process().threads()
             assert m.called
             self.assertEqual(ret, [])
+        # ...unless the process is gone
+        p = psutil.Process(get_test_subprocess().pid)
+        p.kill()
+        p.wait()
+        with mock.patch('psutil._pslinux.cext.proc_threads',
+                        return_value=([], True)):
+            self.assertRaises(psutil.NoSuchProcess, p.threads)
 
         # ...but if it bumps into something != ENOENT we want an
         # exception.
-        def open_mock(name, *args, **kwargs):
-            if name.startswith('/proc/%s/task' % os.getpid()):
-                raise IOError(errno.EPERM, "")
-            else:
-                return orig_open(name, *args, **kwargs)
-
-        with mock.patch(patch_point, side_effect=open_mock):
+        with mock.patch('psutil._pslinux.cext.proc_threads',
+                        side_effect=OSError(errno.EPERM, "")):
             self.assertRaises(psutil.AccessDenied, psutil.Process().threads)
 
+    def test_threads(self):
+        # compare against /proc/{pid}/task/{tid}/stat
+        with ThreadTask():
+            p = psutil.Process()
+            threads = p.threads()
+            self.assertEqual([x.id for x in threads],
+                             sorted(int(x) for x in os.listdir(
+                                 '/proc/%s/task' % os.getpid())))
+            for t in threads:
+                try:
+                    with open('/proc/%s/task/%s/stat' % (
+                            os.getpid(), t.id), 'rb') as f:
+                        fields = f.read().rsplit(b')', 1)[1].split()
+                except IOError:
+                    continue
+                self.assertEqual(t.name, psutil.Process(t.id).name())
+                # counters may have grown in the meantime
+                self.assertLessEqual(t.minor_faults, int(fields[7]))
+                self.assertGreater(t.minor_faults, 0)
+                self.assertGreaterEqual(t.major_faults, 0)
+                self.assertIn(t.status, (psutil.STATUS_RUNNING,
+                                         psutil.STATUS_SLEEPING))
+                self.assertIn(t.cpu_num, range(psutil.cpu_count()))
+            # filter
+            tid = threads[-1].id
+            self.assertEqual([x.id for x in p.threads(tids=[tid, 2 ** 31])],
+                             [tid])
+            self.assertEqual(p.threads(tids=[]), [])
+
     def test_exe_mocked(self):
         with mock.patch('psutil._pslinux.readlink',
                         side_effect=OSError(errno.ENOENT, "")) as m1:
@@ -1629,6 +2286,73 @@ class TestProcess(unittest.TestCase):
                     self.assertRaises(
                         psutil.ZombieProcess, psutil.Process().exe)
 
+    def test_memory_maps_iter_error_while_iterating(self):
+        # errors occurring after the first mapped region was returned
+        # are translated as well
+        def lines(exc):
+            yield b"00400000-0040b000 r-xp 00000000 fc:01 1   /bin/foo\n"
+            yield b"Rss:                  40 kB\n"
+            yield b"0060a000-0060b000 rw-p 0000a000 fc:01 1   /bin/foo\n"
+            raise exc
+
+        p = psutil.Process()
+        for exc, exc_class in (
+                (IOError(errno.ESRCH, ""), psutil.NoSuchProcess),
+                (IOError(errno.EACCES, ""), psutil.AccessDenied)):
+            f = mock.MagicMock()
+            f.__enter__.return_value = f
+            f.__iter__.return_value = lines(exc)
+            with mock.patch.object(psutil._pslinux.Process, '_open_binary',
+                                   return_value=f):
+                it = p.memory_maps_iter(grouped=False)
+                self.assertEqual(next(it).path, '/bin/foo')
+                self.assertRaises(exc_class, next, it)
+
+    def test_memory_maps_iter_mocked(self):
+        def open_mock(name, *args, **kwargs):
+            if name == '/proc/%s/smaps' % os.getpid():
+                return io.BytesIO(textwrap.dedent("""\
+                    00400000-0040b000 r-xp 00000000 fc:01 1   /bin/foo
+                    Size:                 44 kB
+                    Rss:                  40 kB
+                    Pss:                  20 kB
+                    Private_Dirty:         8 kB
+                    Swap:                  2 kB
+                    VmFlags: rd ex mr mw me dw
+                    0060a000-0060b000 rw-p 0000a000 fc:01 1   /bin/foo
+                    Size:                  4 kB
+                    Rss:                   4 kB
+                    7fff1000-7fff2000 rw-p 00000000 00:00 0
+                    Size:                  4 kB
+                    Rss:                   8 kB
+                    Private_Dirty:        16 kB
+                    """).encode())
+            else:
+                return orig_open(name, *args, **kwargs)
+
+        orig_open = open
+        patch_point = 'builtins.open' if PY3 else '__builtin__.open'
+        p = psutil.Process()
+        with mock.patch(patch_point, side_effect=open_mock):
+            grouped = sorted(p.memory_maps_iter())
+            ungrouped = list(p.memory_maps_iter(grouped=False,
+                                                path='[anon]'))
+        self.assertEqual(len(grouped), 2)
+        foo, anon = grouped
+        self.assertEqual(foo.path, '/bin/foo')
+        self.assertEqual(foo.rss, 44 * 1024)
+        self.assertEqual(foo.size, 48 * 1024)
+        self.assertEqual(foo.pss, 20 * 1024)
+        self.assertEqual(foo.private_dirty, 8 * 1024)
+        self.assertEqual(foo.swap, 2 * 1024)
+        self.assertEqual(foo.anonymous, 0)
+        self.assertEqual(anon.path, '[anon]')
+        self.assertEqual(len(ungrouped), 1)
+        self.assertEqual(ungrouped[0].addr, '7fff1000-7fff2000')
+        self.assertEqual(ungrouped[0].perms, 'rw-p')
+        self.assertEqual(ungrouped[0].rss, 8 * 1024)
+        self.assertEqual(ungrouped[0].private_dirty, 16 * 1024)
+
     def test_issue_1014(self):
         # Emulates a case where smaps file does not exist. In this case
         # wrap_exception decorator should not raise NoSuchProcess.
@@ -1739,6 +2463,21 @@ class TestProcess(unittest.TestCase):
             self.assertEqual(cpu.children_system, 5 / CLOCK_TICKS)
             self.assertEqual(p.cpu_num(), 6)
 
+    def test_stat_file_parsing_c(self):
+        from psutil._pslinux import CLOCK_TICKS
+        parse = psutil._psplatform.cext.proc_parse_stat
+        data = b"123 (a) b (c)) S 1 0 0 34817 " + b"7 " * 6 + \
+            b"10 20 30 40 " + b"0 " * 4 + b"500 " + b"0 " * 16 + b"3\n"
+        self.assertEqual(
+            parse(data),
+            (b"a) b (c)", b"S", 1, 34817, 10 / CLOCK_TICKS,
+             20 / CLOCK_TICKS, 30 / CLOCK_TICKS, 40 / CLOCK_TICKS,
+             500 / CLOCK_TICKS, 3))
+        # "processor" field may be missing on old kernels
+        self.assertIsNone(parse(data[:data.rfind(b" 0 ")])[9])
+        self.assertRaises(ValueError, parse, b"123 (foo")
+        self.assertRaises(ValueError, parse, b"123 (foo) S 1 2")
+
     def test_status_file_parsing(self):
         def open_mock(name, *args, **kwargs):
             if name.startswith('/proc/%s/status' % os.getpid()):
@@ -1770,6 +2509,360 @@ class TestProcess(unittest.TestCase):
             self.assertEqual(gids.saved, 1006)
             self.assertEqual(p._proc._get_eligible_cpus(), list(range(0, 8)))
 
+    def test_process_table(self):
+        attrs = psutil._pslinux.PROCESS_TABLE_ATTRS
+        p = psutil.Process()
+        table = psutil.process_table(attrs)
+        self.assertEqual(sorted(table.keys()), sorted(attrs))
+        idx = table['pid'].index(p.pid)
+        info = p.as_dict(attrs)
+        for name in ('name', 'ppid', 'status', 'terminal', 'create_time',
+                     'num_threads', 'uids', 'gids'):
+            self.assertEqual(table[name][idx], info[name], msg=name)
+        # these may change in between calls
+        for name in ('cpu_times', 'cpu_num', 'memory_info',
+                     'num_ctx_switches'):
+            self.assertEqual(type(table[name][idx]), type(info[name]))
+
+    def test_process_table_native(self):
+        # no Process instance is supposed to be created...
+        with mock.patch('psutil.Process') as m:
+            psutil.process_table(['name', 'memory_info', 'uids'])
+            assert not m.called
+        # ...unless we ask for something which can't be collected
+        # from /proc/{pid}/stat, statm and status
+        with mock.patch('psutil._psplatform.process_table') as m:
+            table = psutil.process_table(['name', 'cmdline'])
+            assert not m.called
+        self.assertIn(os.getpid(), table['pid'])
+        self.assertEqual(len(table['pid']), len(table['cmdline']))
+
+    def test_ppid_map(self):
+        ppid_map = psutil._pslinux.ppid_map()
+        for p in psutil.process_iter():
+            try:
+                ppid = p.ppid()
+            except psutil.NoSuchProcess:
+                continue
+            if p.pid in ppid_map:
+                self.assertEqual(ppid_map[p.pid], ppid)
+
+    @unittest.skipIf(
+        not psutil._pslinux.has_proc_file("task/{tid}/children"),
+                     "/proc/{pid}/task/{tid}/children not available")
+    def test_children_pids(self):
+        # get rid of children left behind by other tests
+        reap_children(recursive=True)
+        self.addCleanup(reap_children)
+        p = psutil.Process()
+        sproc = get_test_subprocess()
+        self.assertIn(sproc.pid, p._proc.children_pids())
+        self.assertEqual(p.children(), [psutil.Process(sproc.pid)])
+
+    def test_children_ppid_map(self):
+        # emulate a kernel without /proc/{pid}/task/{tid}/children
+        reap_children(recursive=True)
+        self.addCleanup(reap_children)
+        sproc = get_test_subprocess()
+        p = psutil.Process()
+        with mock.patch('psutil._pslinux.has_proc_file', return_value=False):
+            with mock.patch('psutil._pslinux.ppid_map',
+                            side_effect=psutil._pslinux.ppid_map) as m:
+                self.assertEqual(p.children(), [psutil.Process(sproc.pid)])
+                self.assertEqual(p.children(recursive=True),
+                                 [psutil.Process(sproc.pid)])
+                assert m.called
+
+    @unittest.skipIf(not psutil._pslinux.HAS_PIDFD, "not supported")
+    def test_wait_pidfd(self):
+        self.addCleanup(reap_children)
+        p = psutil.Process(get_test_subprocess().pid)
+        with mock.patch('psutil._psposix.wait_pid',
+                        side_effect=psutil._psposix.wait_pid) as m:
+            self.assertRaises(psutil.TimeoutExpired, p.wait, 0.01)
+            assert not m.called
+            p.terminate()
+            self.assertEqual(p.wait(3), -signal.SIGTERM)
+            # only used to reap the process once it's gone
+            m.assert_called_once_with(p.pid, 0)
+        self.assertIsNone(p.wait())
+
+    def test_wait_pidfd_fallback(self):
+        self.addCleanup(reap_children)
+        p = psutil.Process(get_test_subprocess().pid)
+        for patcher in (
+                mock.patch('psutil._pslinux.HAS_PIDFD', False),
+                mock.patch('psutil._pslinux._pidfd_open', create=True,
+                           side_effect=OSError(errno.ENOSYS, ""))):
+            with patcher:
+                with mock.patch('psutil._psposix.wait_pid',
+                                side_effect=psutil._psposix.wait_pid) as m:
+                    self.assertRaises(psutil.TimeoutExpired, p.wait, 0.01)
+                    m.assert_called_once_with(p.pid, 0.01)
+        p.terminate()
+        with mock.patch('psutil._pslinux.HAS_PIDFD', False):
+            self.assertEqual(p.wait(3), -signal.SIGTERM)
+
+    @unittest.skipIf(not psutil._pslinux.HAS_DIR_FD, "not supported")
+    def test_anchor(self):
+        sproc = get_test_subprocess()
+        p = psutil.Process(sproc.pid, anchor=True)
+        self.assertTrue(p._proc.anchored)
+        self.assertEqual(p.cmdline(), psutil.Process(sproc.pid).cmdline())
+        # identity is checked via the directory fd, without parsing
+        # /proc/{pid}/stat again
+        with mock.patch('psutil._pslinux.Process._parse_stat_file') as m:
+            self.assertTrue(p.is_running())
+            assert not m.called
+        if psutil._pslinux._pidfd_send_signal is not None:
+            with mock.patch('psutil._pslinux._pidfd_send_signal',
+                            side_effect=psutil._pslinux._pidfd_send_signal) \
+                    as m:
+                p.terminate()
+                assert m.called
+        else:
+            p.terminate()
+        sproc.wait()
+        self.assertFalse(p.is_running())
+        # the reads through the dir fd fail with ESRCH even if the PID
+        # was reused in the meantime
+        p._gone = False
+        with mock.patch('psutil._pslinux.pid_exists', return_value=True):
+            self.assertRaises(psutil.NoSuchProcess, p.status)
+            self.assertRaises(psutil.NoSuchProcess, p.cmdline)
+            self.assertRaises(psutil.NoSuchProcess, p.kill)
+        fds = (p._proc._dirfd, p._proc._pidfd)
+        p._proc.unanchor()
+        for fd in fds:
+            if fd is not None:
+                self.assertRaises(OSError, os.fstat, fd)
+        self.assertFalse(p._proc.anchored)
+
+    def test_anchor_not_supported(self):
+        with mock.patch('psutil._pslinux.HAS_DIR_FD', False):
+            p = psutil.Process(anchor=True)
+        self.assertFalse(p._proc.anchored)
+        self.assertTrue(p.is_running())
+        self.assertEqual(p.pid, os.getpid())
+
+    @unittest.skipIf(not psutil._pslinux.HAS_PIDFD, "not supported")
+    def test_wait_procs_pidfd(self):
+        self.addCleanup(reap_children)
+        procs = [psutil.Process(get_test_subprocess().pid) for x in range(3)]
+        procs[0].terminate()
+        procs[1].terminate()
+        with mock.patch('psutil._pslinux.wait_pidfds',
+                        side_effect=psutil._pslinux.wait_pidfds) as m:
+            gone, alive = psutil.wait_procs(procs, timeout=3)
+            assert m.called
+        # SIGTERM'ed processes can't possibly last 3 secs
+        self.assertEqual(sorted(gone, key=id), sorted(procs[:2], key=id))
+        self.assertEqual(alive, [procs[2]])
+        for p in gone:
+            self.assertEqual(p.returncode, -signal.SIGTERM)
+        # a process which is already gone
+        gone, alive = psutil.wait_procs(procs[:1], timeout=0)
+        self.assertEqual(gone, procs[:1])
+
+    def test_wait_procs_pidfd_fallback(self):
+        # fds exhausted; processes which can't be watched are polled
+        self.addCleanup(reap_children)
+        procs = [psutil.Process(get_test_subprocess().pid) for x in range(2)]
+        for p in procs:
+            p.terminate()
+        with mock.patch('psutil._pslinux._pidfd_open', create=True,
+                        side_effect=OSError(errno.EMFILE, "")) as m:
+            gone, alive = psutil.wait_procs(procs, timeout=3)
+            if psutil._pslinux.HAS_PIDFD:
+                assert m.called
+        self.assertEqual(len(gone), 2)
+        self.assertEqual(alive, [])
+
+    @unittest.skipIf(not psutil._pslinux.HAS_PIDFD, "not supported")
+    def test_wait_procs_pidfd_partial_fallback(self):
+        # the second process can't be watched: it's supposed to be
+        # polled while waiting for the first one
+        self.addCleanup(reap_children)
+        procs = [psutil.Process(get_test_subprocess().pid) for x in range(2)]
+        procs[1].terminate()
+        pidfd_open = psutil._pslinux._pidfd_open
+
+        def pidfd_open_mock(pid):
+            if pid == procs[1].pid:
+                raise OSError(errno.EMFILE, "")
+            return pidfd_open(pid)
+
+        called = []
+        with mock.patch('psutil._pslinux._pidfd_open',
+                        side_effect=pidfd_open_mock):
+            t = time.time()
+            gone, alive = psutil.wait_procs(
+                procs, timeout=2,
+                callback=lambda p: called.append(time.time() - t))
+        self.assertEqual(gone, [procs[1]])
+        self.assertEqual(alive, [procs[0]])
+        self.assertEqual(gone[0].returncode, -signal.SIGTERM)
+        self.assertEqual(len(called), 1)
+        self.assertLess(called[0], 1)
+
+    def test_process_events(self):
+        def spawn():
+            time.sleep(0.1)
+            sprocs.append(get_test_subprocess())
+            sprocs[0].terminate()
+            sprocs[0].wait()
+
+        self.addCleanup(reap_children)
+        sprocs = []
+        events = []
+        gen = psutil.process_events(timeout=3)
+        t = threading.Thread(target=spawn)
+        try:
+            t.start()
+            for event in gen:
+                events.append(event)
+                if event.type == psutil.PROC_EVENT_EXIT and \
+                        sprocs and event.pid == sprocs[0].pid:
+                    # while listening process_iter() doesn't list /proc,
+                    # but only if asked to
+                    with mock.patch('psutil.pids') as m:
+                        self.assertIn(os.getpid(), [
+                            x.pid for x in psutil.process_iter(
+                                use_events=True)])
+                        assert not m.called
+                    with mock.patch('psutil.pids',
+                                    side_effect=psutil.pids) as m:
+                        list(psutil.process_iter())
+                        assert m.called
+                    break
+        except (psutil.AccessDenied, NotImplementedError):
+            raise self.skipTest("proc connector not available")
+        finally:
+            gen.close()
+            t.join()
+        self.assertEqual(psutil._proc_events_listeners, [])
+        pid = sprocs[0].pid
+        events = [x for x in events if pid in (x.pid, x.ppid)]
+        self.assertEqual([x.type for x in events], [
+            psutil.PROC_EVENT_FORK, psutil.PROC_EVENT_EXEC,
+            psutil.PROC_EVENT_EXIT])
+        self.assertEqual(events[0].ppid, os.getpid())
+        self.assertEqual(events[-1].exitcode, -signal.SIGTERM)
+
+    def test_process_events_parse(self):
+        def datagram(what, *args):
+            # event_data is a union, hence fixed size
+            args += (0, ) * (6 - len(args))
+            cls = psutil._pslinux.ProcEventsListener
+            data = cls.EVENT_HDR.pack(what, 0, 0) + struct.pack("=6i", *args)
+            cn_msg = cls.CN_MSG.pack(1, 1, 0, 0, len(data), 0) + data
+            return cls.NLMSG_HDR.pack(
+                cls.NLMSG_HDR.size + len(cn_msg), 3, 0, 0, 0) + cn_msg
+
+        listener = psutil._pslinux.ProcEventsListener.__new__(
+            psutil._pslinux.ProcEventsListener)
+        listener._pids = set([1, 10])
+        # fork of a process and of a thread
+        events = listener._parse(datagram(1, 10, 10, 11, 11) +
+                                 datagram(1, 10, 10, 12, 10))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].type, psutil.PROC_EVENT_FORK)
+        self.assertEqual((events[0].pid, events[0].ppid), (11, 10))
+        self.assertEqual(listener._pids, set([1, 10, 11]))
+        # exec, uid change and exit (killed by SIGKILL)
+        events = listener._parse(datagram(2, 11, 11))
+        self.assertEqual(events[0].type, psutil.PROC_EVENT_EXEC)
+        events = listener._parse(datagram(4, 11, 11, 1000, 0))
+        self.assertEqual((events[0].ruid, events[0].euid), (1000, 0))
+        events = listener._parse(datagram(0x80000000, 11, 11, 9, 0))
+        self.assertEqual(events[0].exitcode, -signal.SIGKILL)
+        events = listener._parse(datagram(0x80000000, 10, 10, 3 << 8, 0))
+        self.assertEqual(events[0].exitcode, 3)
+        self.assertEqual(listener._pids, set([1]))
+        # exit of a thread and unknown events are ignored
+        self.assertEqual(listener._parse(datagram(0x80000000, 2, 1, 0, 0)),
+                         [])
+        self.assertEqual(listener._parse(datagram(0x200, 1, 1)), [])
+        self.assertEqual(listener._pids, set([1]))
+
+    def test_process_events_read_doesnt_block_process_iter(self):
+        # a thread waiting in read() must not prevent other threads
+        # from using live_pids() / process_iter()
+        cls = psutil._pslinux.ProcEventsListener
+        data = cls.EVENT_HDR.pack(1, 0, 0) + struct.pack(
+            "=6i", os.getpid(), os.getpid(), 99999, 99999, 0, 0)
+        cn_msg = cls.CN_MSG.pack(1, 1, 0, 0, len(data), 0) + data
+        datagram = cls.NLMSG_HDR.pack(
+            cls.NLMSG_HDR.size + len(cn_msg), 3, 0, 0, 0) + cn_msg
+
+        listener = cls.__new__(cls)
+        listener._sock, peer = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(peer.close)
+        listener._sock.setblocking(False)
+        listener._init_wakeup()
+        listener._lock = threading.Lock()
+        listener._pending = collections.deque()
+        listener._pids = set(psutil.pids())
+
+        def close():
+            listener._sock.close()
+            os.close(listener._wakeup_r)
+            os.close(listener._wakeup_w)
+
+        self.addCleanup(close)
+        results = []
+        reader = threading.Thread(
+            target=lambda: results.append(listener.read(timeout=10)))
+        reader.start()
+        time.sleep(0.1)
+        psutil._proc_events_listeners.append(listener)
+        try:
+            t = threading.Thread(
+                target=lambda: list(psutil.process_iter(use_events=True)))
+            t.start()
+            t.join(3)
+            self.assertFalse(t.is_alive())
+            # an event arrives: either read() gets it or live_pids()
+            # consumes it first and wakes up read()
+            peer.send(datagram)
+            listener.live_pids()
+            reader.join(3)
+            self.assertFalse(reader.is_alive())
+        finally:
+            psutil._proc_events_listeners.remove(listener)
+        self.assertEqual([(x.type, x.pid) for x in results[0]],
+                         [(psutil.PROC_EVENT_FORK, 99999)])
+
+    def test_process_events_pending_is_bounded(self):
+        # live_pids() without read() doesn't accumulate events forever,
+        # but still keeps track of all PIDs
+        cls = psutil._pslinux.ProcEventsListener
+
+        def datagram(pid):
+            data = cls.EVENT_HDR.pack(1, 0, 0) + struct.pack(
+                "=6i", 1, 1, pid, pid, 0, 0)
+            cn_msg = cls.CN_MSG.pack(1, 1, 0, 0, len(data), 0) + data
+            return cls.NLMSG_HDR.pack(
+                cls.NLMSG_HDR.size + len(cn_msg), 3, 0, 0, 0) + cn_msg
+
+        listener = cls.__new__(cls)
+        listener._sock, peer = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(peer.close)
+        self.addCleanup(listener._sock.close)
+        listener._sock.setblocking(False)
+        listener._lock = threading.Lock()
+        listener._pending = collections.deque(maxlen=3)
+        listener._pids = set([1])
+        listener._wakeup = lambda: None
+        for pid in range(1001, 1006):
+            peer.send(datagram(pid))
+        self.assertEqual(listener.live_pids(),
+                         set([1, 1001, 1002, 1003, 1004, 1005]))
+        self.assertEqual([x.pid for x in listener._pending],
+                         [1003, 1004, 1005])
+
 
 @unittest.skipIf(not LINUX, "LINUX only")
 class TestProcessAgainstStatus(unittest.TestCase):
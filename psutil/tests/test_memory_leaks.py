@@ -522,6 +522,9 @@ class TestModuleFunctionsLeaks(TestMemLeak):
     def test_pids(self):
         self.execute(psutil.pids)
 
+    def test_process_table(self):
+        self.execute(psutil.process_table)
+
     # --- net
 
     @skip_if_linux()
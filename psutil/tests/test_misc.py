@@ -175,7 +175,7 @@ class TestMisc(unittest.TestCase):
     def test__all__(self):
         dir_psutil = dir(psutil)
         for name in dir_psutil:
-            if name in ('callable', 'error', 'namedtuple', 'tests',
+            if name in ('callable', 'error', 'namedtuple', 'tests', 'aio',
                         'long', 'test', 'NUM_CPUS', 'BOOT_TIME',
                         'TOTAL_PHYMEM'):
                 continue
@@ -540,9 +540,7 @@ class TestWrapNumbers(unittest.TestCase):
         wrap_numbers(input, 'disk_io')
         cache = wrap_numbers.cache_info()
         self.assertEqual(cache[0], {'disk_io': input})
-        self.assertEqual(
-            cache[1],
-            {'disk_io': {('disk1', 0): 0, ('disk1', 1): 0, ('disk1', 2): 0}})
+        self.assertEqual(cache[1], {'disk_io': {}})
         self.assertEqual(cache[2], {'disk_io': {}})
 
     def test_cache_wrap(self):
@@ -555,17 +553,12 @@ class TestWrapNumbers(unittest.TestCase):
         wrap_numbers(input, 'disk_io')
         cache = wrap_numbers.cache_info()
         self.assertEqual(cache[0], {'disk_io': input})
-        self.assertEqual(
-            cache[1],
-            {'disk_io': {('disk1', 0): 0, ('disk1', 1): 0, ('disk1', 2): 100}})
+        self.assertEqual(cache[1], {'disk_io': {('disk1', 2): 100}})
         self.assertEqual(cache[2], {'disk_io': {'disk1': set([('disk1', 2)])}})
 
         def assert_():
             cache = wrap_numbers.cache_info()
-            self.assertEqual(
-                cache[1],
-                {'disk_io': {('disk1', 0): 0, ('disk1', 1): 0,
-                             ('disk1', 2): 100}})
+            self.assertEqual(cache[1], {'disk_io': {('disk1', 2): 100}})
             self.assertEqual(cache[2],
                              {'disk_io': {'disk1': set([('disk1', 2)])}})
 
@@ -588,9 +581,7 @@ class TestWrapNumbers(unittest.TestCase):
         wrap_numbers(input, 'disk_io')
         cache = wrap_numbers.cache_info()
         self.assertEqual(cache[0], {'disk_io': input})
-        self.assertEqual(
-            cache[1],
-            {'disk_io': {('disk1', 0): 0, ('disk1', 1): 0, ('disk1', 2): 190}})
+        self.assertEqual(cache[1], {'disk_io': {('disk1', 2): 190}})
         self.assertEqual(cache[2], {'disk_io': {'disk1': set([('disk1', 2)])}})
 
     def test_cache_changing_keys(self):
@@ -601,11 +592,72 @@ class TestWrapNumbers(unittest.TestCase):
         wrap_numbers(input, 'disk_io')
         cache = wrap_numbers.cache_info()
         self.assertEqual(cache[0], {'disk_io': input})
-        self.assertEqual(
-            cache[1],
-            {'disk_io': {('disk1', 0): 0, ('disk1', 1): 0, ('disk1', 2): 0}})
+        self.assertEqual(cache[1], {'disk_io': {}})
+        self.assertEqual(cache[2], {'disk_io': {}})
+
+    def test_cache_gone_keys(self):
+        # reminders of keys which disappear are removed
+        wrap_numbers({'disk1': nt(5, 5, 5), 'disk2': nt(9, 9, 9)}, 'disk_io')
+        wrap_numbers({'disk1': nt(5, 5, 5), 'disk2': nt(1, 9, 9)}, 'disk_io')
+        cache = wrap_numbers.cache_info()
+        self.assertEqual(cache[1], {'disk_io': {('disk2', 0): 9}})
+        wrap_numbers({'disk1': nt(5, 5, 5)}, 'disk_io')
+        cache = wrap_numbers.cache_info()
+        self.assertEqual(cache[1], {'disk_io': {}})
         self.assertEqual(cache[2], {'disk_io': {}})
 
+    # --- WrapTracker
+
+    def test_tracker_independent(self):
+        t1 = psutil.WrapTracker()
+        t2 = psutil.WrapTracker()
+        self.assertEqual(wrap_numbers({'nic': nt(100, 0, 0)}, t1),
+                         {'nic': nt(100, 0, 0)})
+        self.assertEqual(wrap_numbers({'nic': nt(10, 0, 0)}, t2),
+                         {'nic': nt(10, 0, 0)})
+        # t2 values don't count as a wrap for t1, and vice versa
+        self.assertEqual(wrap_numbers({'nic': nt(110, 0, 0)}, t1),
+                         {'nic': nt(110, 0, 0)})
+        self.assertEqual(wrap_numbers({'nic': nt(5, 0, 0)}, t2),
+                         {'nic': nt(15, 0, 0)})
+        # the global cache is untouched
+        self.assertEqual(wrap_numbers.cache_info(), ({}, {}, {}))
+
+    def test_tracker_many_keys(self):
+        t = psutil.WrapTracker()
+        input = dict(('veth%s' % i, nt(i, i, i)) for i in range(2000))
+        self.assertEqual(t.run(input), input)
+        self.assertEqual(t.run(input), input)
+        # some keys go away, others appear, one wraps
+        input = dict(('veth%s' % i, nt(i, i, i)) for i in range(1000, 3000))
+        input['veth1500'] = nt(1500, 0, 1500)
+        ret = t.run(input)
+        self.assertEqual(ret['veth1500'], nt(1500, 1500, 1500))
+        self.assertEqual(ret['veth2500'], nt(2500, 2500, 2500))
+        self.assertEqual(len(ret), 2000)
+        self.assertEqual(t.cache_info()[1], {('veth1500', 1): 1500})
+
+    def test_tracker_big_numbers(self):
+        # reminders exceeding 64 bits and floats
+        t = psutil.WrapTracker()
+        t.run({'disk1': (2 ** 64 - 1, 1.5)})
+        self.assertEqual(t.run({'disk1': (5, 0.5)}),
+                         {'disk1': (2 ** 64 + 4, 2.0)})
+        self.assertEqual(t.run({'disk1': (1, 0.5)}),
+                         {'disk1': (2 ** 64 + 5, 2.0)})
+
+    def test_tracker_public_apis(self):
+        t = psutil.WrapTracker()
+        with mock.patch('psutil._psplatform.net_io_counters',
+                        return_value={'lo': (100, ) * 8}):
+            psutil.net_io_counters(nowrap=t)
+        with mock.patch('psutil._psplatform.net_io_counters',
+                        return_value={'lo': (10, ) * 8}):
+            self.assertEqual(psutil.net_io_counters(nowrap=t),
+                             psutil._common.snetio(*(110, ) * 8))
+        self.assertNotIn('psutil.net_io_counters',
+                         wrap_numbers.cache_info()[0])
+
     def test_cache_clear(self):
         input = {'disk1': nt(5, 5, 5)}
         wrap_numbers(input, 'disk_io')
@@ -650,6 +650,24 @@ class TestProcess(unittest.TestCase):
                     self.assertIsInstance(value, (int, long))
                     assert value >= 0, value
 
+    @unittest.skipIf(not HAS_MEMORY_MAPS, "not supported")
+    def test_memory_maps_iter(self):
+        p = psutil.Process()
+        maps = list(p.memory_maps_iter())
+        self.assertEqual(sorted([x.path for x in maps]),
+                         sorted([x.path for x in p.memory_maps()]))
+        self.assertEqual(type(maps[0]), type(p.memory_maps()[0]))
+        ext_maps = list(p.memory_maps_iter(grouped=False))
+        self.assertEqual([x.addr for x in ext_maps],
+                         [x.addr for x in p.memory_maps(grouped=False)])
+        path = ext_maps[0].path
+        self.assertEqual([x.path for x in p.memory_maps_iter(path=path)],
+                         [path])
+        self.assertEqual(
+            [x.addr for x in p.memory_maps_iter(grouped=False, path=path)],
+            [x.addr for x in ext_maps if x.path == path])
+        self.assertEqual(list(p.memory_maps_iter(path="?!")), [])
+
     @unittest.skipIf(not HAS_MEMORY_MAPS, "not supported")
     def test_memory_maps_lists_lib(self):
         # Make sure a newly loaded shared lib is listed.
@@ -36,6 +36,7 @@ from psutil.tests import DEVNULL
 from psutil.tests import enum
 from psutil.tests import get_test_subprocess
 from psutil.tests import HAS_BATTERY
+from psutil.tests import HAS_CONCURRENT_FUTURES
 from psutil.tests import HAS_CPU_FREQ
 from psutil.tests import HAS_SENSORS_BATTERY
 from psutil.tests import HAS_SENSORS_FANS
@@ -102,6 +103,79 @@ class TestSystemAPIs(unittest.TestCase):
                 self.assertGreaterEqual(p.info['pid'], 0)
             assert m.called
 
+    @unittest.skipIf(not HAS_CONCURRENT_FUTURES,
+                     "concurrent.futures module not available")
+    def test_process_iter_workers(self):
+        sproc = get_test_subprocess()
+        cached = dict((p.pid, p) for p in psutil.process_iter())
+        for executor in ('thread', 'process'):
+            procs = list(psutil.process_iter(
+                attrs=['pid', 'name'], workers=2, executor=executor))
+            pids = [p.pid for p in procs]
+            self.assertEqual(pids, sorted(pids))
+            self.assertIn(sproc.pid, pids)
+            for p in procs:
+                self.assertEqual(p.info['pid'], p.pid)
+            # the same Process instances are supposed to be yielded
+            me = procs[pids.index(os.getpid())]
+            self.assertIs(me, cached[os.getpid()])
+            self.assertEqual(me.info['name'], me.name())
+
+        # cpu_percent depends on the previous call, hence it's
+        # calculated by the parent on the cached Process instances
+        with mock.patch("psutil.Process.cpu_percent",
+                        return_value=42.0) as m:
+            procs = list(psutil.process_iter(
+                attrs=['cpu_percent'], workers=2, executor='process'))
+            assert m.called
+        me = [x for x in procs if x.pid == os.getpid()][0]
+        self.assertIs(me, cached[os.getpid()])
+        self.assertEqual(me.info['cpu_percent'], 42.0)
+
+        with mock.patch("psutil._psplatform.Process.cpu_times",
+                        side_effect=psutil.AccessDenied(0, "")) as m:
+            flag = object()
+            for p in psutil.process_iter(attrs=["pid", "cpu_times"],
+                                         ad_value=flag, workers=2):
+                self.assertIs(p.info['cpu_times'], flag)
+            assert m.called
+        with mock.patch('psutil.Process',
+                        side_effect=psutil.NoSuchProcess(os.getpid())):
+            psutil._pmap.clear()
+            self.assertEqual(list(psutil.process_iter(workers=2)), [])
+        with mock.patch('psutil.Process',
+                        side_effect=psutil.AccessDenied(os.getpid())):
+            with self.assertRaises(psutil.AccessDenied):
+                list(psutil.process_iter(workers=2))
+
+        with self.assertRaises(ValueError):
+            list(psutil.process_iter(attrs=['foo'], workers=2))
+        with self.assertRaises(ValueError):
+            list(psutil.process_iter(workers=0))
+        with self.assertRaises(ValueError):
+            list(psutil.process_iter(workers=2, executor='foo'))
+
+    def test_process_table(self):
+        table = psutil.process_table()
+        self.assertIn('create_time', table)
+        self.assertIn('name', table)
+        pids = table['pid']
+        self.assertEqual(pids, sorted(pids))
+        for name, column in table.items():
+            self.assertEqual(len(column), len(pids), msg=name)
+        p = psutil.Process()
+        idx = pids.index(p.pid)
+        self.assertEqual(table['name'][idx], p.name())
+        self.assertEqual(table['ppid'][idx], p.ppid())
+        self.assertEqual(table['create_time'][idx], p.create_time())
+
+        table = psutil.process_table(attrs=['ppid'])
+        self.assertEqual(sorted(table.keys()), ['create_time', 'pid', 'ppid'])
+        with self.assertRaises(ValueError):
+            psutil.process_table(attrs=['foo'])
+        with self.assertRaises(TypeError):
+            psutil.process_table(attrs='name')
+
     def test_wait_procs(self):
         def callback(p):
             pids.append(p.pid)
@@ -166,6 +240,28 @@ class TestSystemAPIs(unittest.TestCase):
             p.terminate()
         gone, alive = psutil.wait_procs(procs)
 
+    def test_system_snapshot(self):
+        ret = psutil.system_snapshot()
+        self.assertEqual(
+            sorted(ret), sorted(psutil._SNAPSHOT_FIELDS + ('timestamp', )))
+        self.assertEqual(ret['cpu_times']._fields, psutil.cpu_times()._fields)
+        self.assertEqual(ret['virtual_memory'].total,
+                         psutil.virtual_memory().total)
+        self.assertEqual(ret['boot_time'], psutil.boot_time())
+        self.assertLessEqual(ret['timestamp'], psutil._timer())
+        ret = psutil.system_snapshot(fields=['cpu_times', 'net_io_counters'],
+                                     percpu=True, pernic=True)
+        self.assertEqual(sorted(ret),
+                         ['cpu_times', 'net_io_counters', 'timestamp'])
+        self.assertEqual(len(ret['cpu_times']), psutil.cpu_count())
+        self.assertIsInstance(ret['net_io_counters'], dict)
+        self.assertEqual(sorted(psutil.system_snapshot(fields=[])),
+                         ['timestamp'])
+        with self.assertRaises(ValueError):
+            psutil.system_snapshot(fields=['cpu_times', 'foo'])
+        with self.assertRaises(TypeError):
+            psutil.system_snapshot(fields='cpu_times')
+
     def test_boot_time(self):
         bt = psutil.boot_time()
         self.assertIsInstance(bt, float)
@@ -439,6 +535,110 @@ class TestSystemAPIs(unittest.TestCase):
                 for percent in cpu:
                     self._test_cpu_percent(percent, None, None)
 
+    def test_sampler(self):
+        with psutil.Sampler(interval=0.01, history=1) as s:
+            self.assertTrue(s.is_running())
+            time.sleep(0.1)
+            for window in (None, 0, 0.05, 10):
+                self._test_cpu_percent(s.cpu_percent(window), None, None)
+                for percent in s.cpu_percent(window, percpu=True):
+                    self._test_cpu_percent(percent, None, None)
+                ret = s.cpu_times_percent(window)
+                self.assertEqual(ret._fields, psutil.cpu_times()._fields)
+                self._test_cpu_percent(sum(ret), None, None)
+                self.assertEqual(len(s.cpu_times_percent(window, True)),
+                                 psutil.cpu_count())
+                self.assertGreaterEqual(s.elapsed(window), 0)
+                nics = s.net_io_counters(window, pernic=True)
+                self.assertEqual(
+                    sorted(nics), sorted(psutil.net_io_counters(pernic=True)))
+                for nt in nics.values():
+                    for value in nt:
+                        self.assertGreaterEqual(value, 0)
+                if psutil.disk_io_counters() is not None:
+                    for value in s.disk_io_counters(window):
+                        self.assertGreaterEqual(value, 0)
+            # the longest window spans (roughly) the whole history
+            self.assertGreaterEqual(s.elapsed(10), s.elapsed(0.05))
+            self.assertLessEqual(s.elapsed(10), 1.5)
+            self.assertLessEqual(len(s._samples), 101)
+        self.assertFalse(s.is_running())
+        # history is retained after stop()
+        s.cpu_percent()
+        with self.assertRaises(ValueError):
+            s.cpu_percent(window=-1)
+        with self.assertRaises(ValueError):
+            psutil.Sampler(interval=0)
+        with self.assertRaises(ValueError):
+            psutil.Sampler(interval=2, history=1)
+        with self.assertRaises(ValueError):
+            psutil.Sampler().cpu_percent()
+
+    def test_sampler_window(self):
+        # fake samples: CPU is 50% busy in the first second and 100%
+        # busy in the last one
+        nt = psutil.cpu_times()
+        fields = nt._fields
+
+        def mk(user, idle):
+            return nt._make([user if x == 'user' else idle if x == 'idle'
+                             else 0 for x in fields])
+
+        s = psutil.Sampler(interval=1, history=10)
+        s._samples.extend([
+            (0.0, mk(0, 0), [mk(0, 0)], {}, {}),
+            (1.0, mk(1, 1), [mk(1, 1)], {}, {}),
+            (2.0, mk(2, 1), [mk(2, 1)], {}, {}),
+        ])
+        self.assertEqual(s.cpu_percent(window=1), 100.0)
+        self.assertEqual(s.cpu_percent(window=2), 66.7)
+        self.assertEqual(s.cpu_percent(window=100), 66.7)
+        self.assertEqual(s.cpu_percent(window=0.5, percpu=True), [100.0])
+        self.assertEqual(s.cpu_times_percent(window=1).user, 100.0)
+        self.assertEqual(s.elapsed(window=2), 2.0)
+        self.assertEqual(s.elapsed(window=1.5), 2.0)
+        self.assertEqual(s.net_io_counters(window=1, pernic=True), {})
+        self.assertIsNone(s.net_io_counters(window=1))
+
+    def test_sampler_error(self):
+        # a failing collector doesn't prevent the others from being
+        # sampled; querying it raises the most recent error
+        s = psutil.Sampler(interval=0.01, history=1)
+        with mock.patch('psutil.disk_io_counters',
+                        side_effect=OSError(errno.EIO, "")) as m:
+            s.start()
+            try:
+                time.sleep(0.05)
+                assert m.called
+                self.assertTrue(s.is_running())
+                self._test_cpu_percent(s.cpu_percent(), None, None)
+                self.assertIsNotNone(s.net_io_counters())
+                self.assertRaises(OSError, s.disk_io_counters)
+            finally:
+                s.stop()
+
+    def test_sampler_nowrap(self):
+        # counters wrapping are handled with a state which is private
+        # to the sampler
+        nt = psutil._common.snetio
+        values = iter([100, 200, 10, 20])
+
+        def net_io_counters():
+            v = next(values)
+            return {'nic': nt(v, v, v, v, 0, 0, 0, 0)}
+
+        psutil.net_io_counters.cache_clear()
+        s = psutil.Sampler(interval=1, history=10)
+        with mock.patch('psutil._psplatform.net_io_counters',
+                        side_effect=net_io_counters):
+            with mock.patch('psutil.disk_io_counters', return_value={}):
+                for x in range(4):
+                    s._collect()
+        self.assertEqual(s.net_io_counters().bytes_sent, 120)
+        self.assertEqual(s.net_io_counters(window=0).bytes_sent, 10)
+        self.assertNotIn('psutil.net_io_counters',
+                         psutil._common.wrap_numbers.cache_info()[0])
+
     def test_disk_usage(self):
         usage = psutil.disk_usage(os.getcwd())
         self.assertEqual(usage._fields, ('total', 'used', 'free', 'percent'))
@@ -574,6 +774,31 @@ class TestSystemAPIs(unittest.TestCase):
             self.assertEqual(psutil.net_io_counters(pernic=True), {})
             assert m.called
 
+    def test_net_io_rates(self):
+        psutil._last_net_io = None
+        psutil._wrap_numbers.cache_clear('psutil.net_io_rates')
+        self.addCleanup(psutil._wrap_numbers.cache_clear,
+                        'psutil.net_io_rates')
+        with mock.patch('psutil._psplatform.net_io_counters',
+                        return_value={'lo': (100,) * 8}):
+            with mock.patch('psutil._timer', return_value=100.0):
+                self.assertEqual(psutil.net_io_rates(),
+                                 psutil._common.snetio(*[0.0] * 8))
+        with mock.patch('psutil._psplatform.net_io_counters',
+                        return_value={'lo': (500,) * 8, 'eth0': (1,) * 8}):
+            with mock.patch('psutil._timer', return_value=104.0):
+                ret = psutil.net_io_rates(pernic=True)
+        self.assertEqual(ret, {'lo': psutil._common.snetio(*[100.0] * 8)})
+        with mock.patch('psutil._psplatform.net_io_counters',
+                        return_value={}):
+            self.assertIsNone(psutil.net_io_rates())
+            self.assertEqual(psutil.net_io_rates(pernic=True), {})
+        with self.assertRaises(ValueError):
+            psutil.net_io_rates(interval=-1)
+        ret = psutil.net_io_rates(interval=0.01)
+        for value in ret:
+            self.assertGreaterEqual(value, 0)
+
     def test_net_if_addrs(self):
         nics = psutil.net_if_addrs()
         assert nics, nics
@@ -712,6 +937,79 @@ class TestSystemAPIs(unittest.TestCase):
             self.assertEqual(psutil.disk_io_counters(perdisk=True), {})
             assert m.called
 
+    def test_disk_io_rates(self):
+        nt = getattr(psutil._psplatform, "sdiskio", psutil._common.sdiskio)
+        nfields = len(nt._fields)
+
+        def counters(n):
+            # read_count=n, write_count=2n, read_bytes=512n, ...
+            base = [n, 2 * n, 512 * n, 1024 * n, 10 * n, 40 * n]
+            return tuple((base + [0] * nfields)[:nfields])
+
+        psutil._last_disk_io = None
+        psutil._wrap_numbers.cache_clear('psutil.disk_io_rates')
+        self.addCleanup(psutil._wrap_numbers.cache_clear,
+                        'psutil.disk_io_rates')
+        with mock.patch('psutil._psplatform.disk_io_counters',
+                        return_value={'sda': counters(10)}):
+            with mock.patch('psutil._timer', return_value=100.0):
+                # first call returns zeroes
+                ret = psutil.disk_io_rates()
+                self.assertEqual(ret.read_count, 0)
+                self.assertEqual(ret.queue_size, 0)
+        with mock.patch('psutil._psplatform.disk_io_counters',
+                        return_value={'sda': counters(30),
+                                      'sdb': counters(5)}):
+            with mock.patch('psutil._timer', return_value=102.0):
+                ret = psutil.disk_io_rates(perdisk=True)
+        # sdb appeared in between the two samples
+        self.assertEqual(list(ret), ['sda'])
+        ret = ret['sda']
+        self.assertEqual(ret.read_count, 10)
+        self.assertEqual(ret.write_count, 20)
+        self.assertEqual(ret.read_bytes, 5120)
+        self.assertEqual(ret.write_bytes, 10240)
+        self.assertEqual(ret.read_await, 10)
+        self.assertEqual(ret.write_await, 20)
+        # (200 + 800) ms of requests time over 2 secs
+        self.assertEqual(ret.queue_size, 0.5)
+        self.assertEqual(ret._fields, psutil._common.sdiskrate._fields)
+        if "busy_time" in nt._fields:
+            self.assertEqual(ret.util, 0)
+        else:
+            self.assertIsNone(ret.util)
+
+        with self.assertRaises(ValueError):
+            psutil.disk_io_rates(interval=-1)
+
+    def test_disk_io_rates_wrap(self):
+        nt = getattr(psutil._psplatform, "sdiskio", psutil._common.sdiskio)
+        nfields = len(nt._fields)
+        psutil._last_disk_io = None
+        psutil._wrap_numbers.cache_clear('psutil.disk_io_rates')
+        self.addCleanup(psutil._wrap_numbers.cache_clear,
+                        'psutil.disk_io_rates')
+        with mock.patch('psutil._psplatform.disk_io_counters',
+                        return_value={'sda': (1000,) * nfields}):
+            with mock.patch('psutil._timer', return_value=100.0):
+                psutil.disk_io_rates()
+        # counters restart from zero
+        with mock.patch('psutil._psplatform.disk_io_counters',
+                        return_value={'sda': (10,) * nfields}):
+            with mock.patch('psutil._timer', return_value=101.0):
+                ret = psutil.disk_io_rates()
+        self.assertEqual(ret.read_count, 10)
+        self.assertEqual(ret.write_bytes, 10)
+        # baselines are independent from disk_io_counters()
+        self.assertIn('psutil.disk_io_rates',
+                      psutil._wrap_numbers.cache_info()[0])
+
+    def test_disk_io_rates_interval(self):
+        with mock.patch('psutil._psplatform.disk_io_counters',
+                        return_value={}):
+            self.assertIsNone(psutil.disk_io_rates(interval=0.01))
+            self.assertEqual(psutil.disk_io_rates(perdisk=True), {})
+
     # can't find users on APPVEYOR or TRAVIS
     @unittest.skipIf(APPVEYOR or TRAVIS and not psutil.users(),
                      "unreliable on APPVEYOR or TRAVIS")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2009, Giampaolo Rodola'. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Benchmark the cost of "import psutil": time spent importing the module
+and number of syscalls made while doing it. Every measurement is taken
+in a fresh interpreter.
+
+Syscalls are counted with strace(1) if available (the interpreter
+startup cost is measured separately and subtracted), else (Linux only)
+only read() and write() syscalls are counted via /proc/self/io.
+"""
+
+from __future__ import division
+from __future__ import print_function
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+
+ITERATIONS = 20
+ROOT_DIR = os.path.realpath(
+    os.path.join(os.path.dirname(__file__), '..', '..'))
+
+TIMEIT_CODE = """
+import time
+t = time.time()
+import psutil
+print(time.time() - t)
+"""
+
+PROC_IO_CODE = """
+def syscalls():
+    with open('/proc/self/io', 'rb') as f:
+        d = dict(line.split(b': ') for line in f.read().splitlines())
+    return int(d[b'syscr']) + int(d[b'syscw'])
+
+# syscalls made by syscalls() itself
+first = syscalls()
+overhead = syscalls() - first
+before = syscalls()
+%s
+print(syscalls() - before - overhead)
+"""
+
+
+def run(args):
+    env = os.environ.copy()
+    env['PYTHONPATH'] = ROOT_DIR
+    return subprocess.check_output(args, env=env).decode().strip()
+
+
+def import_time():
+    times = [float(run([sys.executable, "-c", TIMEIT_CODE]))
+             for x in range(ITERATIONS)]
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def which(program):
+    for path in os.environ.get("PATH", "").split(os.pathsep):
+        exe = os.path.join(path, program)
+        if os.path.isfile(exe) and os.access(exe, os.X_OK):
+            return exe
+    return None
+
+
+def strace_syscalls(code):
+    fd, logfile = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        run(["strace", "-f", "-c", "-o", logfile, sys.executable, "-c", code])
+        with open(logfile) as f:
+            data = f.read()
+    finally:
+        os.remove(logfile)
+    # last line: "100.00  0.000000  0  1234  56  total"
+    total = [x for x in data.splitlines() if x.strip().endswith("total")]
+    return int(re.split(r"\s+", total[-1].strip())[3])
+
+
+def main():
+    print("psutil import benchmark (%s iterations, Python %s)" % (
+        ITERATIONS, sys.version.split()[0]))
+    best, median = import_time()
+    print("import time:   best %.2f ms, median %.2f ms" % (
+        best * 1000, median * 1000))
+    if which("strace"):
+        syscalls = strace_syscalls("import psutil") - strace_syscalls("pass")
+        print("syscalls:      %s" % syscalls)
+    elif os.path.exists("/proc/self/io"):
+        syscalls = int(run([sys.executable, "-c",
+                            PROC_IO_CODE % "import psutil"]))
+        print("syscalls:      %s (read() and write() only, strace "
+              "not available)" % syscalls)
+    else:
+        print("syscalls:      n/a (strace not available)")
+
+
+if __name__ == '__main__':
+    main()